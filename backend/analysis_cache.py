@@ -0,0 +1,327 @@
+"""
+LocalLens — Persistent File Analysis Cache
+============================================
+Remembers what was learned from each photo (date taken, GPS coordinates,
+resolved location, camera model) so an unchanged library is never re-opened
+and re-parsed on the next scan, sort, Find & Group or report export.
+
+Design Principles:
+  1. Keyed by (path, size, mtime_ns) — any edit to the file invalidates its row
+  2. Content-hash fallback — a file that was moved or copied (new path, same
+     bytes) is recognised by a partial content hash and re-keyed, not re-parsed
+  3. Lazy location — GPS coordinates are always stored; the geocoded location
+     string is filled in only when a job actually needs it
+  4. Size-capped — least-recently-used rows are evicted above MAX_CACHE_MB
+  5. Disposable — it is only a cache; deleting the DB file is always safe
+
+File Location: ~/.config/LocalLens/analysis_cache.db
+Permissions:   0o600 (owner read/write only)
+"""
+
+import os
+import sys
+import time
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from fingerprint import fingerprints
+
+# ── Logger ──────────────────────────────────────────────────────────────────
+_log = logging.getLogger("locallens.analysis_cache")
+if not _log.handlers:
+    _h = logging.StreamHandler(sys.stderr)
+    _h.setFormatter(logging.Formatter("[analysis_cache] %(levelname)s: %(message)s"))
+    _log.addHandler(_h)
+    _log.setLevel(logging.INFO)
+    _log.propagate = False
+
+# ── Constants ─────────────────────────────────────────────────────────────
+MAX_CACHE_MB        = 64       # Evict least-recently-used rows above this
+EVICT_FRACTION      = 0.25     # Share of rows dropped per eviction pass
+EVICT_CHECK_EVERY   = 2000     # Writes between two size checks
+DB_FILENAME         = "analysis_cache.db"
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  Path helpers
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _get_config_dir() -> Path:
+    """Return the OS-appropriate LocalLens config directory."""
+    if sys.platform == "win32":
+        base = Path(os.environ.get("APPDATA", Path.home()))
+    else:
+        base = Path.home() / ".config"
+    config_dir = base / "LocalLens"
+    config_dir.mkdir(parents=True, exist_ok=True)
+    return config_dir
+
+
+def _get_db_path() -> Path:
+    return _get_config_dir() / DB_FILENAME
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  Schema
+# ─────────────────────────────────────────────────────────────────────────────
+
+_SCHEMA_SQL = """
+PRAGMA journal_mode=WAL;
+
+CREATE TABLE IF NOT EXISTS file_analysis (
+    path              TEXT    PRIMARY KEY,
+    size              INTEGER NOT NULL,
+    mtime_ns          INTEGER NOT NULL,
+    content_hash      TEXT,                  -- size + head/tail BLAKE2b (move/copy fallback)
+    date_taken        TEXT,                  -- ISO 8601, NULL if unknown
+    gps_lat           REAL,
+    gps_lon           REAL,
+    location          TEXT,                  -- "IN/Uttar-Pradesh/Lucknow"
+    location_resolved INTEGER NOT NULL DEFAULT 0,
+    camera_model      TEXT,
+    last_used         REAL    NOT NULL       -- Unix time, drives LRU eviction
+);
+
+CREATE INDEX IF NOT EXISTS idx_analysis_hash ON file_analysis(content_hash);
+CREATE INDEX IF NOT EXISTS idx_analysis_used ON file_analysis(last_used);
+"""
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  Utility helpers
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _row_to_entry(row: sqlite3.Row) -> Dict[str, Any]:
+    date_taken = None
+    if row["date_taken"]:
+        try:
+            date_taken = datetime.fromisoformat(row["date_taken"])
+        except ValueError:
+            pass
+    gps = None
+    if row["gps_lat"] is not None and row["gps_lon"] is not None:
+        gps = (row["gps_lat"], row["gps_lon"])
+    return {
+        "date_taken":        date_taken,
+        "gps":               gps,
+        "location":          row["location"],
+        "location_resolved": bool(row["location_resolved"]),
+        "camera_model":      row["camera_model"],
+    }
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  AnalysisCache class
+# ─────────────────────────────────────────────────────────────────────────────
+
+class AnalysisCache:
+    """
+    Thread-safe SQLite-backed cache of per-file analysis results.
+
+    Usage (in organizer_logic.py):
+        from analysis_cache import analysis_cache
+        entry = analysis_cache.lookup(path, os.stat(path))
+        if entry is None:
+            ...parse EXIF...
+            analysis_cache.store(path, st, date_taken=..., gps=(lat, lon),
+                                 camera_model=...)
+    """
+
+    def __init__(self):
+        self._db_path = _get_db_path()
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._init_db()
+
+    # ── Initialization ──────────────────────────────────────────────────────
+
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread; pipeline workers each get their own."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self._db_path), timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        """Create tables, indexes, and set file permissions."""
+        try:
+            conn = self._connect()
+            conn.executescript(_SCHEMA_SQL)
+            conn.commit()
+            os.chmod(self._db_path, 0o600)
+            self._maybe_evict()
+        except Exception as e:
+            _log.error(f"Failed to initialize analysis cache: {e}")
+
+    # ── Core: lookup / store ────────────────────────────────────────────────
+
+    def lookup(self, path: str, st: Optional[os.stat_result] = None) -> Optional[Dict[str, Any]]:
+        """
+        Return the cached analysis for `path`, or None on a miss.
+        Tries the exact (path, size, mtime_ns) key first, then the content hash.
+        """
+        try:
+            st = st or os.stat(path)
+            conn = self._connect()
+            now = time.time()
+            row = conn.execute(
+                "SELECT * FROM file_analysis WHERE path=? AND size=? AND mtime_ns=?",
+                (path, st.st_size, st.st_mtime_ns),
+            ).fetchone()
+            if row is not None:
+                conn.execute("UPDATE file_analysis SET last_used=? WHERE path=?", (now, path))
+                conn.commit()
+                self.hits += 1
+                # The stored fingerprint is still valid: nobody needs to read the file for it.
+                fingerprints.remember(path, st, row["content_hash"])
+                return _row_to_entry(row)
+
+            # Fallback: same bytes under a new path or with a touched mtime.
+            content_hash = fingerprints.partial(path, st)
+            if content_hash:
+                row = conn.execute(
+                    "SELECT * FROM file_analysis WHERE content_hash=? AND size=? LIMIT 1",
+                    (content_hash, st.st_size),
+                ).fetchone()
+                if row is not None:
+                    entry = _row_to_entry(row)
+                    self.store(path, st, content_hash=content_hash, **entry)
+                    self.hits += 1
+                    return entry
+            self.misses += 1
+            return None
+        except Exception as e:
+            _log.warning(f"lookup failed for {path}: {e}")
+            return None
+
+    def store(
+        self,
+        path: str,
+        st: Optional[os.stat_result] = None,
+        date_taken: Optional[datetime] = None,
+        gps: Optional[Tuple[float, float]] = None,
+        location: Optional[str] = None,
+        location_resolved: bool = False,
+        camera_model: Optional[str] = None,
+        content_hash: Optional[str] = None,
+    ) -> None:
+        """Insert or replace the analysis row for `path`."""
+        try:
+            st = st or os.stat(path)
+            content_hash = content_hash or fingerprints.partial(path, st)
+            lat, lon = gps if gps else (None, None)
+            conn = self._connect()
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO file_analysis
+                    (path, size, mtime_ns, content_hash, date_taken, gps_lat, gps_lon,
+                     location, location_resolved, camera_model, last_used)
+                VALUES (?,?,?,?,?,?,?,?,?,?,?)
+                """,
+                (path, st.st_size, st.st_mtime_ns, content_hash,
+                 date_taken.isoformat() if date_taken else None, lat, lon,
+                 location, int(bool(location_resolved)), camera_model, time.time()),
+            )
+            conn.commit()
+            self._count_write()
+        except Exception as e:
+            _log.warning(f"store failed for {path}: {e}")
+
+    def update_location(self, path: str, location: Optional[str]) -> None:
+        """Record the geocoded location for a row whose coordinates were cached earlier."""
+        try:
+            conn = self._connect()
+            conn.execute(
+                "UPDATE file_analysis SET location=?, location_resolved=1 WHERE path=?",
+                (location, path),
+            )
+            conn.commit()
+        except Exception as e:
+            _log.warning(f"update_location failed for {path}: {e}")
+
+    # ── Self-optimization: Eviction ─────────────────────────────────────────
+
+    def _count_write(self):
+        with self._writes_lock:
+            self._writes += 1
+            due = self._writes % EVICT_CHECK_EVERY == 0
+        if due:
+            self._maybe_evict()
+
+    def _maybe_evict(self):
+        """Drop the least-recently-used rows once the DB file exceeds MAX_CACHE_MB."""
+        try:
+            size_mb = self._db_size_mb()
+            if size_mb <= MAX_CACHE_MB:
+                return
+            conn = self._connect()
+            total = conn.execute("SELECT COUNT(*) FROM file_analysis").fetchone()[0]
+            to_drop = max(1, int(total * EVICT_FRACTION))
+            conn.execute(
+                """
+                DELETE FROM file_analysis WHERE path IN (
+                    SELECT path FROM file_analysis ORDER BY last_used ASC LIMIT ?
+                )
+                """,
+                (to_drop,),
+            )
+            conn.commit()
+            conn.execute("VACUUM")
+            _log.info(f"Cache size {size_mb:.1f} MB exceeded cap — evicted {to_drop} rows")
+        except Exception as e:
+            _log.warning(f"Eviction skipped: {e}")
+
+    def _db_size_mb(self) -> float:
+        total = 0
+        for suffix in ("", "-wal"):
+            p = Path(str(self._db_path) + suffix)
+            if p.exists():
+                total += p.stat().st_size
+        return total / (1024 * 1024)
+
+    # ── Statistics / Privacy ────────────────────────────────────────────────
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return cache health stats: row count, DB size, hit/miss counters."""
+        try:
+            row_count = self._connect().execute("SELECT COUNT(*) FROM file_analysis").fetchone()[0]
+            return {
+                "entry_count": row_count,
+                "db_size_mb":  round(self._db_size_mb(), 2),
+                "db_path":     str(self._db_path),
+                "hits":        self.hits,
+                "misses":      self.misses,
+            }
+        except Exception as e:
+            _log.error(f"get_stats failed: {e}")
+            return {"error": str(e)}
+
+    def purge_all(self) -> Dict[str, Any]:
+        """Wipe every cached analysis row."""
+        try:
+            conn = self._connect()
+            count = conn.execute("SELECT COUNT(*) FROM file_analysis").fetchone()[0]
+            conn.execute("DELETE FROM file_analysis")
+            conn.commit()
+            conn.execute("VACUUM")
+            return {"status": "purged", "records_deleted": count}
+        except Exception as e:
+            _log.error(f"purge_all failed: {e}")
+            return {"error": str(e)}
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  Module-level singleton
+# ─────────────────────────────────────────────────────────────────────────────
+
+analysis_cache = AnalysisCache()
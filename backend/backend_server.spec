@@ -13,9 +13,16 @@ block_cipher = None
 model_dir = Path(face_recognition_models.__file__).parent / 'models'
 rg_path = Path(reverse_geocoder.__file__).parent / 'rg_cities1000.csv'
 
+# Precompile the compact, memory-mappable geocoder dataset (see geocoding.py)
+# so the app never has to parse the CSV at runtime.
+sys.path.insert(0, SPECPATH)
+from geocoding import build_compact_dataset, GEODATA_DIRNAME
+geodata_dir = build_compact_dataset(rg_path, Path(workpath) / GEODATA_DIRNAME)
+
 datas = [
     (str(model_dir), 'face_recognition_models/models'),
     (str(rg_path), 'reverse_geocoder'),
+    (str(geodata_dir), GEODATA_DIRNAME),
 ]
 
 numpy_hiddenimports = collect_submodules('numpy')
@@ -37,6 +44,7 @@ a = Analysis(
         'multiprocessing.synchronize',
         'multiprocessing.resource_tracker',
         '_multiprocessing',
+        'scipy.spatial._ckdtree',
     ] + numpy_hiddenimports,
     hookspath=[],
     hooksconfig={},
@@ -0,0 +1,141 @@
+"""
+LocalLens — Destination Name Registry
+======================================
+Hands out collision-free destination paths for one job. Every target folder is
+listed once; after that unique names are picked from memory instead of probing
+`name_1.jpg`, `name_2.jpg`, … with one exists() call each.
+
+Design Principles:
+  1. One listing per folder — a folder is created (if needed) and scandir'ed the
+     first time the job writes to it, never again
+  2. Same names as before — a clash still becomes `<base>_<n><ext>` with the
+     lowest free n; a per-(folder, name) counter remembers where the last search
+     stopped, so thousands of IMG_0001.JPG files cost one step each
+  3. Claimed on disk with O_EXCL — each name is reserved by creating an empty
+     placeholder with O_CREAT | O_EXCL; a name taken meanwhile by another worker,
+     job or program fails that create and the next number is tried
+  4. Job-scoped and thread-safe — a lock per folder, so pipeline I/O workers can
+     write to different folders (and copy into the same one) concurrently
+
+Usage:
+    registry = DestinationRegistry()
+    path = registry.reserve(target_folder, "IMG_0001.JPG")   # placeholder exists now
+    ...copy or move onto path...
+    registry.release(path)                                    # only if the write failed
+"""
+
+import os
+import sys
+import logging
+import threading
+from typing import Callable, Dict, Optional, Set
+
+# ── Logger ──────────────────────────────────────────────────────────────────
+_log = logging.getLogger("locallens.destination_registry")
+
+# ── Constants ─────────────────────────────────────────────────────────────
+# Default filesystems on Windows and macOS ignore case: "IMG.JPG" clashes with "img.jpg".
+CASE_INSENSITIVE = sys.platform in ("win32", "darwin")
+_EXCL_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+
+
+def _name_key(name: str) -> str:
+    return name.casefold() if CASE_INSENSITIVE else name
+
+
+class _Folder:
+    __slots__ = ("lock", "taken", "next_suffix")
+
+    def __init__(self, names):
+        self.lock = threading.Lock()
+        self.taken: Set[str] = {_name_key(n) for n in names}
+        self.next_suffix: Dict[str, int] = {}   # name key → first counter worth trying
+
+
+class DestinationRegistry:
+    """Job-scoped registry of the names used in each destination folder."""
+
+    def __init__(self):
+        self._folders: Dict[str, _Folder] = {}
+        self._lock = threading.Lock()
+        self.listings = 0     # Folders listed
+        self.collisions = 0   # Names that needed a _<n> suffix
+
+    # ── Folders ─────────────────────────────────────────────────────────────
+
+    def _folder(self, folder: str) -> _Folder:
+        with self._lock:
+            entry = self._folders.get(folder)
+            if entry is not None:
+                return entry
+        # List outside the registry lock; a racing thread listing the same
+        # folder is harmless, the first one stored wins.
+        os.makedirs(folder, exist_ok=True)
+        with os.scandir(folder) as it:
+            names = [e.name for e in it]
+        with self._lock:
+            if folder not in self._folders:
+                self._folders[folder] = _Folder(names)
+                self.listings += 1
+            return self._folders[folder]
+
+    # ── Names ───────────────────────────────────────────────────────────────
+
+    def _candidates(self, entry: _Folder, filename: str):
+        """filename, then <base>_<n><ext> from the remembered counter upward."""
+        key = _name_key(filename)
+        if key not in entry.taken:
+            yield filename, None
+        base, ext = os.path.splitext(filename)
+        counter = entry.next_suffix.get(key, 1)
+        while True:
+            yield f"{base}_{counter}{ext}", counter
+            counter += 1
+
+    def reserve(self, folder: str, filename: str, before_create: Optional[Callable[[str], None]] = None) -> str:
+        """
+        Returns a path in `folder` (created if needed) that nobody else is using,
+        claimed by an empty placeholder file the caller is expected to overwrite.
+        before_create(path) runs before each placeholder is created (write-ahead
+        journaling); a path it saw may end up taken by someone else.
+        """
+        entry = self._folder(folder)
+        key = _name_key(filename)
+        with entry.lock:
+            for candidate, counter in self._candidates(entry, filename):
+                candidate_key = _name_key(candidate)
+                if candidate_key in entry.taken:
+                    continue
+                path = os.path.join(folder, candidate)
+                if before_create is not None:
+                    before_create(path)
+                try:
+                    fd = os.open(path, _EXCL_FLAGS, 0o666)
+                except FileExistsError:
+                    # Created by someone else since the folder was listed.
+                    entry.taken.add(candidate_key)
+                    continue
+                except FileNotFoundError:
+                    # The folder was removed during the job: recreate it and retry.
+                    os.makedirs(folder, exist_ok=True)
+                    fd = os.open(path, _EXCL_FLAGS, 0o666)
+                os.close(fd)
+                entry.taken.add(candidate_key)
+                if counter is not None:
+                    entry.next_suffix[key] = counter + 1
+                    self.collisions += 1
+                    _log.info(f"File '{filename}' already exists. Renaming to '{candidate}'")
+                return path
+
+    def release(self, path: str) -> None:
+        """
+        Deletes a reserved path whose write failed (the placeholder or a partial
+        copy). The name is not handed out again within this job.
+        """
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def get_stats(self) -> Dict[str, int]:
+        return {"folders_listed": self.listings, "renamed": self.collisions}
@@ -12,10 +12,11 @@ import os
 import pickle
 import shutil
 import numpy as np
-from PIL import Image, UnidentifiedImageError
+from PIL import UnidentifiedImageError
 import face_recognition
 from multiprocessing import Pool, cpu_count
 from exceptions import OperationAbortedError
+from image_decode import open_for_analysis
 
 # --- Constants ---
 RESIZE_WIDTH_FOR_ENROLLMENT = 600
@@ -30,13 +31,8 @@ def process_image(image_path_and_name):
     try:
         # This print is for backend console debugging, can be removed later.
         # print(f"Processing {base_name} for {person_name}...")
-        pil_image = Image.open(image_path).convert("RGB")
-
-        # Resize for faster processing
-        if pil_image.width > RESIZE_WIDTH_FOR_ENROLLMENT:
-            ratio = RESIZE_WIDTH_FOR_ENROLLMENT / float(pil_image.width)
-            new_height = int(float(pil_image.height) * ratio)
-            pil_image = pil_image.resize((RESIZE_WIDTH_FOR_ENROLLMENT, new_height), Image.Resampling.LANCZOS)
+        # Decode straight at (close to) the enrollment width for faster processing
+        pil_image = open_for_analysis(image_path, RESIZE_WIDTH_FOR_ENROLLMENT)
 
         image = np.array(pil_image)
         
@@ -0,0 +1,193 @@
+"""
+LocalLens — Event Hub
+=====================
+Broadcasts status events (organizer progress, enrollment, job messages) to
+every connected /api/stream-logs client — the Tauri UI, an MCP agent, a
+second browser tab — with bounded memory however many listen or lag.
+
+Design Principles:
+  1. Broadcast, not hand-off — events live in one shared ring buffer and each
+     subscriber only owns a cursor into it, so every client sees every event
+  2. Bounded — the buffer keeps the last RING_CAPACITY events; nothing grows
+     when nobody is listening
+  3. Resumable — event ids are "<epoch>-<seq>"; a reconnecting EventSource
+     sends Last-Event-ID and continues right after the last event it saw.
+     A different epoch means the server restarted: the whole buffer is replayed
+  4. Slow consumers degrade, never block — publishers never wait. A subscriber
+     that fell off the end of the buffer is told how many events it missed;
+     one that is more than COALESCE_BACKLOG events behind receives only the
+     newest event per coalesce key (e.g. "progress:sorting") of each batch
+  5. Thread-safe publish — the organizer runs in worker threads; publish()
+     wakes asyncio subscribers through their loop's call_soon_threadsafe
+
+Usage:
+    from event_hub import event_hub
+    event_hub.publish(json.dumps(update), key="progress:sorting")
+    subscriber = event_hub.subscribe(last_event_id=request.headers.get("last-event-id"))
+    events, missed = await subscriber.next_batch(timeout=1.0)
+    ids = [event_hub.event_id(e) for e in events]
+    subscriber.close()
+"""
+
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from itertools import islice
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# ── Logger ──────────────────────────────────────────────────────────────────
+_log = logging.getLogger("locallens.event_hub")
+
+# ── Constants ─────────────────────────────────────────────────────────────
+RING_CAPACITY     = 2048     # Events kept for replay and slow subscribers
+MAX_BATCH         = 256      # Events handed to a subscriber per next_batch()
+COALESCE_BACKLOG  = 64       # Lag (in events) above which progress events coalesce
+
+
+class Event(NamedTuple):
+    seq: int
+    data: str
+    key: Optional[str]          # Events sharing a key supersede each other
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  Subscriber
+# ─────────────────────────────────────────────────────────────────────────────
+
+class Subscriber:
+    """One client's cursor into the hub. Create with EventHub.subscribe()."""
+
+    def __init__(self, hub: "EventHub", cursor: int):
+        self._hub = hub
+        self.cursor = cursor                # seq of the last event delivered
+        self.loop = asyncio.get_running_loop()
+        self.wakeup = asyncio.Event()
+        self.missed = 0
+        self.coalesced = 0
+
+    async def next_batch(self, timeout: float) -> Tuple[List[Event], int]:
+        """
+        Waits up to `timeout` seconds for events after this subscriber's cursor.
+        Returns (events, missed) — missed counts events that dropped off the
+        ring before they could be delivered. ([], 0) on timeout.
+        """
+        events, missed = self._hub._read(self)
+        if events or missed:
+            return events, missed
+        self.wakeup.clear()
+        events, missed = self._hub._read(self)   # Re-check: publish may have raced the clear
+        if events or missed:
+            return events, missed
+        try:
+            await asyncio.wait_for(self.wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            return [], 0
+        return self._hub._read(self)
+
+    def close(self) -> None:
+        self._hub._unsubscribe(self)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  EventHub class
+# ─────────────────────────────────────────────────────────────────────────────
+
+class EventHub:
+    """Ring buffer of published events plus the set of live subscribers."""
+
+    def __init__(self, capacity: int = RING_CAPACITY):
+        self.epoch = format(int(time.time()), "x")
+        self._ring: "deque[Event]" = deque(maxlen=capacity)
+        self._seq = 0
+        self._subscribers: List[Subscriber] = []
+        self._lock = threading.Lock()
+        self._published = 0
+
+    # ── Publishing ──────────────────────────────────────────────────────────
+
+    def publish(self, data: str, key: Optional[str] = None) -> int:
+        """Appends an event and wakes every subscriber. Safe from any thread; never blocks."""
+        with self._lock:
+            self._seq += 1
+            self._ring.append(Event(self._seq, data, key))
+            self._published += 1
+            subscribers = list(self._subscribers)
+            seq = self._seq
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.wakeup.set)
+            except RuntimeError:
+                # Loop already closed (server shutting down); the subscriber is gone.
+                self._unsubscribe(subscriber)
+        return seq
+
+    def event_id(self, event: Event) -> str:
+        """SSE id of an event; what the client sends back as Last-Event-ID."""
+        return f"{self.epoch}-{event.seq}"
+
+    # ── Subscribing ─────────────────────────────────────────────────────────
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> Subscriber:
+        """
+        New subscriber, positioned after `last_event_id` (the SSE Last-Event-ID)
+        when it belongs to this server run, at the start of the buffer when it is
+        from an earlier run, and at the live head when there is none.
+        Must be called from the event loop that will read it.
+        """
+        with self._lock:
+            cursor = self._seq
+            if last_event_id:
+                epoch, _, seq = last_event_id.partition("-")
+                if epoch != self.epoch:
+                    cursor = self._ring[0].seq - 1 if self._ring else self._seq
+                elif seq.isdigit():
+                    cursor = min(int(seq), self._seq)
+            subscriber = Subscriber(self, cursor)
+            self._subscribers.append(subscriber)
+        return subscriber
+
+    def _unsubscribe(self, subscriber: Subscriber) -> None:
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def _read(self, subscriber: Subscriber) -> Tuple[List[Event], int]:
+        with self._lock:
+            if not self._ring or subscriber.cursor >= self._seq:
+                return [], 0
+            oldest = self._ring[0].seq
+            missed = max(0, oldest - 1 - subscriber.cursor)
+            start = max(subscriber.cursor + 1, oldest) - oldest
+            backlog = len(self._ring) - start
+            events = list(islice(self._ring, start, start + MAX_BATCH))
+        subscriber.cursor = events[-1].seq
+        subscriber.missed += missed
+        if backlog > COALESCE_BACKLOG:
+            events = self._coalesce(events, subscriber)
+        return events, missed
+
+    @staticmethod
+    def _coalesce(events: List[Event], subscriber: Subscriber) -> List[Event]:
+        """Keeps only the newest event of each key; unkeyed events always pass."""
+        newest: Dict[str, int] = {e.key: e.seq for e in events if e.key is not None}
+        kept = [e for e in events if e.key is None or newest[e.key] == e.seq]
+        subscriber.coalesced += len(events) - len(kept)
+        return kept
+
+    # ── Stats ───────────────────────────────────────────────────────────────
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "subscribers": len(self._subscribers),
+                "buffered":    len(self._ring),
+                "capacity":    self._ring.maxlen,
+                "published":   self._published,
+                "last_seq":    self._seq,
+            }
+
+
+# ── Module-level singleton ────────────────────────────────────────────────
+event_hub = EventHub()
@@ -0,0 +1,110 @@
+"""
+LocalLens — Vectorized Face Matcher
+====================================
+Matches detected face encodings against the enrolled reference encodings with
+a single matrix operation instead of one Python-level comparison per face.
+
+Design Principles:
+  1. One contiguous float32 matrix — the enrolled encodings are packed once
+     per job (N × 128) together with their pre-computed squared norms
+  2. One pass per image or batch — all faces of an image (or of many images)
+     are scored at once via ||a − b||² = ||a||² + ||b||² − 2·a·b
+  3. Same decision rule as face_recognition — a face takes the name of its
+     nearest enrolled encoding if that distance is within the tolerance,
+     otherwise it is "Unknown"
+
+Replaces the compare_faces() + face_distance() pair, which computed the same
+distances twice against a Python list of float64 arrays for every face.
+"""
+
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# ── Constants ─────────────────────────────────────────────────────────────
+ENCODING_SIZE = 128           # dlib face descriptor length
+UNKNOWN_NAME  = "Unknown"
+
+
+class FaceMatcher:
+    """
+    Holds the enrolled encodings as a contiguous float32 matrix.
+
+    Usage:
+        matcher = FaceMatcher(known_encodings, known_names, tolerance=0.55)
+        matcher.match(face_encodings)          # [(name, distance), ...]
+        matcher.match_batch([faces_a, faces_b]) # one list per image
+    """
+
+    def __init__(self, known_encodings: Sequence, known_names: Sequence[str], tolerance: float):
+        matrix = np.asarray(known_encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        self._matrix = np.ascontiguousarray(matrix)
+        self._sq_norms = np.einsum("ij,ij->i", self._matrix, self._matrix)
+        self._names = list(known_names)
+        self.tolerance = float(tolerance)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    @property
+    def names(self) -> List[str]:
+        return self._names
+
+    # ── Core ────────────────────────────────────────────────────────────────
+
+    def distances(self, face_encodings) -> np.ndarray:
+        """Euclidean distance matrix (faces × enrolled) in float32."""
+        faces = np.asarray(face_encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        if not len(self._names) or not len(faces):
+            return np.empty((len(faces), len(self._names)), dtype=np.float32)
+        face_sq = np.einsum("ij,ij->i", faces, faces)
+        d2 = face_sq[:, None] + self._sq_norms[None, :] - 2.0 * (faces @ self._matrix.T)
+        # Rounding can push exact matches slightly below zero.
+        np.maximum(d2, 0.0, out=d2)
+        return np.sqrt(d2, out=d2)
+
+    def match(self, face_encodings) -> List[Tuple[Optional[str], float]]:
+        """
+        Best match for every face of one image, in input order.
+        Faces with non-finite encodings yield (None, inf) so callers can skip them.
+        """
+        faces = np.asarray(face_encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        if not len(faces):
+            return []
+        valid = np.isfinite(faces).all(axis=1)
+        results: List[Tuple[Optional[str], float]] = [(None, float("inf"))] * len(faces)
+        if not valid.any():
+            return results
+        if not len(self._names):
+            for i in np.flatnonzero(valid):
+                results[i] = (UNKNOWN_NAME, float("inf"))
+            return results
+
+        valid_idx = np.flatnonzero(valid)
+        dist = self.distances(faces[valid_idx])
+        best = np.argmin(dist, axis=1)
+        best_dist = dist[np.arange(len(valid_idx)), best]
+        for row, face_idx in enumerate(valid_idx):
+            d = float(best_dist[row])
+            name = self._names[best[row]] if d <= self.tolerance else UNKNOWN_NAME
+            results[face_idx] = (name, d)
+        return results
+
+    def match_batch(self, encodings_per_image: Sequence) -> List[List[Tuple[Optional[str], float]]]:
+        """Scores the faces of many images in one matrix operation; one result list per image."""
+        counts = [len(e) for e in encodings_per_image]
+        if not sum(counts):
+            return [[] for _ in counts]
+        stacked = np.concatenate(
+            [np.asarray(e, dtype=np.float32).reshape(-1, ENCODING_SIZE) for e in encodings_per_image if len(e)]
+        )
+        flat = self.match(stacked)
+        out, start = [], 0
+        for n in counts:
+            out.append(flat[start:start + n])
+            start += n
+        return out
+
+    def names_in(self, face_encodings) -> List[str]:
+        """Distinct names found in one image ("Unknown" included), skipping invalid faces."""
+        return list({name for name, _ in self.match(face_encodings) if name is not None})
@@ -0,0 +1,172 @@
+"""
+LocalLens — Kernel-Accelerated File Copies
+===========================================
+Drop-in replacement for shutil.copy2 used by every copy the organizer makes.
+On Linux the bytes are handed to the kernel instead of being pumped through
+user space, and on copy-on-write filesystems (btrfs, XFS with reflink=1) they
+are not copied at all.
+
+Design Principles:
+  1. Cheapest method first — FICLONE reflink (shares extents, near-instant, no
+     extra space) → os.copy_file_range (in-kernel, server-side on NFS 4.2/SMB)
+     → os.sendfile → buffered copy
+  2. Resumable fallbacks — each method continues from the file offsets the
+     previous one reached, so a method failing half-way never re-copies or
+     corrupts data
+  3. Remember what does not work — a (source device, destination device) pair
+     on which reflinks or copy_file_range are unsupported is not retried
+  4. Identical result — data first, then shutil.copystat(), exactly what
+     shutil.copy2 does; non-Linux platforms simply call shutil.copy2
+
+Usage:
+    from fast_copy import copy2
+    copy2(src, dst)     # same signature and return value as shutil.copy2(src, dst)
+"""
+
+import os
+import sys
+import errno
+import shutil
+import logging
+import threading
+from typing import Dict, Set, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Windows
+
+# ── Logger ──────────────────────────────────────────────────────────────────
+_log = logging.getLogger("locallens.fast_copy")
+
+# ── Constants ─────────────────────────────────────────────────────────────
+FICLONE            = 0x40049409           # _IOW(0x94, 9, int) from <linux/fs.h>
+CHUNK_BYTES        = 8 * 1024 * 1024      # Per copy_file_range / sendfile call
+BUFFER_BYTES       = 1024 * 1024          # Buffered fallback
+METHOD_REFLINK     = "reflink"
+METHOD_COPY_RANGE  = "copy_file_range"
+METHOD_SENDFILE    = "sendfile"
+METHOD_BUFFERED    = "buffered"
+
+_IS_LINUX = sys.platform.startswith("linux")
+# Errors meaning "this method cannot be used here", not "the copy failed".
+_UNSUPPORTED = {
+    errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EBADF, errno.ENOTTY, errno.EPERM,
+    getattr(errno, "EOPNOTSUPP", errno.EINVAL), getattr(errno, "ENOTSUP", errno.EINVAL),
+}
+
+_unsupported: Dict[str, Set[Tuple[int, int]]] = {METHOD_REFLINK: set(), METHOD_COPY_RANGE: set()}
+_stats: Dict[str, int] = {METHOD_REFLINK: 0, METHOD_COPY_RANGE: 0, METHOD_SENDFILE: 0, METHOD_BUFFERED: 0}
+_lock = threading.Lock()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  Copy methods
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _mark_unsupported(method: str, devices: Tuple[int, int]) -> None:
+    with _lock:
+        if devices not in _unsupported[method]:
+            _unsupported[method].add(devices)
+            _log.info(f"{method} unavailable between devices {devices}; falling back")
+
+
+def _try_reflink(in_fd: int, out_fd: int, devices: Tuple[int, int]) -> bool:
+    if fcntl is None or devices in _unsupported[METHOD_REFLINK]:
+        return False
+    try:
+        fcntl.ioctl(out_fd, FICLONE, in_fd)
+        return True
+    except OSError as e:
+        if e.errno not in _UNSUPPORTED:
+            raise
+        _mark_unsupported(METHOD_REFLINK, devices)
+        return False
+
+
+def _try_copy_file_range(in_fd: int, out_fd: int, remaining: int, devices: Tuple[int, int]) -> int:
+    """Copies up to `remaining` bytes; returns how many were copied before stopping."""
+    if not hasattr(os, "copy_file_range") or devices in _unsupported[METHOD_COPY_RANGE]:
+        return 0
+    copied = 0
+    while copied < remaining:
+        try:
+            n = os.copy_file_range(in_fd, out_fd, min(CHUNK_BYTES, remaining - copied))
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED:
+                raise
+            if copied == 0:
+                _mark_unsupported(METHOD_COPY_RANGE, devices)
+            break
+        if n == 0:
+            break  # Some filesystems report 0 instead of failing; let the next method finish
+        copied += n
+    return copied
+
+
+def _try_sendfile(in_fd: int, out_fd: int, remaining: int) -> int:
+    if not hasattr(os, "sendfile"):
+        return 0
+    copied = 0
+    while copied < remaining:
+        try:
+            n = os.sendfile(out_fd, in_fd, None, min(CHUNK_BYTES, remaining - copied))
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED:
+                raise
+            break
+        if n == 0:
+            break
+        copied += n
+    return copied
+
+
+def _copy_data(fsrc, fdst) -> str:
+    """Copies the open source file into the open destination; returns the method that finished it."""
+    in_fd, out_fd = fsrc.fileno(), fdst.fileno()
+    in_st, out_st = os.fstat(in_fd), os.fstat(out_fd)
+    devices = (in_st.st_dev, out_st.st_dev)
+    size = in_st.st_size
+
+    if size > 0 and _try_reflink(in_fd, out_fd, devices):
+        return METHOD_REFLINK
+
+    copied = _try_copy_file_range(in_fd, out_fd, size, devices)
+    if copied >= size:
+        return METHOD_COPY_RANGE
+
+    copied += _try_sendfile(in_fd, out_fd, size - copied)
+    if copied >= size:
+        return METHOD_SENDFILE
+
+    # Buffered copy from wherever the kernel methods stopped (also catches files that grew).
+    os.lseek(in_fd, copied, os.SEEK_SET)
+    os.lseek(out_fd, copied, os.SEEK_SET)
+    shutil.copyfileobj(fsrc, fdst, BUFFER_BYTES)
+    return METHOD_BUFFERED
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  Public API
+# ─────────────────────────────────────────────────────────────────────────────
+
+def copy2(src: str, dst: str) -> str:
+    """shutil.copy2(src, dst) for a file destination, using the fastest copy the OS offers."""
+    if not _IS_LINUX:
+        return shutil.copy2(src, dst)
+    if os.path.isdir(dst):
+        dst = os.path.join(dst, os.path.basename(src))
+    if shutil._samefile(src, dst):
+        raise shutil.SameFileError(f"{src!r} and {dst!r} are the same file")
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        method = _copy_data(fsrc, fdst)
+    shutil.copystat(src, dst)
+    with _lock:
+        _stats[method] += 1
+    return dst
+
+
+def get_stats() -> Dict[str, int]:
+    """Number of copies finished by each method in this process."""
+    with _lock:
+        return dict(_stats)
@@ -0,0 +1,200 @@
+"""
+LocalLens — Content Fingerprints
+=================================
+One place that answers "which bytes is this file?" for the analysis cache,
+the metadata store, the duplicate finder and the move journal, so a photo is
+read for hashing at most once per job however many of them ask.
+
+Design Principles:
+  1. Cheap by default — the fingerprint is BLAKE2b over the file size plus its
+     first and last HASH_CHUNK_BYTES: two small reads, stable across moves and
+     copies, and a practical identity for camera files
+  2. Full hash on demand — full() hashes every byte (xxHash3-128 when the
+     optional `xxhash` package is installed, BLAKE2b otherwise) for callers that
+     must prove two files are byte-identical
+  3. Computed once — results are cached per (path, size, mtime_ns) in a bounded
+     LRU; a touched or rewritten file gets a new key and is hashed again
+  4. Taken at the source — the sorting pipeline fingerprints each file during
+     analysis, before it is moved, and hands the value on; nothing downstream
+     has to re-read the file (or fall back to hashing its path)
+  5. Cheapest proof first — identical_groups() buckets files by size, then by
+     partial hash, and reads whole files only where both collide
+
+Usage:
+    from fingerprint import fingerprints
+    fingerprints.partial(path, st)      # "3f9a…" (size + head/tail), cached
+    fingerprints.full(path, st)         # "xxh3:…" / "blake2b:…", cached
+    identical_groups([(path, st), ...]) # [[path, path, …], …] byte-identical sets
+"""
+
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import xxhash as _xxhash
+except ImportError:
+    _xxhash = None  # Optional: BLAKE2b is used for full hashes instead
+
+# ── Logger ──────────────────────────────────────────────────────────────────
+_log = logging.getLogger("locallens.fingerprint")
+
+# ── Constants ─────────────────────────────────────────────────────────────
+HASH_CHUNK_BYTES    = 64 * 1024        # Head + tail bytes fed to the partial hash
+FULL_CHUNK_BYTES    = 1024 * 1024      # Read size for full-content hashes
+MAX_CACHED_FILES    = 200_000          # LRU bound (~100 bytes per entry)
+FULL_HASH_ALGORITHM = "xxh3" if _xxhash is not None else "blake2b"
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  Hash functions (uncached)
+# ─────────────────────────────────────────────────────────────────────────────
+
+def partial_content_hash(path: str, size: Optional[int] = None) -> Optional[str]:
+    """
+    BLAKE2b over the file size plus its first and last HASH_CHUNK_BYTES
+    (every byte when the file is no larger than both together).
+    Cheap enough for the hot path, and stable across moves and copies.
+    """
+    try:
+        if size is None:
+            size = os.path.getsize(path)
+        h = hashlib.blake2b(digest_size=16)
+        h.update(str(size).encode())
+        with open(path, "rb") as f:
+            if size <= 2 * HASH_CHUNK_BYTES:
+                h.update(f.read())
+            else:
+                h.update(f.read(HASH_CHUNK_BYTES))
+                f.seek(max(HASH_CHUNK_BYTES, size - HASH_CHUNK_BYTES))
+                h.update(f.read(HASH_CHUNK_BYTES))
+        return h.hexdigest()
+    except OSError:
+        return None
+
+
+def full_content_hash(path: str) -> Optional[str]:
+    """Hash of every byte, prefixed with the algorithm ("xxh3:…" or "blake2b:…")."""
+    h = _xxhash.xxh3_128() if _xxhash is not None else hashlib.blake2b(digest_size=16)
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(FULL_CHUNK_BYTES), b""):
+                h.update(chunk)
+    except OSError:
+        return None
+    return f"{FULL_HASH_ALGORITHM}:{h.hexdigest()}"
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  Cached service
+# ─────────────────────────────────────────────────────────────────────────────
+
+class FingerprintService:
+    """Process-wide cache of partial and full content hashes."""
+
+    def __init__(self, max_entries: int = MAX_CACHED_FILES):
+        self._max_entries = max_entries
+        self._cache: "OrderedDict[Tuple[str, int, int], Dict[str, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.computed = 0
+
+    @staticmethod
+    def _key(path: str, st: Optional[os.stat_result]) -> Optional[Tuple[str, int, int]]:
+        try:
+            st = st or os.stat(path)
+        except OSError:
+            return None
+        return (path, st.st_size, st.st_mtime_ns)
+
+    def _get(self, key, kind: str) -> Optional[str]:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None or kind not in entry:
+                return None
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return entry[kind]
+
+    def _put(self, key, kind: str, value: str) -> None:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                entry = self._cache[key] = {}
+                if len(self._cache) > self._max_entries:
+                    self._cache.popitem(last=False)
+            else:
+                self._cache.move_to_end(key)
+            entry[kind] = value
+
+    def _lookup(self, path: str, st: Optional[os.stat_result], kind: str, compute) -> Optional[str]:
+        key = self._key(path, st)
+        if key is None:
+            return None
+        value = self._get(key, kind)
+        if value is None:
+            value = compute(path, key[1])
+            if value is not None:
+                with self._lock:
+                    self.computed += 1
+                self._put(key, kind, value)
+        return value
+
+    def partial(self, path: str, st: Optional[os.stat_result] = None) -> Optional[str]:
+        """Size + head/tail fingerprint of `path`; None if it cannot be read."""
+        return self._lookup(path, st, "partial", partial_content_hash)
+
+    def full(self, path: str, st: Optional[os.stat_result] = None) -> Optional[str]:
+        """Full-content hash of `path`; None if it cannot be read."""
+        return self._lookup(path, st, "full", lambda p, _size: full_content_hash(p))
+
+    def remember(self, path: str, st: os.stat_result, partial: Optional[str]) -> None:
+        """Seeds the cache with a fingerprint known from elsewhere (e.g. the analysis cache)."""
+        if partial:
+            self._put((path, st.st_size, st.st_mtime_ns), "partial", partial)
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"cached_files": len(self._cache), "hits": self.hits, "computed": self.computed}
+
+
+# ── Module-level singleton ────────────────────────────────────────────────
+fingerprints = FingerprintService()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  Exact duplicates
+# ─────────────────────────────────────────────────────────────────────────────
+
+def identical_groups(files: Iterable[Tuple[str, os.stat_result]]) -> List[List[str]]:
+    """
+    Sets of byte-identical files (two or more paths each, in input order).
+    Size → partial hash → full hash: a file with a unique size is never opened,
+    and only files whose size and head/tail both collide are read in full.
+    """
+    by_size: Dict[int, list] = defaultdict(list)
+    for path, st in files:
+        by_size[st.st_size].append((path, st))
+
+    groups = []
+    for same_size in by_size.values():
+        if len(same_size) < 2:
+            continue
+        by_partial: Dict[str, list] = defaultdict(list)
+        for path, st in same_size:
+            partial = fingerprints.partial(path, st)
+            if partial:
+                by_partial[partial].append((path, st))
+        for candidates in by_partial.values():
+            if len(candidates) < 2:
+                continue
+            by_full: Dict[str, List[str]] = defaultdict(list)
+            for path, st in candidates:
+                full = fingerprints.full(path, st)
+                if full:
+                    by_full[full].append(path)
+            groups.extend(g for g in by_full.values() if len(g) > 1)
+    return groups
@@ -0,0 +1,307 @@
+"""
+LocalLens — Reverse Geocoding Service
+======================================
+Turns GPS coordinates into "Country/State/City" folder paths.
+
+Design Principles:
+  1. Batched — coordinates for many files are resolved with one vectorized
+     KD-tree query (reverse_geocoder accepts a list) instead of one search
+     per photo
+  2. Memoized — results are kept in an LRU cache keyed on coordinates rounded
+     to QUANTIZE_DECIMALS (~110 m); photos from one shoot share a location,
+     so most lookups never reach the KD-tree
+  3. Observable — hit/miss/query counters are exposed via get_stats()
+  4. Thread-safe — the pipeline's metadata workers share one service
+  5. Compact, lazy dataset — instead of parsing reverse_geocoder's CSV in
+     every process, a precompiled dataset is memory-mapped on the first
+     lookup: float32 coordinates, int32 indexes into interned admin names,
+     and a pickled KD-tree. The mapped columns live in the shared page cache
+     (and forked workers inherit a loaded dataset copy-on-write)
+
+Dataset lookup order: $LOCALLENS_GEODATA_DIR, the PyInstaller bundle,
+backend/geodata/, then ~/.config/LocalLens/geodata/ — which is compiled once
+from reverse_geocoder's rg_cities1000.csv if no shipped copy exists. Build a
+copy for packaging with:  python geocoding.py --build <out_dir>
+
+Usage:
+    from geocoding import geocoder
+    geocoder.resolve(lat, lon)                      # "IN/Uttar-Pradesh/Lucknow" or None
+    geocoder.resolve_many([(lat, lon), ...])        # one result per input, in order
+"""
+
+import csv
+import importlib.util
+import json
+import logging
+import os
+import pickle
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# ── Logger ──────────────────────────────────────────────────────────────────
+_log = logging.getLogger("locallens.geocoding")
+
+# ── Constants ─────────────────────────────────────────────────────────────
+QUANTIZE_DECIMALS = 3          # 0.001° ≈ 110 m — well below the city grid
+CACHE_MAX_ENTRIES = 50_000     # LRU capacity (a few MB)
+BATCH_SIZE        = 512        # Files whose coordinates are resolved together
+
+GEODATA_DIRNAME   = "geodata"
+COORDS_FILE       = "cities_coords.npy"   # float32 (N, 2): lat, lon
+ADMIN_FILE        = "cities_admin.npy"    # int32 (N, 3): name indexes of cc, admin1, city
+NAMES_FILE        = "cities_names.json"   # interned strings referenced by ADMIN_FILE
+TREE_FILE         = "cities_tree.pkl"     # pickled scipy cKDTree over the coordinates
+DATASET_FILES     = (COORDS_FILE, ADMIN_FILE, NAMES_FILE, TREE_FILE)
+RG_CSV_FILENAME   = "rg_cities1000.csv"
+
+_MISSING = object()
+
+
+def _quantize(lat: float, lon: float) -> Tuple[float, float]:
+    return (round(float(lat), QUANTIZE_DECIMALS), round(float(lon), QUANTIZE_DECIMALS))
+
+
+def _format_location(loc_data: Dict[str, Any]) -> Optional[str]:
+    """'Country/State/City' path from a reverse_geocoder record (spaces become dashes)."""
+    country = loc_data.get('cc', '').replace(' ', '-')
+    state = loc_data.get('admin1', '').replace(' ', '-')
+    city = loc_data.get('name', '').replace(' ', '-')
+    path_parts = [p for p in [country, state, city] if p]
+    return os.path.join(*path_parts) if path_parts else None
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  Compact dataset
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _get_config_dir() -> Path:
+    """Return the OS-appropriate LocalLens config directory."""
+    if sys.platform == "win32":
+        base = Path(os.environ.get("APPDATA", Path.home()))
+    else:
+        base = Path.home() / ".config"
+    config_dir = base / "LocalLens"
+    config_dir.mkdir(parents=True, exist_ok=True)
+    return config_dir
+
+
+def _find_rg_csv() -> Optional[Path]:
+    """Locates reverse_geocoder's bundled CSV without importing (or loading) the package."""
+    spec = importlib.util.find_spec("reverse_geocoder")
+    if spec is None or not spec.origin:
+        return None
+    path = Path(spec.origin).parent / RG_CSV_FILENAME
+    return path if path.exists() else None
+
+
+def build_compact_dataset(csv_path, out_dir) -> Path:
+    """Compiles reverse_geocoder's CSV into the memory-mappable dataset files in `out_dir`."""
+    from scipy.spatial import cKDTree
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    names: List[str] = []
+    name_index: Dict[str, int] = {}
+
+    def intern(value: str) -> int:
+        if value not in name_index:
+            name_index[value] = len(names)
+            names.append(value)
+        return name_index[value]
+
+    coords, admin = [], []
+    with open(csv_path, "rt", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            coords.append((float(row["lat"]), float(row["lon"])))
+            admin.append((intern(row["cc"]), intern(row["admin1"]), intern(row["name"])))
+
+    coords_arr = np.asarray(coords, dtype=np.float32)
+    tree = cKDTree(coords_arr.astype(np.float64))
+
+    # Write to temporary names first so a concurrent reader never sees half a dataset.
+    tmp = {name: out_dir / f".{name}.tmp" for name in DATASET_FILES}
+    with open(tmp[COORDS_FILE], "wb") as f:
+        np.save(f, coords_arr)
+    with open(tmp[ADMIN_FILE], "wb") as f:
+        np.save(f, np.asarray(admin, dtype=np.int32))
+    tmp[NAMES_FILE].write_text(json.dumps(names, ensure_ascii=False), encoding="utf-8")
+    with open(tmp[TREE_FILE], "wb") as f:
+        pickle.dump(tree, f, protocol=pickle.HIGHEST_PROTOCOL)
+    for name, path in tmp.items():
+        os.replace(path, out_dir / name)
+    _log.info(f"Compiled geocoder dataset ({len(coords)} places) into {out_dir}")
+    return out_dir
+
+
+def _dataset_candidates() -> List[Path]:
+    candidates = []
+    if os.environ.get("LOCALLENS_GEODATA_DIR"):
+        candidates.append(Path(os.environ["LOCALLENS_GEODATA_DIR"]))
+    if getattr(sys, "frozen", False) and hasattr(sys, "_MEIPASS"):
+        candidates.append(Path(sys._MEIPASS) / GEODATA_DIRNAME)
+    candidates.append(Path(__file__).resolve().parent / GEODATA_DIRNAME)
+    candidates.append(_get_config_dir() / GEODATA_DIRNAME)
+    return candidates
+
+
+class _CompactGeoData:
+    """The memory-mapped place table plus its KD-tree, loaded on first use."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = False
+        self.coords = None
+        self.admin = None
+        self.names: List[str] = []
+        self.tree = None
+        self.source: Optional[str] = None
+
+    def _locate(self) -> Optional[Path]:
+        candidates = _dataset_candidates()
+        for directory in candidates:
+            if all((directory / name).exists() for name in DATASET_FILES):
+                return directory
+        csv_path = _find_rg_csv()
+        if csv_path is None:
+            return None
+        return build_compact_dataset(csv_path, candidates[-1])
+
+    def load(self) -> None:
+        with self._lock:
+            if self._loaded:
+                return
+            directory = self._locate()
+            if directory is None:
+                raise RuntimeError("No geocoder dataset found and reverse_geocoder is not installed.")
+            self.coords = np.load(directory / COORDS_FILE, mmap_mode="r")
+            self.admin = np.load(directory / ADMIN_FILE, mmap_mode="r")
+            self.names = json.loads((directory / NAMES_FILE).read_text(encoding="utf-8"))
+            try:
+                with open(directory / TREE_FILE, "rb") as f:
+                    self.tree = pickle.load(f)
+            except Exception as e:
+                # e.g. a tree pickled by a different SciPy version — rebuilding takes well under a second.
+                from scipy.spatial import cKDTree
+                _log.info(f"Rebuilding geocoder KD-tree ({e})")
+                self.tree = cKDTree(np.asarray(self.coords, dtype=np.float64))
+            self.source = str(directory)
+            self._loaded = True
+            _log.info(f"Geocoder dataset loaded from {directory} ({len(self.coords)} places)")
+
+    def search(self, keys: List[Tuple[float, float]]) -> List[Optional[str]]:
+        """Nearest place for every (lat, lon) key, formatted as a location path."""
+        self.load()
+        _, indexes = self.tree.query(np.asarray(keys, dtype=np.float64), k=1)
+        names = self.names
+        results = []
+        for cc, admin1, city in self.admin[np.atleast_1d(indexes)]:
+            results.append(_format_location({"cc": names[cc], "admin1": names[admin1], "name": names[city]}))
+        return results
+
+
+class GeocodingService:
+    """Batched, LRU-memoized front-end to reverse_geocoder."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self._data = _CompactGeoData()
+        self._cache: "OrderedDict[Tuple[float, float], Optional[str]]" = OrderedDict()
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.queries = 0          # KD-tree searches issued (one per batch)
+
+    # ── Public API ──────────────────────────────────────────────────────────
+
+    def resolve(self, lat: float, lon: float) -> Optional[str]:
+        """Location path for one coordinate pair, or None if it cannot be resolved."""
+        return self.resolve_many([(lat, lon)])[0]
+
+    def resolve_many(self, coords: Iterable[Tuple[float, float]]) -> List[Optional[str]]:
+        """
+        Location paths for many coordinate pairs, in input order. All cache
+        misses are answered by a single reverse_geocoder search.
+        """
+        keys = [_quantize(lat, lon) for lat, lon in coords]
+        results: List[Any] = [_MISSING] * len(keys)
+        pending: Dict[Tuple[float, float], List[int]] = {}
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                cached = self._cache.get(key, _MISSING)
+                if cached is _MISSING:
+                    pending.setdefault(key, []).append(i)
+                else:
+                    self._cache.move_to_end(key)
+                    results[i] = cached
+            # Repeats of a pending key within the batch count as hits: they cost no search.
+            self.hits += len(keys) - len(pending)
+            self.misses += len(pending)
+
+        if pending:
+            resolved = self._search(list(pending))
+            with self._lock:
+                for key, indexes in pending.items():
+                    location = resolved.get(key) if resolved is not None else None
+                    if resolved is not None:
+                        self._remember(key, location)
+                    for i in indexes:
+                        results[i] = location
+        return results
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "cached_locations": len(self._cache),
+                "hits":             self.hits,
+                "misses":           self.misses,
+                "hit_rate":         round(self.hits / lookups, 3) if lookups else 0.0,
+                "kd_tree_queries":  self.queries,
+                "dataset":          self._data.source,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    # ── Internals ───────────────────────────────────────────────────────────
+
+    def _search(self, keys: List[Tuple[float, float]]) -> Optional[Dict[Tuple[float, float], Optional[str]]]:
+        """One vectorized KD-tree query for all `keys`; None if the search failed (nothing is cached)."""
+        try:
+            with self._lock:
+                self.queries += 1
+            return dict(zip(keys, self._data.search(keys)))
+        except Exception as e:
+            _log.warning(f"Could not resolve {len(keys)} location(s): {e}")
+            return None
+
+    def _remember(self, key: Tuple[float, float], location: Optional[str]) -> None:
+        self._cache[key] = location
+        self._cache.move_to_end(key)
+        while len(self._cache) > self._max_entries:
+            self._cache.popitem(last=False)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  Module-level singleton
+# ─────────────────────────────────────────────────────────────────────────────
+
+geocoder = GeocodingService()
+
+
+if __name__ == "__main__":
+    # Packaging helper: python geocoding.py --build <out_dir> [rg_cities1000.csv]
+    if len(sys.argv) >= 3 and sys.argv[1] == "--build":
+        source = Path(sys.argv[3]) if len(sys.argv) > 3 else _find_rg_csv()
+        if source is None:
+            sys.exit("reverse_geocoder is not installed; pass the CSV path explicitly.")
+        build_compact_dataset(source, sys.argv[2])
+    else:
+        sys.exit("usage: python geocoding.py --build <out_dir> [rg_cities1000.csv]")
@@ -0,0 +1,217 @@
+"""
+LocalLens — Reduced-Resolution Image Decoding
+==============================================
+Face analysis only ever looks at an 800 px (organizer) or 600 px (enrollment)
+wide image, yet a 24–48 MP photo used to be decoded at full size, converted to
+RGB and only then resampled. This module asks each decoder for roughly the
+target size up front.
+
+Design Principles:
+  1. JPEG — Image.draft() lets libjpeg decode at 1/2, 1/4 or 1/8 scale (DCT
+     scaling), never smaller than the requested size
+  2. HEIC/HEIF — the embedded thumbnail is used when it is at least as wide as
+     the target; otherwise the primary image is decoded as before
+  3. Everything else — Image.reduce() box-averages by an integer factor before
+     the final LANCZOS resample, which then only has a small image to work on
+  4. Same contract as before — callers still get an RGB image no wider than
+     the target width, with the original aspect ratio
+
+Camera RAW files (DNG, CR2, CR3, NEF, ARW, RAF) follow a configurable decode
+policy instead of a full 16-bit demosaic:
+
+    "preview"    embedded JPEG preview → half-size demosaic → full decode
+    "half_size"  half-size demosaic → full decode
+    "full"       full demosaic only (the original behaviour)
+
+Wand (ImageMagick) remains the last resort when rawpy is missing or fails.
+open_for_analysis() raises exactly like Image.open() when Pillow cannot read a
+file, so callers decide when to try decode_raw_for_analysis().
+"""
+
+import io
+import logging
+import os
+from typing import Optional
+
+from PIL import Image, ImageOps
+
+try:
+    import pillow_heif
+except Exception:
+    pillow_heif = None
+
+try:
+    import rawpy
+except Exception:
+    rawpy = None
+
+try:
+    from wand.image import Image as WandImage
+except Exception:
+    WandImage = None
+
+# ── Logger ──────────────────────────────────────────────────────────────────
+_log = logging.getLogger("locallens.image_decode")
+
+# ── Constants ─────────────────────────────────────────────────────────────
+HEIF_EXTENSIONS   = ('.heic', '.heif')
+RAW_EXTENSIONS    = ('.dng', '.cr2', '.cr3', '.nef', '.arw', '.raf')
+REDUCE_MODES      = ("RGB", "RGBA", "L", "LA", "I", "F")   # Modes Image.reduce() accepts
+
+RAW_POLICY_PREVIEW   = "preview"
+RAW_POLICY_HALF_SIZE = "half_size"
+RAW_POLICY_FULL      = "full"
+RAW_DECODE_POLICIES  = (RAW_POLICY_PREVIEW, RAW_POLICY_HALF_SIZE, RAW_POLICY_FULL)
+DEFAULT_RAW_POLICY   = RAW_POLICY_PREVIEW
+
+# LibRaw "flip" codes → the PIL transpose that puts the image upright
+_RAW_FLIP_TRANSPOSE = {
+    3: Image.Transpose.ROTATE_180,
+    5: Image.Transpose.ROTATE_90,
+    6: Image.Transpose.ROTATE_270,
+}
+
+
+def _target_size(width: int, height: int, target_width: int):
+    ratio = target_width / float(width)
+    return target_width, max(1, int(float(height) * ratio))
+
+
+def _open_heif_thumbnail(image_path: str, target_width: int) -> Optional[Image.Image]:
+    """Returns the smallest embedded HEIF thumbnail at least `target_width` wide, or None."""
+    if pillow_heif is None:
+        return None
+    try:
+        heif_file = pillow_heif.open_heif(image_path, convert_hdr_to_8bit=True)
+        thumbnails = [t for t in heif_file.thumbnails if t.size[0] >= target_width]
+        if not thumbnails:
+            return None
+        thumb = min(thumbnails, key=lambda t: t.size[0])
+        return Image.frombytes(thumb.mode, thumb.size, bytes(thumb.data), "raw", thumb.mode, thumb.stride)
+    except Exception as e:
+        _log.debug(f"No usable HEIF thumbnail in {os.path.basename(image_path)}: {e}")
+        return None
+
+
+def downscale_for_analysis(image: Image.Image, target_width: int) -> Image.Image:
+    """
+    Converts an open (not yet loaded) image to RGB no wider than `target_width`.
+    Requests a scaled JPEG decode via draft(), reduces by an integer factor and
+    finishes with a LANCZOS resample.
+    """
+    if image.width > target_width:
+        # No-op for formats without scaled decoding; must run before load().
+        image.draft("RGB", _target_size(image.width, image.height, target_width))
+
+    if image.width > target_width:
+        factor = image.width // target_width
+        if factor >= 2:
+            if image.mode not in REDUCE_MODES:
+                image = image.convert("RGB")
+            image = image.reduce(factor)
+
+    image = image.convert("RGB")
+    if image.width > target_width:
+        image = image.resize(_target_size(image.width, image.height, target_width), Image.Resampling.LANCZOS)
+    return image
+
+
+def open_for_analysis(image_path: str, target_width: int) -> Image.Image:
+    """
+    Opens `image_path` decoded at (close to) `target_width` and returns an RGB
+    image no wider than that. Raises like Image.open() if Pillow cannot read it.
+    """
+    if image_path.lower().endswith(HEIF_EXTENSIONS):
+        thumb = _open_heif_thumbnail(image_path, target_width)
+        if thumb is not None:
+            return downscale_for_analysis(thumb, target_width)
+
+    with Image.open(image_path) as image:
+        return downscale_for_analysis(image, target_width)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  Camera RAW
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _raw_preview(raw, target_width: int) -> Optional[Image.Image]:
+    """The embedded preview, upright, if it is at least `target_width` wide; otherwise None."""
+    try:
+        thumb = raw.extract_thumb()
+    except Exception:
+        return None  # rawpy.LibRawNoThumbnailError / LibRawUnsupportedThumbnailError
+
+    if thumb.format == rawpy.ThumbFormat.JPEG:
+        image = Image.open(io.BytesIO(thumb.data))
+        if image.getexif().get(0x0112, 1) != 1:
+            # The preview carries its own orientation tag.
+            image = ImageOps.exif_transpose(image)
+            return downscale_for_analysis(image, target_width) if image.width >= target_width else None
+    elif thumb.format == rawpy.ThumbFormat.BITMAP:
+        image = Image.fromarray(thumb.data)
+    else:
+        return None
+
+    transpose = _RAW_FLIP_TRANSPOSE.get(raw.sizes.flip)
+    # Width of the preview once it is upright (portrait shots are stored sideways).
+    quarter_turn = transpose in (Image.Transpose.ROTATE_90, Image.Transpose.ROTATE_270)
+    upright_width = image.height if quarter_turn else image.width
+    if upright_width < target_width:
+        return None
+    if quarter_turn:
+        # Scale the sideways image so that it is `target_width` wide after rotating.
+        target_width = max(1, round(target_width * image.width / image.height))
+    image = downscale_for_analysis(image, target_width)
+    return image.transpose(transpose) if transpose is not None else image
+
+
+def _raw_with_rawpy(image_path: str, target_width: int, policy: str) -> Optional[Image.Image]:
+    with rawpy.imread(image_path) as raw:
+        if policy == RAW_POLICY_PREVIEW:
+            image = _raw_preview(raw, target_width)
+            if image is not None:
+                return image
+        if policy in (RAW_POLICY_PREVIEW, RAW_POLICY_HALF_SIZE):
+            # Half-size skips demosaicing entirely: one RGB pixel per Bayer quad.
+            rgb_array = raw.postprocess(half_size=True, use_camera_wb=True, output_bps=8)
+            if rgb_array.shape[1] >= target_width:
+                return downscale_for_analysis(Image.fromarray(rgb_array), target_width)
+        # Last resort: full demosaic
+        rgb_array = raw.postprocess()
+    return downscale_for_analysis(Image.fromarray(rgb_array), target_width)
+
+
+def decode_raw_for_analysis(image_path: str, target_width: int, policy: str = DEFAULT_RAW_POLICY) -> Optional[Image.Image]:
+    """
+    Decodes a Camera RAW file into an RGB image no wider than `target_width`
+    following `policy` (see RAW_DECODE_POLICIES). Returns None if neither
+    rawpy nor Wand can read it.
+    """
+    if policy not in RAW_DECODE_POLICIES:
+        _log.warning(f"Unknown RAW decode policy '{policy}', using '{DEFAULT_RAW_POLICY}'.")
+        policy = DEFAULT_RAW_POLICY
+    name = os.path.basename(image_path)
+
+    # Try rawpy first (preferred)
+    if rawpy is not None:
+        try:
+            image = _raw_with_rawpy(image_path, target_width, policy)
+            _log.info(f"Decoded Raw file '{name}' via rawpy ({policy}).")
+            return image
+        except Exception as e:
+            _log.warning(f"Could not process Raw file {name} with rawpy: {e}")
+
+    # Try Wand if rawpy failed or is missing
+    if WandImage is not None:
+        try:
+            with WandImage(filename=image_path) as img:
+                if img.width > target_width:
+                    # sample() keeps ImageMagick from handing back full-size pixels.
+                    img.sample(*_target_size(img.width, img.height, target_width))
+                img_blob = img.make_blob(format='RGB')
+                image = Image.frombytes('RGB', (img.width, img.height), img_blob)
+            _log.info(f"Decoded Raw file '{name}' via Wand.")
+            return downscale_for_analysis(image, target_width)
+        except Exception as e:
+            _log.warning(f"Could not process Raw file {name} with Wand: {e}")
+    return None
@@ -0,0 +1,425 @@
+"""
+LocalLens — Background Job Executor
+====================================
+Runs the API's long blocking work — organize jobs, folder walks, duplicate
+scans, metadata overviews, PDF reports, bulk deletes — away from the uvicorn
+event loop, so log streaming, /api/job-status polling and /api/health stay
+responsive while it runs, and several jobs can run side by side.
+
+Design Principles:
+  1. The event loop only waits — an endpoint hands its work to an executor and
+     awaits the job (or, with ?background=true, returns its id at once)
+  2. One bounded pool per workload class — WORKLOAD_ORGANIZE (sorting, Find &
+     Group, enrollment), WORKLOAD_IO (directory walks, deletes) and
+     WORKLOAD_CPU (decoding, EXIF, PDF rendering) each have a fixed number of
+     threads, so a burst of one kind cannot starve the others;
+     WORKLOAD_PROCESS spreads picklable per-file work (image hashing) over
+     worker processes via map_processes()
+  3. Priorities and per-kind limits — queued jobs start in priority order
+     (PRIORITY_INTERACTIVE before PRIORITY_BACKGROUND, then submission order)
+     once their workload has a free thread and fewer than kind_limits[kind]
+     jobs of their kind are running
+  4. Jobs, not futures — every submission is a Job with an id, status,
+     progress, message, kind-specific details and a result or error, listed
+     by /api/jobs and returned by /api/jobs/{id}
+  5. Cooperative cancellation — every job owns its cancellation token
+     (job.cancelled); a queued job is dropped, a running one stops at its next
+     job.check_cancelled() or wherever the token is passed down
+  6. Bounded history — only the last MAX_FINISHED_JOBS finished jobs are kept,
+     each with at most MAX_FILE_OUTCOMES per-file outcomes in its result
+  7. Push, not poll — wait_done() parks a caller until the job finishes (the
+     /api/jobs/{id}/wait long-poll) without cancelling it or raising its error
+
+Usage:
+    from job_executor import job_executor, WORKLOAD_IO
+    job = job_executor.submit("list_subfolders", scan_tree, path, workload=WORKLOAD_IO)
+    result = await job_executor.wait(job)          # or return job.to_dict()
+"""
+
+import os
+import uuid
+import asyncio
+import logging
+import itertools
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from exceptions import OperationAbortedError
+
+# ── Logger ──────────────────────────────────────────────────────────────────
+_log = logging.getLogger("locallens.job_executor")
+
+# ── Constants ─────────────────────────────────────────────────────────────
+WORKLOAD_ORGANIZE = "organize"   # Sorting, Find & Group, enrollment: long, cancellable
+WORKLOAD_IO       = "io"         # Directory walks, stat storms, deletes
+WORKLOAD_CPU      = "cpu"        # Decoding, EXIF parsing, PDF rendering (GIL mostly released)
+WORKLOAD_PROCESS  = "process"    # Pure-CPU per-file work in worker processes
+
+_CPUS = os.cpu_count() or 2
+DEFAULT_LIMITS = {
+    WORKLOAD_ORGANIZE: 4,
+    WORKLOAD_IO:      4,
+    WORKLOAD_CPU:     max(2, min(4, _CPUS // 2)),
+    WORKLOAD_PROCESS: max(1, min(8, _CPUS - 1)),
+}
+# Concurrent jobs per kind; kinds not listed are bounded only by their workload.
+DEFAULT_KIND_LIMITS = {
+    "sorting":         2,        # Disjoint folders only (checked by the API)
+    "find_group":      1,
+    "enrollment":      1,        # All enrollments rewrite the same encodings file
+    "find_duplicates": 1,
+    "export_report":   1,
+}
+
+PRIORITY_INTERACTIVE = 0         # Started from the UI or an agent; someone is waiting
+PRIORITY_BACKGROUND  = 1         # Scheduled sweeps and watchers
+PRIORITIES = {"interactive": PRIORITY_INTERACTIVE, "background": PRIORITY_BACKGROUND}
+
+MAX_FINISHED_JOBS = 100
+MAX_FILE_OUTCOMES = 1000         # Per-file outcomes kept in one job's result
+PROCESS_CHUNK     = 16           # Items per task sent to a worker process
+
+STATUS_QUEUED     = "queued"
+STATUS_RUNNING    = "running"
+STATUS_COMPLETED  = "completed"
+STATUS_ERROR      = "error"
+STATUS_CANCELLED  = "cancelled"
+FINISHED_STATUSES = (STATUS_COMPLETED, STATUS_ERROR, STATUS_CANCELLED)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  Job
+# ─────────────────────────────────────────────────────────────────────────────
+
+class Job:
+    """One unit of background work and everything a client may ask about it."""
+
+    def __init__(self, kind: str, workload: str, priority: int = PRIORITY_INTERACTIVE,
+                 details: Optional[Dict[str, Any]] = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.workload = workload
+        self.priority = priority
+        self.details: Dict[str, Any] = details if details is not None else {}
+        self.status = STATUS_QUEUED
+        self.progress = 0
+        self.message = "Queued"
+        self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.error_status_code: Optional[int] = None
+        self.cancelled = threading.Event()
+        self.future: Future = Future()
+        self._call = None
+        self._order = 0
+
+    def report(self, progress: Optional[int] = None, message: Optional[str] = None) -> None:
+        """Progress (0-100) and/or a status line from inside the job."""
+        if progress is not None:
+            self.progress = max(0, min(100, int(progress)))
+        if message is not None:
+            self.message = message
+
+    def check_cancelled(self) -> None:
+        """Raises OperationAbortedError once the job has been cancelled."""
+        if self.cancelled.is_set():
+            raise OperationAbortedError(f"Job {self.id} cancelled")
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    def to_dict(self, include_result: bool = False) -> Dict[str, Any]:
+        data = {
+            "job_id":      self.id,
+            "kind":        self.kind,
+            "workload":    self.workload,
+            "priority":    "background" if self.priority >= PRIORITY_BACKGROUND else "interactive",
+            "status":      self.status,
+            "progress":    self.progress,
+            "message":     self.message,
+            "created_at":  self.created_at.isoformat(),
+            "started_at":  self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "error":       self.error,
+        }
+        if self.details:
+            data["details"] = self.details
+        if include_result:
+            data["result"] = self.result
+        return data
+
+
+class FileOutcomes:
+    """
+    Thread-safe per-file results of a job (source, destination, operation, ok),
+    counted in full and listed up to MAX_FILE_OUTCOMES — failures first.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.succeeded = 0
+        self.failed = 0
+        self._ok: List[Dict[str, Any]] = []
+        self._failures: List[Dict[str, Any]] = []
+
+    def add(self, source: str, destination: Optional[str], operation: str) -> None:
+        outcome = {"source": source, "destination": destination, "operation": operation,
+                   "outcome": "ok" if destination else "failed"}
+        with self._lock:
+            if destination:
+                self.succeeded += 1
+                if len(self._ok) < MAX_FILE_OUTCOMES:
+                    self._ok.append(outcome)
+            else:
+                self.failed += 1
+                if len(self._failures) < MAX_FILE_OUTCOMES:
+                    self._failures.append(outcome)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            files = (self._failures + self._ok)[:MAX_FILE_OUTCOMES]
+            return {
+                "operations_succeeded": self.succeeded,
+                "operations_failed":    self.failed,
+                "files":                files,
+                "files_truncated":      self.succeeded + self.failed > len(files),
+            }
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  JobExecutor class
+# ─────────────────────────────────────────────────────────────────────────────
+
+class JobExecutor:
+    """Bounded executors per workload class, a priority queue and a registry of recent jobs."""
+
+    def __init__(self, limits: Optional[Dict[str, int]] = None, kind_limits: Optional[Dict[str, int]] = None):
+        self._limits = dict(DEFAULT_LIMITS, **(limits or {}))
+        self._kind_limits = dict(DEFAULT_KIND_LIMITS, **(kind_limits or {}))
+        self._threads: Dict[str, ThreadPoolExecutor] = {}
+        self._processes: Optional[ProcessPoolExecutor] = None
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._queue: List[Job] = []
+        self._running: Dict[str, int] = {}          # workload -> running jobs
+        self._running_kinds: Dict[str, int] = {}    # kind -> running jobs
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+
+    # ── Executors ───────────────────────────────────────────────────────────
+
+    def _thread_pool(self, workload: str) -> ThreadPoolExecutor:
+        with self._lock:
+            pool = self._threads.get(workload)
+            if pool is None:
+                pool = self._threads[workload] = ThreadPoolExecutor(
+                    max_workers=self._limits[workload], thread_name_prefix=f"job-{workload}"
+                )
+            return pool
+
+    def _process_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._processes is None:
+                # spawn: forking a process that runs uvicorn and worker threads is unsafe.
+                self._processes = ProcessPoolExecutor(
+                    max_workers=self._limits[WORKLOAD_PROCESS],
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._processes
+
+    def map_processes(self, fn: Callable, items: Iterable, job: Optional[Job] = None) -> List[Any]:
+        """
+        [fn(item) for item in items] on the worker processes (fn must be a
+        picklable module-level function). Falls back to this thread if the pool
+        cannot be used, e.g. in a frozen build without multiprocessing support.
+        """
+        items = list(items)
+        if len(items) <= 1:
+            return [fn(item) for item in items]
+        try:
+            results = []
+            for result in self._process_pool().map(fn, items, chunksize=PROCESS_CHUNK):
+                results.append(result)
+                if job is not None:
+                    job.check_cancelled()
+                    if len(results) % PROCESS_CHUNK == 0:
+                        job.report(message=f"Processed {len(results)} of {len(items)} files")
+            return results
+        except (BrokenProcessPool, OSError, RuntimeError) as e:
+            _log.warning(f"Process pool unavailable ({e}); running {len(items)} items in-thread")
+            with self._lock:
+                self._processes = None
+            return [fn(item) for item in items]
+
+    # ── Jobs ────────────────────────────────────────────────────────────────
+
+    def submit(self, kind: str, fn: Callable[..., Any], *args, workload: str = WORKLOAD_CPU,
+               priority: int = PRIORITY_INTERACTIVE, details: Optional[Dict[str, Any]] = None, **kwargs) -> Job:
+        """Queues fn(job, *args, **kwargs) on the pool of `workload`; returns the Job."""
+        job = Job(kind, workload, priority, details)
+        job._call = (fn, args, kwargs)
+        with self._lock:
+            job._order = next(self._order)
+            self._jobs[job.id] = job
+            self._queue.append(job)
+            self._prune()
+        self._dispatch()
+        return job
+
+    def _dispatch(self) -> None:
+        """Starts every queued job that fits, highest priority first."""
+        started = []
+        with self._lock:
+            full = set()  # Workloads with no free thread: nothing behind them may jump ahead
+            for job in sorted(self._queue, key=lambda j: (j.priority, j._order)):
+                if job.workload in full:
+                    continue
+                if self._running.get(job.workload, 0) >= self._limits[job.workload]:
+                    full.add(job.workload)
+                    continue
+                if self._running_kinds.get(job.kind, 0) >= self._kind_limits.get(job.kind, self._limits[job.workload]):
+                    continue
+                self._queue.remove(job)
+                self._running[job.workload] = self._running.get(job.workload, 0) + 1
+                self._running_kinds[job.kind] = self._running_kinds.get(job.kind, 0) + 1
+                started.append(job)
+        for job in started:
+            job.future.set_running_or_notify_cancel()
+            self._thread_pool(job.workload).submit(self._run, job)
+
+    def _run(self, job: Job):
+        fn, args, kwargs = job._call
+        job._call = None
+        result, error = None, None
+        try:
+            if job.cancelled.is_set():
+                job.message = "Cancelled before start"
+                raise OperationAbortedError(f"Job {job.id} cancelled")
+            job.status, job.started_at, job.message = STATUS_RUNNING, datetime.now(), "Running"
+            result = job.result = fn(job, *args, **kwargs)
+            job.status, job.progress, job.message = STATUS_COMPLETED, 100, "Completed"
+        except OperationAbortedError as e:
+            job.status, error = STATUS_CANCELLED, e
+            if job.message == "Running" or not job.message:
+                job.message = "Cancelled"
+        except BaseException as e:
+            job.status, error = STATUS_ERROR, e
+            job.error = getattr(e, "detail", None) or str(e)
+            job.error_status_code = getattr(e, "status_code", None)
+            job.message = f"Failed: {job.error}"
+        job.finished_at = datetime.now()
+        with self._lock:
+            self._running[job.workload] -= 1
+            self._running_kinds[job.kind] -= 1
+        if error is None:
+            job.future.set_result(result)
+        else:
+            job.future.set_exception(error)
+        self._dispatch()
+
+    async def wait(self, job: Job) -> Any:
+        """Awaits the job without blocking the event loop; returns its result or raises its error."""
+        return await asyncio.wrap_future(job.future)
+
+    async def wait_done(self, job: Job, timeout: float) -> bool:
+        """
+        Waits up to `timeout` seconds for the job to finish; True if it has.
+        Unlike wait(), never raises the job's error and never cancels it.
+        """
+        if job.future.done():
+            return True
+        loop = asyncio.get_running_loop()
+        done = asyncio.Event()
+
+        def on_done(_future):
+            try:
+                loop.call_soon_threadsafe(done.set)
+            except RuntimeError:
+                pass  # The waiting loop is gone (server shutting down)
+
+        job.future.add_done_callback(on_done)
+        try:
+            await asyncio.wait_for(done.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return job.future.done()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self, kinds: Optional[Iterable[str]] = None, active: Optional[bool] = None) -> List[Job]:
+        """Jobs newest first, optionally only of `kinds` and only (un)finished ones."""
+        kinds = set(kinds) if kinds is not None else None
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [
+            job for job in reversed(jobs)
+            if (kinds is None or job.kind in kinds) and (active is None or active != job.finished)
+        ]
+
+    def list_jobs(self, kinds: Optional[Iterable[str]] = None, active: Optional[bool] = None) -> List[Dict[str, Any]]:
+        """Newest first."""
+        return [job.to_dict() for job in self.jobs(kinds, active)]
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return job
+            job.cancelled.set()
+            if job in self._queue:
+                self._queue.remove(job)
+                job.status, job.message, job.finished_at = STATUS_CANCELLED, "Cancelled before start", datetime.now()
+                job.future.cancel()
+        return job
+
+    def set_kind_limit(self, kind: str, limit: int) -> None:
+        """Changes how many jobs of `kind` may run at once; queued jobs start if now allowed."""
+        with self._lock:
+            self._kind_limits[kind] = max(1, int(limit))
+        self._dispatch()
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+            return {
+                "limits":      dict(self._limits),
+                "kind_limits": dict(self._kind_limits),
+                "queued":      sum(j.status == STATUS_QUEUED for j in jobs),
+                "running":     sum(j.status == STATUS_RUNNING for j in jobs),
+            }
+
+    def shutdown(self) -> None:
+        """Cancels queued work and stops the pools (server shutdown)."""
+        with self._lock:
+            pools, self._threads = list(self._threads.values()), {}
+            processes, self._processes = self._processes, None
+            queued, self._queue = self._queue, []
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            if not job.finished:
+                job.cancelled.set()
+        for job in queued:
+            job.status, job.message, job.finished_at = STATUS_CANCELLED, "Server shutting down", datetime.now()
+            job.future.cancel()
+        for pool in pools:
+            pool.shutdown(wait=False, cancel_futures=True)
+        if processes is not None:
+            processes.shutdown(wait=False, cancel_futures=True)
+
+
+# ── Module-level singleton ────────────────────────────────────────────────
+job_executor = JobExecutor()
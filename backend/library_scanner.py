@@ -0,0 +1,194 @@
+"""
+LocalLens — Library Scanner
+============================
+The one directory walker shared by every job and endpoint that needs to know
+which photos live under a folder.
+
+Design Principles:
+  1. os.scandir, not os.walk + os.path calls — directory entries carry their
+     file type, and DirEntry.stat() is cached (free on Windows), so sizes and
+     mtimes never cost a second syscall per file
+  2. Same semantics as the loops it replaces — top-down, depth-first, symlinked
+     folders are listed but not entered, unreadable folders are skipped, and an
+     ignored folder hides only its own files (its sub-folders are still walked)
+  3. Streaming — scan_files() is a generator, and LibraryScan runs it on a
+     background thread so a job can start on the first file while the rest of
+     the tree is still being read; the total becomes known when the walk ends
+  4. One walk per job — a LibraryScan remembers what it found and can be
+     iterated again (e.g. by a metadata pre-pass) without touching the disk
+
+Usage:
+    for entry in scan_files(root, ignore_list, SUPPORTED_EXTENSIONS):
+        entry.path, entry.stat().st_size
+
+    scan = LibraryScan(scan_files(root, ignore_list, SUPPORTED_EXTENSIONS))
+    for entry in scan: ...          # streams while the walk is running
+    scan.total                      # None until the walk has finished
+"""
+
+import os
+import threading
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  Walking
+# ─────────────────────────────────────────────────────────────────────────────
+
+def walk_library(root: str) -> Iterator[Tuple[str, List[str], List[os.DirEntry]]]:
+    """
+    scandir-based equivalent of os.walk(root) (top-down, no symlink following).
+    Yields (dirpath, dirnames, file_entries); like os.walk, callers may sort or
+    prune `dirnames` in place to control which sub-folders are visited next.
+    """
+    stack = [root]
+    while stack:
+        dirpath = stack.pop()
+        dirnames, files, links = [], [], set()
+        try:
+            with os.scandir(dirpath) as it:
+                for entry in it:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if is_dir:
+                        dirnames.append(entry.name)
+                        if entry.is_symlink():
+                            links.add(entry.name)
+                    else:
+                        files.append(entry)
+        except OSError:
+            continue  # Unreadable folder: skip it, like os.walk does by default
+
+        yield dirpath, dirnames, files
+
+        # Reversed so the stack pops sub-folders in listing order (depth-first).
+        for name in reversed(dirnames):
+            if name not in links:
+                stack.append(os.path.join(dirpath, name))
+
+
+def scan_files(
+    root: str,
+    ignore_list: Optional[Iterable[str]] = None,
+    extensions: Optional[Sequence[str]] = None,
+    mtime_cutoff: Optional[float] = None,
+) -> Iterator[os.DirEntry]:
+    """
+    Yields a DirEntry for every file under `root` whose name ends with one of
+    `extensions` (case-insensitive), skipping files that sit directly in a folder
+    from `ignore_list` (full paths). With `mtime_cutoff`, files whose
+    max(mtime, ctime) is older than the cutoff are skipped as well.
+    """
+    ignore_set = set(ignore_list or [])
+    suffixes = tuple(extensions) if extensions else None
+    for dirpath, _, files in walk_library(root):
+        if dirpath in ignore_set:
+            continue
+        for entry in files:
+            if suffixes and not entry.name.lower().endswith(suffixes):
+                continue
+            if mtime_cutoff is not None:
+                # max(mtime, ctime): a 2019 photo copied in today has an old mtime
+                # but a fresh ctime, and must still count as new.
+                try:
+                    st = entry.stat()
+                    if max(st.st_mtime, st.st_ctime) < mtime_cutoff:
+                        continue
+                except OSError:
+                    pass
+            yield entry
+
+
+def count_files(root: str, ignore_list: Optional[Iterable[str]] = None, extensions: Optional[Sequence[str]] = None) -> int:
+    """Number of files scan_files() would yield."""
+    return sum(1 for _ in scan_files(root, ignore_list, extensions))
+
+
+def entry_size(entry: os.DirEntry) -> int:
+    """File size from the entry's cached stat, 0 if the file vanished."""
+    try:
+        return entry.stat().st_size
+    except OSError:
+        return 0
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  Streaming scan
+# ─────────────────────────────────────────────────────────────────────────────
+
+class LibraryScan:
+    """
+    Runs a scan_files() generator on a background thread. Iterating the scan
+    yields entries as soon as they are found and can be repeated; `total` is
+    None until the walk has finished.
+    """
+
+    def __init__(self, source: Iterable[os.DirEntry], on_complete=None):
+        self._entries: List[os.DirEntry] = []
+        self._done = False
+        self._error: Optional[BaseException] = None
+        self._cond = threading.Condition()
+        self._on_complete = on_complete
+        self._thread = threading.Thread(target=self._run, args=(source,), name="library-scan", daemon=True)
+        self._thread.start()
+
+    def _run(self, source: Iterable[os.DirEntry]) -> None:
+        try:
+            for entry in source:
+                with self._cond:
+                    self._entries.append(entry)
+                    self._cond.notify_all()
+        except BaseException as e:
+            self._error = e
+        finally:
+            with self._cond:
+                self._done = True
+                self._cond.notify_all()
+        if self._on_complete is not None and self._error is None:
+            self._on_complete(len(self._entries))
+
+    def __iter__(self) -> Iterator[os.DirEntry]:
+        i = 0
+        while True:
+            with self._cond:
+                while i >= len(self._entries) and not self._done:
+                    self._cond.wait()
+                if i >= len(self._entries):
+                    break
+                entry = self._entries[i]
+            yield entry
+            i += 1
+        if self._error is not None:
+            raise self._error
+
+    @property
+    def total(self) -> Optional[int]:
+        """Number of files found, or None while the walk is still running."""
+        with self._cond:
+            return len(self._entries) if self._done else None
+
+    def is_empty(self) -> bool:
+        """Blocks until the first file is found or the walk ends; True if nothing was found."""
+        with self._cond:
+            while not self._entries and not self._done:
+                self._cond.wait()
+            empty = not self._entries
+        if empty and self._error is not None:
+            raise self._error
+        return empty
+
+    def wait(self) -> "LibraryScan":
+        """Blocks until the walk has finished; re-raises any error it hit."""
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self
+
+    def entries(self) -> List[os.DirEntry]:
+        """Waits for the walk to finish and returns every entry found."""
+        return list(self)
+
+    def paths(self) -> List[str]:
+        return [entry.path for entry in self]
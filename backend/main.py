@@ -32,7 +32,7 @@ import signal
 from datetime import datetime
 from contextlib import asynccontextmanager
 from pathlib import Path
-from fastapi import FastAPI, HTTPException, Body, Request, BackgroundTasks, UploadFile, File, Form, Depends, Header
+from fastapi import FastAPI, HTTPException, Body, Request, UploadFile, File, Form, Depends, Header
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
@@ -45,7 +45,7 @@ import asyncio
 # import signal
 import uvicorn
 import secrets
-from asyncio import Queue, CancelledError # FIX: Import the asyncio Queue and CancelledError
+from asyncio import CancelledError
 
 # --- Custom Exception Import ---
 from exceptions import OperationAbortedError
@@ -130,8 +130,15 @@ async def require_local_token(x_local_token: Optional[str] = Header(None)) -> No
 from organizer_logic import (
     process_photos, SUPPORTED_EXTENSIONS, 
     load_face_encodings, find_and_group_photos, get_metadata_overview, 
-    initialize_libraries, build_folder_tree
+    initialize_libraries, scan_folder_tree
 )
+from library_scanner import scan_files, walk_library, entry_size
+from near_duplicates import group_near_duplicates
+from fingerprint import identical_groups
+from job_executor import (
+    job_executor, FileOutcomes, WORKLOAD_IO, WORKLOAD_CPU, WORKLOAD_ORGANIZE, PRIORITIES, PRIORITY_INTERACTIVE,
+)
+from event_hub import event_hub
 import organizer_logic
 from enrollment_logic import update_encodings
 
@@ -152,6 +159,8 @@ async def lifespan(app: FastAPI):
 
 
     yield
+    # Stop queued background jobs and the executor pools.
+    job_executor.shutdown()
     # ---------------------------------------------------------------
     # Shutdown cleanup: delete port.txt so external tools (tray, MCP
     # agent) don't get a false-positive "running" status from a stale
@@ -238,13 +247,18 @@ def _ensure_daemon_running():
 
 
 # --- Application State ---
-# A thread-safe queue for sending real-time status updates to the frontend.
-log_queue: "Queue[str]" = Queue()
-
-# NEW: Current Job Tracking for external integrations (MCP polling)
-# All fields here are intentionally persisted after a job completes so that
-# an LLM can still read what the last job did (e.g. after wait_for_completion).
-current_job_state = {
+# Real-time status updates for the frontend are broadcast through event_hub
+# (event_hub.py), so every /api/stream-logs client receives every event.
+
+# Organize jobs (sorting, Find & Group, enrollment) run on job_executor. Each one
+# has its own id, cancellation token and state (job.details, shaped like the dict
+# below); /api/job-status reports the current one, /api/jobs/{id} any of them.
+# A job's state is intentionally kept after it completes so that an LLM can
+# still read what the last job did (e.g. after wait_for_completion).
+ORGANIZE_JOB_KINDS = ("sorting", "find_group", "enrollment")
+MAX_JOB_WAIT_S = 300  # Longest single /api/jobs/{id}/wait long-poll
+
+_IDLE_JOB_STATE = {
     # --- Core status (updated live during the job) ---
     "is_active": False,
     "progress": 0,
@@ -267,14 +281,6 @@ current_job_state = {
     "ignore_list": [],          # Folders excluded from this job
 }
 
-# --- Cancellation Events for Aborting Tasks ---
-# Use multiprocessing.Event, which can be safely passed to other processes.
-cancellation_events = {
-    "sorting": multiprocessing.Event(),
-    "enrollment": multiprocessing.Event(),
-    "find_group": multiprocessing.Event()
-}
-
 # --- Application Version ---
 # Canonical version string — keep this in sync with frontend/package.json and tauri.conf.json.
 APP_VERSION = "2.5.1"
@@ -326,6 +332,17 @@ class SortOptions(BaseModel):
     # --- Fields for Scheduler Daemon (new files only) ---
     mtime_cutoff: Optional[float] = None     # Unix timestamp — skip files older than this
     specific_files: Optional[List[str]] = None  # Process only these files
+    incremental_sweep: Optional[bool] = False   # Diff against the folder snapshot of the last sweep
+    # --- Staged pipeline mode (concurrent metadata / decode / faces / file I/O) ---
+    pipeline_mode: Optional[bool] = False
+    pipeline_workers: Optional[Dict[str, int]] = None  # e.g. {"metadata": 4, "faces": 2, "io": 2}
+    # --- Camera RAW decoding for face analysis: "preview" | "half_size" | "full" ---
+    raw_decode_policy: Optional[str] = "preview"
+    # --- Transfer engine: concurrent copies / moves (defaults: 4 workers, 2 per destination device) ---
+    transfer_workers: Optional[int] = None
+    transfer_per_device: Optional[int] = None
+    # --- Duplicate finder index: hash images new to it while sorting (one extra decode each) ---
+    index_perceptual_hashes: Optional[bool] = False
 
 
 class SortRequest(BaseModel):
@@ -334,6 +351,7 @@ class SortRequest(BaseModel):
     sorting_options: SortOptions
     ignore_list: Optional[List[str]] = []
     operation_mode: Optional[str] = 'move' # Add this line, default to 'move'
+    priority: Optional[str] = "interactive"  # "background" for scheduled sweeps: queued behind interactive jobs
 
 # NEW: Model for the 'Find & Group' feature configuration
 class FindGroupConfig(BaseModel):
@@ -352,6 +370,7 @@ class FindGroupRequest(BaseModel):
     ignore_list: Optional[List[str]] = []
     # REMOVE: operation_mode is no longer needed here.
     # operation_mode: Optional[str] = 'copy'
+    priority: Optional[str] = "interactive"
 
 class LastConfig(BaseModel):
     source_folder: Optional[str] = ""
@@ -383,6 +402,9 @@ class DeleteFilesRequest(BaseModel):
     file_paths: List[str]
     dry_run: bool = True  # Defaults to True — always preview before destroying
 
+class AbortRequest(BaseModel):
+    job_id: Optional[str] = None  # Default: the newest running organize job
+
 class OpenEnrolledFolderRequest(BaseModel):
     person_name: str
 
@@ -397,45 +419,24 @@ class MetadataOverviewRequest(BaseModel):
 
 # --- Background Task & SSE Logic ---
 
-def update_status_callback(update_data: Dict):
-    """Puts a log message into the queue for the client."""
-    global current_job_state
-    
-    # Update global state for polling logic
-    current_job_state["progress"] = update_data.get("progress", 0)
-    current_job_state["message"] = update_data.get("message", "processing...")
-    
-    # Set to true if running, else false when completing or erroring.
+def update_status_callback(update_data: Dict, job=None):
+    """Broadcasts a status update to every /api/stream-logs client."""
     st = update_data.get("status", "running")
-    current_job_state["status"] = st
-    current_job_state["is_active"] = st == "running"
-
-    try:
-        # Use put_nowait for thread-safe adding from background tasks
-        log_queue.put_nowait(json.dumps(update_data))
-    except Exception as e:
-        print(f"Error adding log to queue: {e}")
+    if job is not None:
+        # Update the job's own state for polling logic
+        update_data["job_id"] = job.id
+        job.details["progress"] = update_data.get("progress", 0)
+        job.details["message"] = update_data.get("message", "processing...")
+        job.details["status"] = st
+        job.report(update_data.get("progress"), update_data.get("message"))
 
-
-def _count_source_files(source_folder: str, ignore_list: list) -> int:
-    """
-    Counts all supported image files inside source_folder, honouring ignore_list.
-    Mirrors the exact os.walk filtering logic used by the core processing functions
-    so the count matches what the job will actually process.
-    """
-    ignore_set = set(ignore_list or [])
-    count = 0
     try:
-        for dirpath, _, filenames in os.walk(source_folder):
-            if dirpath in ignore_set:
-                continue  # Skip files in this ignored directory
-            count += sum(
-                1 for f in filenames
-                if f.lower().endswith(SUPPORTED_EXTENSIONS)
-            )
+        # Running updates of the same job supersede each other for lagging clients;
+        # terminal and error updates are never coalesced away.
+        key = f"progress:{job.id if job else update_data.get('source', 'sorting')}" if st == "running" else None
+        event_hub.publish(json.dumps(update_data), key=key)
     except Exception as e:
-        print(f"Warning: could not count source files: {e}")
-    return count
+        print(f"Error publishing log event: {e}")
 
 
 _FACE_MODE_LABELS = {
@@ -444,18 +445,11 @@ _FACE_MODE_LABELS = {
     "accurate": "Accurate (CNN)",
 }
 
-async def run_organization_task(config: Dict):
-    """The main processing task, wrapped to be run in the background."""
-    global current_job_state
-    cancellation_events["sorting"].clear()  # Reset cancellation event
-
-    # --- Enrich job state BEFORE spawning the thread ---
-    # This allows MCP polling to immediately detect the job type and context,
-    # and prevents stale terminal state from a previous job confusing the poller.
+def _sorting_job_details(config: Dict) -> Dict:
+    """Job state of a sorting job as reported by /api/job-status and /api/jobs/{id}."""
     sort_opts = config.get("sorting_options", {})
     primary_sort = sort_opts.get("primary_sort", "Date")
     raw_face_mode = sort_opts.get("face_mode", "balanced") or "balanced"
-    ignore_list = config.get("ignore_list") or []
     is_hybrid = primary_sort.lower() == "hybrid"
 
     # --- Hybrid-specific context extraction ---
@@ -487,10 +481,8 @@ async def run_organization_task(config: Dict):
         (is_hybrid and filter_type == "People")
     )
 
-    current_job_state.update({
-        "is_active": True,
+    return dict(_IDLE_JOB_STATE, **{
         "status": "running",
-        "progress": 0,
         "message": "Starting organization...",
         # Job identity
         "job_type": "sorting",
@@ -506,47 +498,73 @@ async def run_organization_task(config: Dict):
         "folder_name": folder_name,
         "filters_applied": filters_applied,
         # File scope
-        "ignore_list": ignore_list,
-        "total_files": _count_source_files(config.get("source_folder", ""), ignore_list),
+        "ignore_list": config.get("ignore_list") or [],
+        "total_files": 0,  # Reported by the job once its library scan finishes
     })
 
-    try:
-        # Pass the centralized encodings file path to the logic function
-        config["encodings_path"] = ENCODINGS_FILE
-        config["cancellation_event"] = cancellation_events["sorting"]
-        
-        # Create an adapter for the callback to match the expected signature
-        def callback_adapter(progress: int, message: str, status: str = "running", analytics: Optional[Dict] = None):
-            update_data = {
-                "progress": progress, 
-                "message": message, 
-                "status": status,
-                "analytics": analytics or {}
-            }
-            update_status_callback(update_data)
 
-        # Run the entire blocking function in a separate thread
-        await asyncio.to_thread(process_photos, config, callback_adapter)
+def _organize_result(job, outcomes: FileOutcomes, status: str, error: Optional[str] = None, **counts) -> Dict:
+    """Structured result of an organize job, as returned by /api/jobs/{id} and /api/jobs/{id}/wait."""
+    return {
+        "status": status,  # "complete" | "aborted" | "error"
+        "message": job.details["message"],
+        "total_files": job.details.get("total_files", 0),
+        **counts,
+        **outcomes.to_dict(),
+        "errors": [error] if error else [],
+    }
+
+
+def _organization_job(job, config: Dict):
+    """The main processing task, run as an organize job on the job executor."""
+    # Pass the centralized encodings file path to the logic function
+    config["encodings_path"] = ENCODINGS_FILE
+    # Each job has its own cancellation token: aborting one job leaves the others running.
+    config["cancellation_event"] = job.cancelled
+    config["on_file_count"] = lambda n: job.details.update({"total_files": n})
+    outcomes = FileOutcomes()
+    config["on_file_outcome"] = outcomes.add
+
+    # Create an adapter for the callback to match the expected signature
+    def callback_adapter(progress: int, message: str, status: str = "running", analytics: Optional[Dict] = None,
+                         items: Optional[List[str]] = None):
+        update_data = {
+            "progress": progress, 
+            "message": message, 
+            "status": status,
+            "analytics": analytics or {}
+        }
+        if items:
+            # Batched per-file records ("Moved 'a' to ..."); message shows the latest.
+            update_data["items"] = items
+        update_status_callback(update_data, job)
+
+    try:
+        moved_count = process_photos(config, callback_adapter)
     except OperationAbortedError:
         abort_message = "Operation aborted by user. Cleaning up..."
         print(f"BACKGROUND TASK: {abort_message}")
         error_update = {"progress": 100, "message": abort_message, "status": "aborted"}
-        update_status_callback(error_update)
+        update_status_callback(error_update, job)
+        # Moves were rolled back; the outcomes list what had been done before the abort.
+        job.result = _organize_result(job, outcomes, "aborted")
+        raise
     except Exception as e:
         error_update = {"progress": 100, "message": f"An error occurred: {e}", "status": "error"}
-        update_status_callback(error_update)
+        update_status_callback(error_update, job)
         print(f"BACKGROUND TASK ERROR: {e}")
+        job.result = _organize_result(job, outcomes, "error", str(e))
+        raise
+    # A fatal setup error (e.g. no face data) is reported through the callback, not raised.
+    status = job.details["status"]
+    return _organize_result(job, outcomes, status, job.details["message"] if status == "error" else None,
+                            files_processed=moved_count or 0)
 
-# NEW: Background task runner for the find and group process.
-async def run_find_group_task(config: Dict):
-    """The find & group task, wrapped to be run in the background."""
-    global current_job_state
-    cancellation_events["find_group"].clear()  # Reset cancellation event
 
-    # --- Enrich job state BEFORE spawning the thread ---
+def _find_group_job_details(config: Dict) -> Dict:
+    """Job state of a Find & Group job as reported by /api/job-status and /api/jobs/{id}."""
     find_cfg = config.get("find_config", {})
     raw_face_mode = find_cfg.get("face_mode", "fast") or "fast"
-    ignore_list = config.get("ignore_list") or []
 
     # Summarise which filters are actually active (non-empty)
     filters_applied = {
@@ -558,10 +576,8 @@ async def run_find_group_task(config: Dict):
         }.items() if v  # only include filters that have values
     }
 
-    current_job_state.update({
-        "is_active": True,
+    return dict(_IDLE_JOB_STATE, **{
         "status": "running",
-        "progress": 0,
         "message": "Starting find & group...",
         # Job identity
         "job_type": "find_group",
@@ -574,33 +590,41 @@ async def run_find_group_task(config: Dict):
         "filters_applied": filters_applied if filters_applied else None,
         "face_mode": _FACE_MODE_LABELS.get(raw_face_mode.lower(), raw_face_mode)
                      if find_cfg.get("people") else None,
-        # Sorting fields — not applicable here
-        "primary_sort": None,
         # File scope
-        "ignore_list": ignore_list,
-        "total_files": _count_source_files(config.get("source_folder", ""), ignore_list),
+        "ignore_list": config.get("ignore_list") or [],
+        "total_files": 0,  # Reported by the job once its library scan finishes
     })
+
+
+def _find_group_job(job, config: Dict):
+    """The find & group task, run as an organize job on the job executor."""
     target_folder = None
+    outcomes = FileOutcomes()
     try:
         config["encodings_path"] = ENCODINGS_FILE
-        config["cancellation_event"] = cancellation_events["find_group"]
+        config["cancellation_event"] = job.cancelled
+        config["on_file_count"] = lambda n: job.details.update({"total_files": n})
+        config["on_file_outcome"] = outcomes.add
         
         # Determine the target folder path for potential cleanup
         target_folder_name = config.get("find_config", {}).get('folderName', "Find_Results")
         target_folder = os.path.join(config["destination_folder"], target_folder_name)
 
         # FIX: The callback adapter now accepts the 'analytics' dictionary.
-        def callback_adapter(progress: int, message: str, status: str = "running", analytics: Optional[Dict] = None):
+        def callback_adapter(progress: int, message: str, status: str = "running", analytics: Optional[Dict] = None,
+                             items: Optional[List[str]] = None):
             update_data = {
                 "progress": progress, 
                 "message": message, 
                 "status": status,
                 "analytics": analytics or {}
             }
-            update_status_callback(update_data)
+            if items:
+                # Batched per-file records ("Moved 'a' to ..."); message shows the latest.
+                update_data["items"] = items
+            update_status_callback(update_data, job)
 
-        # Run the entire blocking function in a separate thread
-        await asyncio.to_thread(find_and_group_photos, config, callback_adapter)
+        find_and_group_photos(config, callback_adapter)
     except OperationAbortedError:
         abort_message = "Find & Group aborted by user. Cleaning up..."
         print(f"BACKGROUND TASK: {abort_message}")
@@ -608,29 +632,33 @@ async def run_find_group_task(config: Dict):
             shutil.rmtree(target_folder)
             print(f"Cleaned up partially created folder: {target_folder}")
         error_update = {"progress": 100, "message": abort_message, "status": "aborted"}
-        update_status_callback(error_update)
+        update_status_callback(error_update, job)
+        job.result = _organize_result(job, outcomes, "aborted")
+        raise
     except Exception as e:
         error_update = {"progress": 100, "message": f"An error occurred: {e}", "status": "error"}
-        update_status_callback(error_update)
+        update_status_callback(error_update, job)
         print(f"BACKGROUND TASK ERROR: {e}")
+        job.result = _organize_result(job, outcomes, "error", str(e))
+        raise
+    status = job.details["status"]
+    return _organize_result(job, outcomes, status, job.details["message"] if status == "error" else None,
+                            files_processed=outcomes.succeeded)
 
 
 # NEW: Background task runner for the enrollment process.
-async def run_enrollment_task(newly_created_dirs: List[str]):
-    """Wrapper to run the face enrollment process and send real-time updates."""
-    cancellation_events["enrollment"].clear()
+def _enrollment_job(job, newly_created_dirs: List[str]):
+    """Runs the face enrollment process as an organize job and sends real-time updates."""
     try:
         def callback_adapter(progress: int, message: str, status: str = "running"):
             # Add a 'source' key to distinguish from sorting logs
             update_data = {"progress": progress, "message": message, "status": status, "source": "enrollment"}
-            update_status_callback(update_data)
+            update_status_callback(update_data, job)
         
-        # Run the entire blocking function in a separate thread
-        await asyncio.to_thread(
-            update_encodings, 
+        update_encodings(
             ENROLLMENT_FOLDER, 
             ENCODINGS_FILE, 
-            cancellation_events["enrollment"], 
+            job.cancelled, 
             callback_adapter
         )
     except OperationAbortedError:
@@ -648,27 +676,79 @@ async def run_enrollment_task(newly_created_dirs: List[str]):
         # FIX: The original `error_update` was not being passed to the callback.
         # This ensures the final "aborted" status is sent to the UI.
         final_update = {"progress": 100, "message": abort_message, "status": "aborted", "source": "enrollment"}
-        update_status_callback(final_update)
+        update_status_callback(final_update, job)
+        raise
 
     except Exception as e:
         error_update = {"progress": 100, "message": f"An error occurred during enrollment: {e}", "status": "error", "source": "enrollment"}
-        update_status_callback(error_update)
+        update_status_callback(error_update, job)
         print(f"ENROLLMENT TASK ERROR: {e}")
+        raise
+    return {"status": job.details["status"], "message": job.details["message"]}
 
-async def log_streamer(request: Request):
-    """Yields server-sent events to the client."""
-    # Use a local queue to buffer messages for this specific client
-    # This prevents race conditions if multiple clients connect.
-    client_queue: "Queue[str]" = Queue()
 
-    # Function to copy messages from the global queue to the local one
-    async def queue_copier():
-        while True:
-            message = await log_queue.get()
-            await client_queue.put(message)
-            log_queue.task_done()
+def _job_paths(details: Dict):
+    """(folders the job reads, folders it writes) for the overlap check."""
+    source, dest = details.get("source_folder"), details.get("destination_folder")
+    reads = [os.path.realpath(source)] if source else []
+    writes = [os.path.realpath(dest)] if dest else []
+    if details.get("operation_mode") == "move":
+        writes += reads  # A move empties (and removes) source folders
+    return reads, writes
 
-    copier_task = asyncio.create_task(queue_copier())
+
+def _paths_overlap(a: str, b: str) -> bool:
+    try:
+        return os.path.commonpath([a, b]) in (a, b)
+    except ValueError:  # Different drives on Windows
+        return False
+
+
+def _conflicting_job(details: Dict):
+    """An unfinished organize job whose folders overlap the ones `details` writes or reads."""
+    reads, writes = _job_paths(details)
+    for other in job_executor.jobs(ORGANIZE_JOB_KINDS, active=True):
+        other_reads, other_writes = _job_paths(other.details)
+        if any(_paths_overlap(w, p) for w in writes for p in other_reads + other_writes) or \
+           any(_paths_overlap(w, p) for w in other_writes for p in reads):
+            return other
+    return None
+
+
+def _start_organize_job(kind: str, fn, arg, details: Dict, priority: Optional[str]):
+    """
+    Queues an organize job. Jobs over disjoint folders run side by side (up to the
+    per-kind limit); one that would read or write another running job's folders is refused.
+    """
+    conflict = _conflicting_job(details)
+    if conflict is not None:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Job {conflict.id} ({conflict.kind}) is already working in these folders. Wait for it to finish first.",
+        )
+    return job_executor.submit(
+        kind, fn, arg, workload=WORKLOAD_ORGANIZE, details=details,
+        priority=PRIORITIES.get(priority or "interactive", PRIORITY_INTERACTIVE),
+    )
+
+
+def _job_status(job) -> Dict:
+    """The /api/job-status view of an organize job."""
+    state = dict(job.details)
+    state["is_active"] = not job.finished
+    state["job_id"] = job.id
+    state["job_status"] = job.status
+    if job.status == "queued":
+        state["message"] = "Queued: waiting for other jobs to finish..."
+    return state
+
+
+async def log_streamer(request: Request):
+    """Yields server-sent events to the client."""
+    # Each client reads the shared event hub through its own cursor, so several
+    # clients (UI, MCP agent) all see every event. A reconnecting EventSource
+    # sends Last-Event-ID and resumes right after the last event it received.
+    subscriber = event_hub.subscribe(last_event_id=request.headers.get("last-event-id"))
 
     try:
         while True:
@@ -676,25 +756,43 @@ async def log_streamer(request: Request):
             if await request.is_disconnected():
                 print("Client disconnected, closing log stream.")
                 break
-            
-            try:
-                # Wait for a message from the local queue
-                log_message = await asyncio.wait_for(client_queue.get(), timeout=1.0)
-                yield f"data: {log_message}\n\n"
-                client_queue.task_done()
-            except asyncio.TimeoutError:
-                # No message, just loop and check for disconnect again
-                continue
+
+            # Wait up to a second for new events, then loop and check for disconnect again
+            events, missed = await subscriber.next_batch(timeout=1.0)
+            if missed:
+                # Named event: the UI's onmessage handler ignores it, agents can resync.
+                yield f"event: gap\ndata: {json.dumps({'missed': missed})}\n\n"
+            for event in events:
+                yield f"id: {event_hub.event_id(event)}\ndata: {event.data}\n\n"
     except CancelledError:
         print("Log stream cancelled.")
     finally:
-        copier_task.cancel()
+        subscriber.close()
 
 
 # ==============================================================================
 #  API Endpoints
 # ==============================================================================
 
+async def _run_job(kind: str, fn, *args, workload: str = WORKLOAD_CPU, background: bool = False):
+    """
+    Runs the blocking fn(job, *args) on the job executor instead of the event loop.
+    Awaits and returns its result, or — with ?background=true — returns the job id
+    at once; progress and result are then read from /api/jobs/{job_id}.
+    """
+    job = job_executor.submit(kind, fn, *args, workload=workload)
+    if background:
+        return {"status": "queued", "job_id": job.id, "kind": kind}
+    try:
+        return await job_executor.wait(job)
+    except OperationAbortedError:
+        raise HTTPException(status_code=409, detail=f"Job {job.id} was cancelled.")
+    except CancelledError:
+        if job.future.cancelled():  # Cancelled via /api/jobs/{id}/cancel before it started
+            raise HTTPException(status_code=409, detail=f"Job {job.id} was cancelled.")
+        raise
+
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the Photo Organizer API. Please refer to the documentation for available endpoints."}
@@ -705,53 +803,33 @@ async def stream_logs(request: Request):
     return StreamingResponse(log_streamer(request), media_type="text/event-stream")
 
 @app.post("/api/list-subfolders")
-async def list_subfolders(request: SubfolderRequest):
+async def list_subfolders(request: SubfolderRequest, background: bool = False):
     """
     MODIFIED: Lists subdirectories as a hierarchical tree and dynamically counts 
     files and folders, respecting an ignore list of full paths.
+    Runs on the I/O job pool; ?background=true returns a job id instead.
     """
     source_path = os.path.expanduser(request.path) if request.path else ""
-    # The ignore list now contains full paths.
-    ignore_set = set(request.ignore_list or [])
 
     if not source_path or not os.path.isdir(source_path):
         raise HTTPException(status_code=404, detail="Source path is not a valid directory.")
-    try:
-        # Build the hierarchical tree structure for the UI.
-        folder_tree = build_folder_tree(source_path)
-        
-        file_count = 0
-        folder_count = 0
-        
-        # CORRECTED LOGIC: Walk the entire directory tree to accurately count items.
-        # This now matches the behavior of the core processing logic.
-        for dirpath, dirnames, filenames in os.walk(source_path):
-            # Count folders that are NOT in the ignore list.
-            # We check this by iterating through the children of the current dirpath.
-            for d in dirnames:
-                if os.path.join(dirpath, d) not in ignore_set:
-                    folder_count += 1
-
-            # If the current directory itself is ignored, skip counting its files,
-            # but allow os.walk to continue into its subdirectories (like 'B' inside 'A').
-            if dirpath in ignore_set:
-                continue
-            
-            # If the directory is not ignored, count its supported files.
-            file_count += len([f for f in filenames if f.lower().endswith(SUPPORTED_EXTENSIONS)])
 
-        return {
-            "subfolders": folder_tree, # Return the tree structure
-            "stats": {
-                "folder_count": folder_count,
-                "file_count": file_count
+    def list_job(job):
+        try:
+            # One walk builds the hierarchical tree for the UI and counts folders and
+            # files, respecting the ignore list (full paths) like the core processing logic.
+            folder_tree, stats = scan_folder_tree(source_path, request.ignore_list)
+            return {
+                "subfolders": folder_tree, # Return the tree structure
+                "stats": stats
             }
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to read directory contents: {str(e)}")
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to read directory contents: {str(e)}")
+
+    return await _run_job("list_subfolders", list_job, workload=WORKLOAD_IO, background=background)
 
 @app.post("/api/start-sorting")
-async def start_sorting_endpoint(request: SortRequest, background_tasks: BackgroundTasks):
+async def start_sorting_endpoint(request: SortRequest):
     """Starts the photo organization process in the background."""
     sort_opts = request.sorting_options.dict()
     config = {
@@ -766,13 +844,13 @@ async def start_sorting_endpoint(request: SortRequest, background_tasks: Backgro
         config["specific_files"] = sort_opts["specific_files"]
     if sort_opts.get("mtime_cutoff") is not None:
         config["sorting_options"]["mtime_cutoff"] = sort_opts["mtime_cutoff"]
-    background_tasks.add_task(run_organization_task, config)
-    return {"status": "started", "message": "Organization process started successfully."}
+    job = _start_organize_job("sorting", _organization_job, config, _sorting_job_details(config), request.priority)
+    return {"status": "started", "message": "Organization process started successfully.", "job_id": job.id}
 
 
 # NEW: Endpoint to start the 'Find & Group' process
 @app.post("/api/start-find-group")
-async def start_find_group_endpoint(request: FindGroupRequest, background_tasks: BackgroundTasks):
+async def start_find_group_endpoint(request: FindGroupRequest):
     """Starts the 'Find & Group' process in the background."""
     config = {
         "source_folder": os.path.expanduser(request.source_folder),
@@ -781,44 +859,49 @@ async def start_find_group_endpoint(request: FindGroupRequest, background_tasks:
         "ignore_list": request.ignore_list or [],
         # REMOVE: No longer passing operation_mode from here.
     }
-    background_tasks.add_task(run_find_group_task, config)
-    return {"message": "Find & Group process started successfully."}
+    job = _start_organize_job("find_group", _find_group_job, config, _find_group_job_details(config), request.priority)
+    return {"status": "started", "message": "Find & Group process started successfully.", "job_id": job.id}
 
 
 @app.post("/api/metadata-overview")
-async def get_metadata_overview_endpoint(request: MetadataOverviewRequest):
-    """Scans the source folder to return all available filter criteria."""
+async def get_metadata_overview_endpoint(request: MetadataOverviewRequest, background: bool = False):
+    """
+    Scans the source folder to return all available filter criteria.
+    Runs on the CPU job pool; ?background=true returns a job id instead.
+    """
     source_folder = os.path.expanduser(request.source_folder) if request.source_folder else ""
     if not source_folder or not os.path.isdir(source_folder):
         raise HTTPException(status_code=400, detail="Source path is not a valid directory.")
     
     from organizer_logic import get_metadata_overview as get_metadata_logic
 
-    try:
-        locations, date_info, people = get_metadata_logic(
-            source_folder, 
-            request.ignore_list,
-            ENCODINGS_FILE
-        )
-        
-        return {
-            "locations": locations,
-            "dates": date_info, # MODIFIED: from "years" to "dates"
-            "people": people
-        }
-    except Exception as e:
-        logging.error(f"Error during metadata scan: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"An unexpected error occurred during metadata scan: {str(e)}")
+    def overview_job(job):
+        try:
+            locations, date_info, people = get_metadata_logic(
+                source_folder, 
+                request.ignore_list,
+                ENCODINGS_FILE
+            )
+            
+            return {
+                "locations": locations,
+                "dates": date_info, # MODIFIED: from "years" to "dates"
+                "people": people
+            }
+        except Exception as e:
+            logging.error(f"Error during metadata scan: {e}", exc_info=True)
+            raise HTTPException(status_code=500, detail=f"An unexpected error occurred during metadata scan: {str(e)}")
+
+    return await _run_job("metadata_overview", overview_job, workload=WORKLOAD_CPU, background=background)
 
 
 # UPDATED: Endpoint now handles batch enrollment of multiple people.
 @app.post("/api/add-person")
-async def add_person_endpoint(request: BatchEnrollmentRequest, background_tasks: BackgroundTasks):
+async def add_person_endpoint(request: BatchEnrollmentRequest):
     """
     Accepts a batch of people and their images, copies them to the
     enrollment directory, and then triggers the background enrollment task.
     """
-    from enrollment_logic import update_encodings
     newly_created_dirs = []
     try:
         for person_data in request.people_to_enroll:
@@ -839,10 +922,13 @@ async def add_person_endpoint(request: BatchEnrollmentRequest, background_tasks:
                     # Log a warning but don't stop the whole batch
                     print(f"Warning: Image path not found, skipping: {image_path}")
 
-        # Start the background task, passing the list of directories to be cleaned up on abort.
-        background_tasks.add_task(run_enrollment_task, newly_created_dirs)
+        # Start the background job, passing the list of directories to be cleaned up on abort.
+        # Enrollments run one at a time (kind limit), so a second one queues behind the first.
+        details = dict(_IDLE_JOB_STATE, status="running", message="Starting enrollment...", job_type="enrollment")
+        job = job_executor.submit("enrollment", _enrollment_job, newly_created_dirs,
+                                  workload=WORKLOAD_ORGANIZE, details=details)
 
-        return {"message": "Batch enrollment process started successfully."}
+        return {"message": "Batch enrollment process started successfully.", "job_id": job.id}
     except Exception as e:
         # If setup fails, clean up any directories that were created
         for d in newly_created_dirs:
@@ -852,16 +938,27 @@ async def add_person_endpoint(request: BatchEnrollmentRequest, background_tasks:
 
 
 @app.post("/api/abort-process")
-async def abort_process():
-    """Sets all cancellation events and sends an immediate confirmation to the UI."""
-    global current_job_state
-    if not current_job_state.get("is_active"):
+async def abort_process(request: Optional[AbortRequest] = Body(None)):
+    """
+    Cancels one organize job — `job_id`, or by default the newest active one,
+    preferring jobs started interactively over scheduled ones — and sends an
+    immediate confirmation to the UI. Other jobs keep running.
+    """
+    if request is not None and request.job_id:
+        job = job_executor.get(request.job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Unknown job: {request.job_id}")
+        target = None if job.finished else job
+    else:
+        active = job_executor.jobs(ORGANIZE_JOB_KINDS, active=True)
+        interactive = [j for j in active if j.priority == PRIORITY_INTERACTIVE]
+        target = (interactive or active or [None])[0]
+    if target is None:
         print("ABORT REQUEST RECEIVED: But no active process is running.")
         return {"status": "ignored", "message": "No active processes to abort."}
 
-    print("ABORT REQUEST RECEIVED: Setting cancellation events.")
-    for event in cancellation_events.values():
-        event.set()
+    print(f"ABORT REQUEST RECEIVED: Cancelling job {target.id} ({target.kind}).")
+    job_executor.cancel(target.id)
     
     # Immediately send a confirmation back to the UI via the log stream
     # This provides instant feedback that the signal was received.
@@ -869,9 +966,10 @@ async def abort_process():
         "progress": 100, 
         "message": "Abort signal received by backend. Awaiting task termination...", 
         "status": "warning",
-        "source": "system" # Use a neutral source
+        "source": "system", # Use a neutral source
+        "job_id": target.id,
     })
-    return {"status": "success", "message": "Abort signal sent to all running tasks."}
+    return {"status": "success", "message": f"Abort signal sent to job {target.id}.", "job_id": target.id}
 
 
 # ==============================================================================
@@ -913,7 +1011,7 @@ async def open_folder_endpoint(request: OpenFolderRequest):
 
 
 @app.post("/api/delete-files")
-async def delete_files_endpoint(request: DeleteFilesRequest):
+async def delete_files_endpoint(request: DeleteFilesRequest, background: bool = False):
     """
     Deletes a list of files. Prefers sending to OS Trash (via send2trash)
     for safety; falls back to permanent os.remove if send2trash is unavailable.
@@ -926,10 +1024,16 @@ async def delete_files_endpoint(request: DeleteFilesRequest):
     - failed:  list of {path, error} for files that couldn't be removed
     - total_freed_mb: disk space freed (0.0 in dry_run mode)
     - dry_run: echoes whether this was a preview or real deletion
+
+    Runs on the I/O job pool; ?background=true returns a job id instead.
     """
     if not request.file_paths:
         raise HTTPException(status_code=400, detail="file_paths list is empty.")
+    return await _run_job("delete_files", _delete_files_job, request, workload=WORKLOAD_IO, background=background)
+
 
+def _delete_files_job(job, request: DeleteFilesRequest):
+    """Body of /api/delete-files, run on the I/O job pool."""
     # Try to import send2trash for safe trash-based deletion
     try:
         from send2trash import send2trash
@@ -941,7 +1045,8 @@ async def delete_files_endpoint(request: DeleteFilesRequest):
     failed = []
     total_freed_bytes = 0
 
-    for fp in request.file_paths:
+    for index, fp in enumerate(request.file_paths):
+        job.report(100 * index // len(request.file_paths), f"Checking {os.path.basename(fp)}")
         expanded = os.path.expanduser(fp)
         if not os.path.isfile(expanded):
             failed.append({"path": fp, "error": "File does not exist"})
@@ -967,6 +1072,13 @@ async def delete_files_endpoint(request: DeleteFilesRequest):
             except Exception as e:
                 failed.append({"path": fp, "error": str(e)})
 
+    if deleted and not request.dry_run:
+        try:
+            from perceptual_index import perceptual_index
+            perceptual_index.forget(deleted)  # Keep the duplicate finder's index in step
+        except Exception:
+            pass
+
     return {
         "status": "preview" if request.dry_run else "deleted",
         "dry_run": request.dry_run,
@@ -992,20 +1104,38 @@ class FindDuplicatesRequest(BaseModel):
     source_folder: str
     ignore_list: Optional[List[str]] = []
     similarity_threshold: Optional[float] = 0.95
+    # Further folders (e.g. organized libraries) searched together with source_folder.
+    extra_folders: Optional[List[str]] = []
+
+
+def _similarity_to_distance(similarity_threshold: Optional[float]):
+    """(threshold, max Hamming distance) for a 0-1 similarity."""
+    threshold = max(0.0, min(1.0, similarity_threshold or 0.95))
+    # Convert similarity 0-1 to hamming distance threshold.
+    # pHash produces 64-bit hashes; max hamming distance is 64.
+    # A similarity of 0.95 means max_distance = 64 * (1 - 0.95) = 3.2 → 3
+    return threshold, int(64 * (1.0 - threshold))
+
 
 @app.post("/api/find-duplicates")
-async def find_duplicates_endpoint(request: FindDuplicatesRequest):
+async def find_duplicates_endpoint(request: FindDuplicatesRequest, background: bool = False):
     """
-    Scans a source folder for duplicate or near-duplicate images using
-    perceptual hashing (pHash). Groups visually similar files together.
+    Scans a source folder (plus any extra folders) for duplicate or
+    near-duplicate images using perceptual hashing (pHash). Groups visually
+    similar files together, across folders.
+    Runs on the CPU job pool; ?background=true returns a job id instead.
     """
-    source_folder = os.path.expanduser(request.source_folder) if request.source_folder else ""
-    if not source_folder or not os.path.isdir(source_folder):
-        raise HTTPException(status_code=400, detail="Source path is not a valid directory.")
+    folders = []
+    for folder in [request.source_folder] + list(request.extra_folders or []):
+        folder = os.path.expanduser(folder) if folder else ""
+        if not folder or not os.path.isdir(folder):
+            raise HTTPException(status_code=400, detail=f"Not a valid directory: {folder or '(empty)'}")
+        if folder not in folders:
+            folders.append(folder)
 
     try:
-        from PIL import Image as PILImage
-        import imagehash
+        import imagehash  # noqa: F401 — perceptual_index hashes with it
+        from perceptual_index import perceptual_index
     except ImportError:
         # imagehash is an optional dependency — graceful degradation
         raise HTTPException(
@@ -1013,67 +1143,162 @@ async def find_duplicates_endpoint(request: FindDuplicatesRequest):
             detail="The 'imagehash' library is not installed. Run: pip install imagehash"
         )
 
+    return await _run_job(
+        "find_duplicates", _find_duplicates_job, request, folders, perceptual_index,
+        workload=WORKLOAD_CPU, background=background,
+    )
+
+
+def _find_duplicates_job(job, request: FindDuplicatesRequest, folders: List[str], perceptual_index):
+    """Body of /api/find-duplicates, run on the CPU job pool."""
     ignore_set = set(request.ignore_list or [])
-    threshold = max(0.0, min(1.0, request.similarity_threshold or 0.95))
-    # Convert similarity 0-1 to hamming distance threshold.
-    # pHash produces 64-bit hashes; max hamming distance is 64.
-    # A similarity of 0.95 means max_distance = 64 * (1 - 0.95) = 3.2 → 3
-    max_distance = int(64 * (1.0 - threshold))
+    threshold, max_distance = _similarity_to_distance(request.similarity_threshold)
 
     # --- Collect all supported image files ---
-    image_files = []
-    for dirpath, _, filenames in os.walk(source_folder):
-        if dirpath in ignore_set:
-            continue
-        for f in filenames:
-            if f.lower().endswith(SUPPORTED_EXTENSIONS):
-                image_files.append(os.path.join(dirpath, f))
-
-    if not image_files:
+    job.report(0, "Scanning folders...")
+    image_entries, seen_paths = [], set()
+    for folder in folders:
+        for entry in scan_files(folder, ignore_set, SUPPORTED_EXTENSIONS):
+            if entry.path not in seen_paths:  # Nested folders
+                seen_paths.add(entry.path)
+                image_entries.append(entry)
+    job.check_cancelled()
+
+    if not image_entries:
         return {"status": "ok", "duplicate_groups": [], "total_scanned": 0, "total_duplicates": 0}
 
-    # --- Compute perceptual hashes ---
-    file_hashes = []
+    files = []
     skipped = 0
-    for fp in image_files:
+    for entry in image_entries:
         try:
-            with PILImage.open(fp) as img:
-                h = imagehash.phash(img)
-            file_hashes.append((fp, h))
-        except Exception:
-            skipped += 1  # Corrupt or unreadable image
+            files.append((entry.path, entry.stat()))
+        except OSError:
+            skipped += 1
+
+    # --- Stage 1: byte-identical copies (size → head/tail hash → full hash), nothing decoded ---
+    job.report(10, f"Looking for exact copies among {len(files)} files...")
+    exact_groups = identical_groups(files)
+    job.check_cancelled()
+    copies_of = {group[0]: group for group in exact_groups}
+    copies = {path for group in exact_groups for path in group[1:]}
+
+    # --- Stage 2: perceptual hashes for the rest, one file per identical set ---
+    # From the persistent index; images it has never seen are decoded on worker processes.
+    job.report(30, "Computing perceptual hashes...")
+    pending = [(path, st) for path, st in files if path not in copies]
+    known = perceptual_index.hashes_many(
+        pending, compute_map=lambda fn, items: job_executor.map_processes(fn, items, job)
+    )
+    job.check_cancelled()
+    job.report(90, "Grouping similar images...")
+    file_hashes = []
+    for path, st in pending:
+        hashes = known.get(path)
+        if hashes is None:
+            # Undecodable (RAW/HEIF Pillow can't open, truncated file). Byte-identical
+            # copies were already proven in stage 1 and still report as an exact group.
+            if path not in copies_of:
+                skipped += 1
             continue
+        file_hashes.append((path, hashes[0]))
 
     # --- Group by similarity ---
-    # Simple O(n²) comparison — acceptable for typical photo libraries (<50k files)
-    used = set()
-    groups = []
-    for i, (path_a, hash_a) in enumerate(file_hashes):
-        if i in used:
-            continue
-        group = [path_a]
-        for j in range(i + 1, len(file_hashes)):
-            if j in used:
-                continue
-            path_b, hash_b = file_hashes[j]
-            if hash_a - hash_b <= max_distance:
-                group.append(path_b)
-                used.add(j)
-        if len(group) > 1:
-            groups.append(group)
-            used.add(i)
+    # Multi-index hashing over a uint64 array; same groups as comparing every pair.
+    # Each representative brings its byte-identical copies along.
+    groups, grouped = [], set()
+    for group in group_near_duplicates([h for _, h in file_hashes], max_distance):
+        paths = []
+        for i in group:
+            path = file_hashes[i][0]
+            grouped.add(path)
+            paths.extend(copies_of.get(path, [path]))
+        groups.append(paths)
+    groups.extend(group for group in exact_groups if group[0] not in grouped)
+    position = {path: i for i, (path, _) in enumerate(files)}
+    groups.sort(key=lambda group: position[group[0]])
 
     total_dupes = sum(len(g) for g in groups)
     return {
         "status": "ok",
         "duplicate_groups": groups,
-        "total_scanned": len(file_hashes),
+        "exact_duplicate_groups": exact_groups,
+        "total_scanned": len(image_entries) - skipped,
         "total_duplicates": total_dupes,
+        "exact_duplicates": sum(len(g) for g in exact_groups),
+        "perceptually_hashed": len(file_hashes),
         "skipped_files": skipped,
         "similarity_threshold": threshold,
     }
 
 
+class PerceptualIndexRefreshRequest(BaseModel):
+    folders: List[str]
+    ignore_list: Optional[List[str]] = []
+
+
+@app.post("/api/perceptual-index/refresh")
+async def perceptual_index_refresh(request: PerceptualIndexRefreshRequest, background: bool = False):
+    """
+    Brings the duplicate finder's index up to date for the given folders:
+    hashes new and changed images, drops deleted ones.
+    Runs on the CPU job pool; ?background=true returns a job id instead.
+    """
+    folders = [os.path.expanduser(f) for f in request.folders if f]
+    invalid = [f for f in folders if not os.path.isdir(f)]
+    if not folders or invalid:
+        raise HTTPException(status_code=400, detail=f"Not a valid directory: {invalid[0] if invalid else '(none)'}")
+
+    def refresh_job(job):
+        try:
+            from perceptual_index import perceptual_index
+            stats = perceptual_index.refresh(
+                folders, SUPPORTED_EXTENSIONS, request.ignore_list or [], should_abort=job.cancelled.is_set
+            )
+            job.check_cancelled()
+            return {"status": "ok", "folders": folders, **stats}
+        except OperationAbortedError:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    return await _run_job("perceptual_index_refresh", refresh_job, workload=WORKLOAD_CPU, background=background)
+
+
+class SimilarImagesRequest(BaseModel):
+    path: str
+    similarity_threshold: Optional[float] = 0.95
+    folders: Optional[List[str]] = None   # Limit matches to these folders (default: whole index)
+    max_matches: Optional[int] = 50
+
+
+@app.post("/api/perceptual-index/similar")
+async def perceptual_index_similar(request: SimilarImagesRequest):
+    """
+    Checks one image against every indexed file (e.g. the whole organized
+    library) without decoding any of them. Closest matches first.
+    Runs on the CPU job pool (decodes the query image; the first query after
+    an index change reloads the library snapshot).
+    """
+    path = os.path.expanduser(request.path)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=400, detail="Path is not a file.")
+    threshold, max_distance = _similarity_to_distance(request.similarity_threshold)
+
+    def similar_job(job):
+        try:
+            from perceptual_index import perceptual_index
+            matches = perceptual_index.similar(
+                path, max_distance,
+                folders=[os.path.expanduser(f) for f in request.folders or []],
+                max_matches=request.max_matches or 50,
+            )
+            return {"status": "ok", "path": path, "similarity_threshold": threshold, "matches": matches}
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    return await _run_job("perceptual_index_similar", similar_job, workload=WORKLOAD_CPU)
+
+
 class ExportReportRequest(BaseModel):
     source_folder: str
     ignore_list: Optional[List[str]] = []
@@ -1082,15 +1307,23 @@ class ExportReportRequest(BaseModel):
     include_face_summary: Optional[bool] = True
 
 @app.post("/api/export-report")
-async def export_report_endpoint(request: ExportReportRequest):
+async def export_report_endpoint(request: ExportReportRequest, background: bool = False):
     """
     Generates a comprehensive, branded PDF report about a photo folder.
     Delegates rendering to report_pdf.generate_report_pdf().
+    Runs on the CPU job pool; ?background=true returns a job id instead.
     """
     source_folder = os.path.expanduser(request.source_folder) if request.source_folder else ""
     if not source_folder or not os.path.isdir(source_folder):
         raise HTTPException(status_code=400, detail="Source path is not a valid directory.")
+    return await _run_job(
+        "export_report", _export_report_job, request, source_folder,
+        workload=WORKLOAD_CPU, background=background,
+    )
+
 
+def _export_report_job(job, request: ExportReportRequest, source_folder: str):
+    """Body of /api/export-report, run on the CPU job pool."""
     from organizer_logic import get_metadata_overview as get_metadata_logic
     from report_pdf import generate_report_pdf
 
@@ -1103,34 +1336,36 @@ async def export_report_endpoint(request: ExportReportRequest):
     extension_counts: Dict[str, int] = {}
     subfolder_count = 0
     subfolder_list = []
+    image_entries = []  # Handed to the metadata overview so the folder is walked once
 
-    for dirpath, dirnames, filenames in os.walk(source_folder):
+    job.report(0, "Scanning folder...")
+    for dirpath, dirnames, file_entries in walk_library(source_folder):
+        job.check_cancelled()
         if dirpath in ignore_set:
             continue
         if dirpath != source_folder:
             subfolder_count += 1
             subfolder_list.append(os.path.relpath(dirpath, source_folder))
-        for f in filenames:
-            if f.lower().endswith(SUPPORTED_EXTENSIONS):
+        for entry in file_entries:
+            if entry.name.lower().endswith(SUPPORTED_EXTENSIONS):
                 file_count += 1
-                fp = os.path.join(dirpath, f)
-                try:
-                    total_size_bytes += os.path.getsize(fp)
-                except OSError:
-                    pass
-                ext = os.path.splitext(f)[1].lower()
+                total_size_bytes += entry_size(entry)
+                ext = os.path.splitext(entry.name)[1].lower()
                 extension_counts[ext] = extension_counts.get(ext, 0) + 1
+                image_entries.append(entry)
 
     # --- Metadata overview (reuses existing logic) ---
     locations = []
     date_info = {}
     people = []
     if request.include_metadata:
+        job.report(30, f"Reading metadata of {file_count} files...")
         try:
             locations, date_info, people = get_metadata_logic(
                 source_folder,
                 request.ignore_list,
-                ENCODINGS_FILE if request.include_face_summary else None
+                ENCODINGS_FILE if request.include_face_summary else None,
+                files=image_entries,
             )
         except Exception as e:
             logging.error(f"Metadata scan failed during report export: {e}")
@@ -1154,6 +1389,8 @@ async def export_report_endpoint(request: ExportReportRequest):
         logo_path = None
 
     # --- Generate PDF ---
+    job.check_cancelled()
+    job.report(80, "Rendering PDF...")
     try:
         generate_report_pdf(
             output_path=output_path,
@@ -1273,10 +1510,76 @@ async def check_dependencies():
     # MODIFIED: Access the variable through the module to get its current state.
     return {"face_recognition_installed": organizer_logic.face_recognition is not None}
 
+@app.get("/api/jobs")
+async def list_jobs(kind: Optional[str] = None, active: Optional[bool] = None):
+    """
+    Jobs (organize jobs, duplicate scans, reports, folder listings, deletes), newest
+    first; ?kind=sorting and ?active=true narrow the list.
+    """
+    return {"jobs": job_executor.list_jobs([kind] if kind else None, active), **job_executor.get_stats()}
+
+@app.put("/api/jobs/limits")
+async def set_job_limits(limits: Dict[str, int] = Body(...)):
+    """Sets how many jobs of each kind may run at once, e.g. {"sorting": 3}."""
+    for kind, limit in limits.items():
+        if limit < 1:
+            raise HTTPException(status_code=400, detail=f"Limit for '{kind}' must be at least 1.")
+        job_executor.set_kind_limit(kind, limit)
+    return job_executor.get_stats()
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status and progress of one background job, plus its result once completed."""
+    job = job_executor.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    data = job.to_dict(include_result=True)
+    data["error_status_code"] = job.error_status_code
+    return data
+
+@app.get("/api/jobs/{job_id}/wait")
+async def wait_for_job(job_id: str, timeout: float = 60.0):
+    """
+    Long-poll: answers as soon as the job finishes — with its structured result
+    (counts, errors, per-file outcomes for organize jobs) — or after `timeout`
+    seconds (at most MAX_JOB_WAIT_S) with finished=false, so clients wait
+    without polling.
+    """
+    job = job_executor.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    finished = await job_executor.wait_done(job, max(0.0, min(timeout, MAX_JOB_WAIT_S)))
+    data = job.to_dict(include_result=finished)
+    data["finished"] = finished
+    data["error_status_code"] = job.error_status_code
+    return data
+
+@app.post("/api/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """Drops a queued job or asks a running one to stop at its next checkpoint."""
+    job = job_executor.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job.to_dict()
+
 @app.get("/api/job-status")
-async def get_job_status():
-    """Returns the current processing status state. Useful for external polling."""
-    return current_job_state
+async def get_job_status(job_id: Optional[str] = None):
+    """
+    Returns the processing status state of an organize job — `job_id`, or the
+    newest active one (interactive first), or else the last one that ran.
+    Useful for external polling.
+    """
+    if job_id:
+        job = job_executor.get(job_id)
+        if job is None or job.kind not in ORGANIZE_JOB_KINDS:
+            raise HTTPException(status_code=404, detail=f"Unknown organize job: {job_id}")
+        return _job_status(job)
+    active = job_executor.jobs(ORGANIZE_JOB_KINDS, active=True)
+    interactive = [j for j in active if j.priority == PRIORITY_INTERACTIVE]
+    recent = interactive or active or job_executor.jobs(ORGANIZE_JOB_KINDS)
+    if not recent:
+        return dict(_IDLE_JOB_STATE, job_id=None)
+    return _job_status(recent[0])
 
 @app.get("/api/enrollment-status")
 async def get_enrollment_status():
@@ -1882,6 +2185,133 @@ async def metadata_store_purge():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/analysis-cache/stats", dependencies=[Depends(require_local_token)])
+async def analysis_cache_stats():
+    """Return analysis cache health: cached file count, DB size, hit/miss counters."""
+    try:
+        from analysis_cache import analysis_cache
+        return analysis_cache.get_stats()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.delete("/api/analysis-cache/purge", dependencies=[Depends(require_local_token)])
+async def analysis_cache_purge():
+    """
+    Privacy: Wipe the per-file analysis cache (dates, GPS coordinates,
+    locations, camera models). It is rebuilt on the next scan.
+    """
+    try:
+        from analysis_cache import analysis_cache
+        return analysis_cache.purge_all()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/snapshot-index/stats", dependencies=[Depends(require_local_token)])
+async def snapshot_index_stats():
+    """Return the folders scheduled sweeps keep snapshots of, with folder/file counts."""
+    try:
+        from snapshot_index import snapshot_index
+        return snapshot_index.get_stats()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.delete("/api/snapshot-index/purge", dependencies=[Depends(require_local_token)])
+async def snapshot_index_purge():
+    """
+    Privacy: Wipe the folder snapshots used by scheduled sweeps (folder paths,
+    file names, sizes and timestamps). The next sweep of each folder walks it fully.
+    """
+    try:
+        from snapshot_index import snapshot_index
+        return snapshot_index.purge_all()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/perceptual-index/stats", dependencies=[Depends(require_local_token)])
+async def perceptual_index_stats():
+    """Return duplicate-finder index health: indexed files, hashed images, DB size."""
+    try:
+        from perceptual_index import perceptual_index
+        return perceptual_index.get_stats()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.delete("/api/perceptual-index/purge", dependencies=[Depends(require_local_token)])
+async def perceptual_index_purge():
+    """
+    Privacy: Wipe the duplicate finder's index (file paths and image hashes).
+    Images are hashed again on the next duplicate search.
+    """
+    try:
+        from perceptual_index import perceptual_index
+        return perceptual_index.purge_all()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/journals", dependencies=[Depends(require_local_token)])
+async def list_operation_journals():
+    """
+    Organize jobs that did not finish (backend crash, reboot, error) and whose
+    operation journal is still on disk, with how far each one got.
+    """
+    try:
+        from operation_journal import list_journals
+        return {"journals": list_journals()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/journals/{job_id}/resume")
+async def resume_operation_journal(job_id: str):
+    """
+    Continues an interrupted organize job with its original settings. Files the
+    journal shows as finished are skipped without being analysed again;
+    half-finished operations are undone first and redone.
+    """
+    try:
+        from operation_journal import load_job
+        config = load_job(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"No resumable job '{job_id}'.")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    config["resume_job_id"] = job_id
+    # Refused with 409 while another job works in the same folders.
+    job = _start_organize_job("sorting", _organization_job, config, _sorting_job_details(config), "interactive")
+    return {"status": "started", "message": "Resuming the interrupted organization job.", "job_id": job.id, "journal_id": job_id}
+
+
+@app.delete("/api/journals/{job_id}", dependencies=[Depends(require_local_token)])
+async def discard_operation_journal(job_id: str):
+    """Privacy: Delete an interrupted job's journal (file paths of its copies and moves). It can no longer be resumed."""
+    try:
+        from operation_journal import discard_journal
+        discard_journal(job_id)
+        return {"status": "deleted", "job_id": job_id}
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"No journal '{job_id}'.")
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/geocoding/stats")
+async def geocoding_stats():
+    """Return reverse-geocoder cache counters (hits, misses, KD-tree queries) for this session."""
+    try:
+        from geocoding import geocoder
+        return geocoder.get_stats()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.get("/api/privacy/summary", dependencies=[Depends(require_local_token)])
 async def privacy_summary():
     """
@@ -1919,6 +2349,10 @@ async def privacy_summary():
         config_dir = str(_Path.home() / ".config" / "LocalLens")
 
     db_path         = os.path.join(config_dir, "metadata_store.db")
+    cache_db_path   = os.path.join(config_dir, "analysis_cache.db")
+    snapshot_db_path = os.path.join(config_dir, "snapshot_index.db")
+    perceptual_db_path = os.path.join(config_dir, "perceptual_index.db")
+    journals_path   = os.path.join(config_dir, "journals")
     schedules_path  = os.path.join(config_dir, "schedules.json")
     license_path    = os.path.join(config_dir, "mcp_license.json")
     presets_path    = str(PATH_PRESETS_FILE)
@@ -1932,6 +2366,38 @@ async def privacy_summary():
     except Exception:
         pass
 
+    # ── Analysis cache stats ─────────────────────────────────────────────────────
+    cache_stats = {"entry_count": 0}
+    try:
+        from analysis_cache import analysis_cache
+        cache_stats = analysis_cache.get_stats()
+    except Exception:
+        pass
+
+    # ── Sweep snapshot stats ─────────────────────────────────────────────────────
+    snapshot_roots = []
+    try:
+        from snapshot_index import snapshot_index
+        snapshot_roots = snapshot_index.get_stats().get("roots", [])
+    except Exception:
+        pass
+
+    # ── Duplicate-finder index stats ─────────────────────────────────────────────
+    perceptual_stats = {"indexed_files": 0}
+    try:
+        from perceptual_index import perceptual_index
+        perceptual_stats = perceptual_index.get_stats()
+    except Exception:
+        pass
+
+    # ── Interrupted-job journals ──────────────────────────────────────────────────
+    journals = []
+    try:
+        from operation_journal import list_journals
+        journals = list_journals()
+    except Exception:
+        pass
+
     # ── Persona status ────────────────────────────────────────────────────────────
     persona_active = False
     cloud_consent  = {"consented": False, "provider": None}
@@ -1969,6 +2435,34 @@ async def privacy_summary():
                 "can_purge":        True,
                 "purge_endpoint":   "DELETE /api/metadata-store/purge",
             },
+            "analysis_cache": {
+                "path":             cache_db_path,
+                "size":             _size_label(cache_db_path),
+                "cached_files":     cache_stats.get("entry_count", 0),
+                "can_purge":        True,
+                "purge_endpoint":   "DELETE /api/analysis-cache/purge",
+            },
+            "snapshot_index": {
+                "path":             snapshot_db_path,
+                "size":             _size_label(snapshot_db_path),
+                "snapshotted_folders": len(snapshot_roots),
+                "can_purge":        True,
+                "purge_endpoint":   "DELETE /api/snapshot-index/purge",
+            },
+            "perceptual_index": {
+                "path":             perceptual_db_path,
+                "size":             _size_label(perceptual_db_path),
+                "indexed_files":    perceptual_stats.get("indexed_files", 0),
+                "can_purge":        True,
+                "purge_endpoint":   "DELETE /api/perceptual-index/purge",
+            },
+            "operation_journals": {
+                "path":             journals_path,
+                "size":             f"{sum(j['size_bytes'] for j in journals) / 1024:.1f} KB" if journals else "not created yet",
+                "interrupted_jobs": len(journals),
+                "can_purge":        True,
+                "purge_endpoint":   "DELETE /api/journals/{job_id}",
+            },
             "schedules": {
                 "path":             schedules_path,
                 "size":             _size_label(schedules_path),
@@ -22,10 +22,13 @@ import logging
 import sqlite3
 import hashlib
 import sys
+import threading
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
+from fingerprint import fingerprints
+
 # ── Logger ──────────────────────────────────────────────────────────────────
 _log = logging.getLogger("locallens.metadata_store")
 if not _log.handlers:
@@ -40,6 +43,8 @@ MAX_DB_SIZE_MB   = 50        # Trigger aggressive compaction above this
 COMPACT_MONTHS   = 18        # Compact records older than N months (default)
 AGGRESSIVE_MONTHS = 12       # Compact records older than N months (aggressive)
 DB_FILENAME      = "metadata_store.db"
+SCHEMA_VERSION   = 2         # 2: file_hash is the fingerprint.py content fingerprint
+MIGRATE_BATCH    = 200       # Rows rehashed per transaction by the v1 → v2 migration
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -72,7 +77,7 @@ PRAGMA foreign_keys=ON;
 -- Core photo metadata table ------------------------------------------------
 CREATE TABLE IF NOT EXISTS photo_metadata (
     id            INTEGER PRIMARY KEY AUTOINCREMENT,
-    file_hash     TEXT    NOT NULL,           -- SHA-256 of first 8 KB (dedup key)
+    file_hash     TEXT    NOT NULL,           -- Content fingerprint: size + head/tail BLAKE2b (dedup key)
     original_path TEXT,
     dest_path     TEXT,
     date_taken    TEXT,                       -- ISO 8601
@@ -129,16 +134,17 @@ CREATE TABLE IF NOT EXISTS compaction_log (
 #  Utility helpers
 # ─────────────────────────────────────────────────────────────────────────────
 
-def _hash_file(path: str, read_bytes: int = 8192) -> str:
-    """SHA-256 of the first `read_bytes` of a file. Fast enough for millions of photos."""
-    h = hashlib.sha256()
-    try:
-        with open(path, "rb") as f:
-            h.update(f.read(read_bytes))
-    except OSError:
-        # Fall back to path-based hash if file can't be read
-        h.update(path.encode())
-    return h.hexdigest()
+def _file_fingerprint(original_path: str, destination_path: str) -> str:
+    """
+    Content fingerprint for a caller that did not pass one. After a move the
+    bytes live at the destination, so that is tried second.
+    """
+    for path in (original_path, destination_path):
+        fingerprint = fingerprints.partial(path) if path and os.path.exists(path) else None
+        if fingerprint:
+            return fingerprint
+    # Fall back to path-based hash if the file can't be read
+    return hashlib.sha256(original_path.encode()).hexdigest()
 
 
 def _classify_time_of_day(hour: int) -> str:
@@ -188,6 +194,7 @@ class MetadataStore:
 
     def __init__(self):
         self._db_path = _get_db_path()
+        self._migration: Optional[threading.Thread] = None
         self._init_db()
         self._maybe_compact_on_startup()
 
@@ -203,11 +210,65 @@ class MetadataStore:
         try:
             with self._connect() as conn:
                 conn.executescript(_SCHEMA_SQL)
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+                empty = conn.execute("SELECT 1 FROM photo_metadata LIMIT 1").fetchone() is None
+                if version < 2 and empty:
+                    conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
                 conn.commit()
             # Owner-only permissions
             os.chmod(self._db_path, 0o600)
         except Exception as e:
             _log.error(f"Failed to initialize metadata store: {e}")
+            return
+        if version < 2 and not empty:
+            # Reads every recorded photo: off the startup path, in the background.
+            self._migration = threading.Thread(
+                target=self._migrate_fingerprints, name="metadata-migrate", daemon=True
+            )
+            self._migration.start()
+
+    def _migrate_fingerprints(self) -> None:
+        """
+        v1 → v2: rows keyed by the old SHA-256-of-first-8-KB file_hash (or, after
+        a move, of the path) are rehashed from their destination file, so
+        re-organizing those photos dedups against them again. Rows whose file is
+        gone keep the old key; a row whose photo is already recorded is dropped.
+
+        Committed every MIGRATE_BATCH rows. Old keys are 64 hex digits and
+        fingerprints 32, so an interrupted migration resumes with the rows it
+        has not rewritten yet; user_version is bumped only once it completes.
+        """
+        rehashed = dropped = missing = 0
+        last_id = 0
+        try:
+            with self._connect() as conn:
+                while True:
+                    rows = conn.execute(
+                        "SELECT id, dest_path FROM photo_metadata WHERE id > ? AND length(file_hash) = 64 "
+                        "ORDER BY id LIMIT ?", (last_id, MIGRATE_BATCH),
+                    ).fetchall()
+                    if not rows:
+                        break
+                    for row in rows:
+                        path = row["dest_path"]
+                        fingerprint = fingerprints.partial(path) if path and os.path.exists(path) else None
+                        if not fingerprint:
+                            missing += 1
+                            continue
+                        try:
+                            conn.execute("UPDATE photo_metadata SET file_hash=? WHERE id=?", (fingerprint, row["id"]))
+                            rehashed += 1
+                        except sqlite3.IntegrityError:
+                            conn.execute("DELETE FROM photo_metadata WHERE id=?", (row["id"],))
+                            dropped += 1
+                    conn.commit()
+                    last_id = rows[-1]["id"]
+                conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+                conn.commit()
+            _log.info(f"Migrated file hashes: {rehashed} rehashed, {dropped} duplicates removed, "
+                      f"{missing} left (file missing)")
+        except Exception as e:
+            _log.warning(f"File hash migration stopped (resumes on next start): {e}")
 
     def _maybe_compact_on_startup(self):
         """Run compaction check on startup (size cap or last-compaction > 30 days)."""
@@ -245,14 +306,14 @@ class MetadataStore:
         file_size: Optional[int] = None,     # bytes
         sort_type: Optional[str] = None,     # "Date", "Location", etc.
         camera_model: Optional[str] = None,
-        file_hash: Optional[str] = None,     # Pre-computed hash (optional)
+        file_hash: Optional[str] = None,     # Content fingerprint (fingerprint.py), taken before the move
     ) -> bool:
         """
         Record metadata for one organized photo.
         Returns True if inserted, False if already exists (dedup).
         """
         try:
-            fhash = file_hash or _hash_file(original_path)
+            fhash = file_hash or _file_fingerprint(original_path, destination_path)
             country, state, city = _parse_location(location)
 
             year = month = day_of_week = time_of_day = date_iso = None
@@ -0,0 +1,293 @@
+"""
+LocalLens — Near-Duplicate Grouping Engine
+===========================================
+Groups 64-bit perceptual hashes that lie within a Hamming distance of each
+other without comparing every hash against every other one.
+
+Design Principles:
+  1. Same groups as the pairwise loop it replaces — in file order, each file not
+     yet grouped claims every later, ungrouped file within `max_distance`
+  2. Multi-index hashing — the 64 bits are cut into m blocks; two hashes within
+     the distance differ in at most max_distance // m bits of some block
+     (pigeonhole), so only hashes whose block values are that close are ever
+     compared. m is chosen per call from the number of hashes and the distance
+  3. NumPy all the way — hashes are a uint64 array, candidate pairs are found by
+     sorting block values, and Hamming distances use a vectorized popcount
+  4. Work per distinct hash — identical hashes are collapsed before the search,
+     and files without any neighbour are never visited by the grouping loop
+  5. Honest fallback — for very loose thresholds almost every hash is a
+     candidate anyway, and a chunked, vectorized scan is used instead
+
+Usage:
+    hashes = np.array([phash_to_uint64(imagehash.phash(img)) ...], dtype=np.uint64)
+    groups = group_near_duplicates(hashes, max_distance=3)   # [[0, 7], [2, 5, 9], ...]
+
+Benchmark:
+    python near_duplicates.py --benchmark [n ...]
+"""
+
+import sys
+import math
+import time
+import itertools
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# ── Constants ─────────────────────────────────────────────────────────────
+HASH_BITS        = 64
+MIN_BLOCK_BITS   = 8        # Narrower blocks put too many hashes in one bucket
+TABLE_BITS       = 22       # Blocks up to this width get a direct bucket table
+SCAN_ELEMENTS    = 1 << 24  # Hash pairs compared per vectorized step (~128 MB)
+
+_POPCOUNT16 = np.array([bin(i).count("1") for i in range(1 << 16)], dtype=np.uint8)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  Hash helpers
+# ─────────────────────────────────────────────────────────────────────────────
+
+def popcount64(values: np.ndarray) -> np.ndarray:
+    """Number of set bits in each element of a uint64 array (any shape)."""
+    shape = np.shape(values)
+    values = np.ascontiguousarray(values, dtype=np.uint64)
+    counts = _POPCOUNT16[values.view(np.uint16)].reshape(shape + (4,))
+    return counts.sum(axis=-1, dtype=np.uint8)
+
+
+def phash_to_uint64(image_hash) -> int:
+    """Packs an 8×8 imagehash.ImageHash into an int; a - b equals popcount(x ^ y)."""
+    bits = np.asarray(image_hash.hash, dtype=bool).reshape(-1)
+    if bits.size != HASH_BITS:
+        raise ValueError(f"Expected a {HASH_BITS}-bit hash, got {bits.size} bits")
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def _blocks(count: int) -> List[Tuple[int, int]]:
+    """(shift, width) of `count` near-equal blocks covering all 64 bits."""
+    base, extra = divmod(HASH_BITS, count)
+    blocks, shift = [], 0
+    for i in range(count):
+        width = base + (1 if i < extra else 0)
+        blocks.append((shift, width))
+        shift += width
+    return blocks
+
+
+def _flip_masks(width: int, radius: int) -> List[int]:
+    """Every `width`-bit mask with at most `radius` bits set."""
+    return [sum(1 << bit for bit in bits)
+            for r in range(radius + 1)
+            for bits in itertools.combinations(range(width), r)]
+
+
+def _plan(count: int, max_distance: int) -> Optional[int]:
+    """
+    Number of blocks that minimises the estimated comparisons, or None when a
+    plain scan is cheaper. With m blocks, two hashes within max_distance differ
+    in at most max_distance // m bits of some block (pigeonhole).
+    """
+    best, best_cost = None, float(count)  # Scan: every hash against every other
+    for blocks in range(1, min(max_distance + 1, HASH_BITS // MIN_BLOCK_BITS) + 1):
+        width = HASH_BITS // blocks
+        radius = max_distance // blocks
+        probes = sum(math.comb(width, r) for r in range(radius + 1))
+        cost = blocks * probes * (1 + count / 2.0 ** width)
+        if cost < best_cost:
+            best, best_cost = blocks, cost
+    return best
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  Neighbour search over distinct hashes
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _close_pairs(values: np.ndarray, a: np.ndarray, b: np.ndarray, max_distance: int):
+    keep = popcount64(values[a] ^ values[b]) <= max_distance
+    return a[keep], b[keep]
+
+
+def _block_pairs(values: np.ndarray, shift: int, width: int, radius: int, max_distance: int):
+    """Pairs (a, b), a < b, of distinct hashes whose block values differ in <= radius bits."""
+    keys = (values >> np.uint64(shift)) & np.uint64((1 << width) - 1)
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    if width <= TABLE_BITS:
+        # Bucket start of every possible block value: lookups become a gather.
+        table = np.zeros((1 << width) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys.astype(np.int64), minlength=1 << width), out=table[1:])
+    found_a, found_b = [], []
+    for flip in _flip_masks(width, radius):
+        probes = keys ^ np.uint64(flip)
+        if width <= TABLE_BITS:
+            probes = probes.astype(np.int64)
+            low = table[probes]
+            matches = table[probes + 1] - low
+        else:
+            low = np.searchsorted(sorted_keys, probes, side="left")
+            matches = np.searchsorted(sorted_keys, probes, side="right") - low
+        queries = np.flatnonzero(matches)
+        # Expand (query, bucket) into pairs in slices of bounded size, so one
+        # crowded bucket cannot exhaust memory.
+        ends = np.cumsum(matches[queries])
+        start = 0
+        while start < len(queries):
+            stop = max(start + 1, int(np.searchsorted(ends, (ends[start - 1] if start else 0) + SCAN_ELEMENTS, side="right")))
+            q = queries[start:stop]
+            n = matches[q]
+            a = np.repeat(q, n)
+            first = np.repeat(low[q] - np.cumsum(n) + n, n)
+            b = order[first + np.arange(len(a))]
+            later = a < b
+            a, b = _close_pairs(values, a[later], b[later], max_distance)
+            found_a.append(a)
+            found_b.append(b)
+            start = stop
+    return found_a, found_b
+
+
+def _scan_pairs(values: np.ndarray, max_distance: int):
+    """Fallback for loose thresholds: every distinct hash against every later one, in chunks."""
+    found_a, found_b = [], []
+    count = len(values)
+    chunk = max(1, SCAN_ELEMENTS // max(count, 1))
+    for start in range(0, count, chunk):
+        rows = values[start:start + chunk]
+        close = popcount64(rows[:, None] ^ values[None, :]) <= max_distance
+        a, b = np.nonzero(close)
+        a = a + start
+        later = b > a
+        found_a.append(a[later])
+        found_b.append(b[later])
+    return found_a, found_b
+
+
+def _neighbour_lists(values: np.ndarray, max_distance: int) -> Tuple[np.ndarray, np.ndarray]:
+    """CSR adjacency (offsets, neighbours) of the distinct hashes within max_distance."""
+    count = len(values)
+    found_a, found_b = [], []
+    if max_distance > 0:
+        blocks = _plan(count, max_distance)
+        if blocks is None:
+            found_a, found_b = _scan_pairs(values, max_distance)
+        else:
+            for shift, width in _blocks(blocks):
+                a, b = _block_pairs(values, shift, width, max_distance // blocks, max_distance)
+                found_a += a
+                found_b += b
+
+    if found_a:
+        a = np.concatenate(found_a).astype(np.int64)
+        b = np.concatenate(found_b).astype(np.int64)
+    else:
+        a = b = np.empty(0, dtype=np.int64)
+    # A pair agreeing on several blocks was found several times.
+    low, high = np.minimum(a, b), np.maximum(a, b)
+    pair_ids = np.unique(low * count + high)
+    low, high = pair_ids // count, pair_ids % count
+    sources = np.concatenate([low, high])
+    targets = np.concatenate([high, low])
+    order = np.argsort(sources, kind="stable")
+    offsets = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=count), out=offsets[1:])
+    return offsets, targets[order]
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  Grouping
+# ─────────────────────────────────────────────────────────────────────────────
+
+def group_near_duplicates(hashes, max_distance: int) -> List[List[int]]:
+    """
+    Groups of item indices (each group and the list in ascending order) exactly
+    as the pairwise greedy loop forms them: item i, unless already grouped,
+    claims every later ungrouped item j with popcount(h[i] ^ h[j]) <= max_distance.
+    """
+    hashes = np.asarray(hashes, dtype=np.uint64).reshape(-1)
+    if hashes.size < 2:
+        return []
+    max_distance = max(0, int(max_distance))
+
+    distinct, inverse, counts = np.unique(hashes, return_inverse=True, return_counts=True)
+    offsets, neighbours = _neighbour_lists(distinct, max_distance)
+    # Items of each distinct hash, in ascending item order.
+    items_by_hash = np.argsort(inverse, kind="stable")
+    item_offsets = np.zeros(len(distinct) + 1, dtype=np.int64)
+    np.cumsum(counts, out=item_offsets[1:])
+
+    has_partner = (counts > 1) | (np.diff(offsets) > 0)
+    grouped = np.zeros(hashes.size, dtype=bool)
+    groups = []
+    for i in np.flatnonzero(has_partner[inverse]):
+        if grouped[i]:
+            continue
+        h = inverse[i]
+        near = [h] + neighbours[offsets[h]:offsets[h + 1]].tolist()
+        candidates = np.concatenate([items_by_hash[item_offsets[v]:item_offsets[v + 1]] for v in near])
+        candidates = candidates[candidates > i]
+        candidates = candidates[~grouped[candidates]]
+        if candidates.size:
+            candidates.sort()
+            grouped[candidates] = True
+            grouped[i] = True
+            groups.append([int(i)] + candidates.tolist())
+    return groups
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  Benchmark
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _synthetic_hashes(n: int, duplicate_share: float = 0.2, seed: int = 7) -> np.ndarray:
+    """Random hashes plus near-copies (1–3 flipped bits), shuffled."""
+    rng = np.random.default_rng(seed)
+    originals = rng.integers(0, 2**63, size=n, dtype=np.uint64) * np.uint64(2) + rng.integers(0, 2, size=n, dtype=np.uint64)
+    copies = int(n * duplicate_share)
+    picked = rng.integers(0, n - copies, size=copies)
+    flips = np.zeros(copies, dtype=np.uint64)
+    for _ in range(3):
+        bits = rng.integers(0, HASH_BITS, size=copies).astype(np.uint64)
+        flips ^= np.where(rng.random(copies) < 0.7, np.uint64(1) << bits, np.uint64(0))
+    hashes = originals.copy()
+    hashes[n - copies:] = originals[picked] ^ flips
+    rng.shuffle(hashes)
+    return hashes
+
+
+def _pairwise_groups(hashes: np.ndarray, max_distance: int) -> List[List[int]]:
+    """The original O(n²) loop, for checking results."""
+    values = [int(h) for h in hashes]
+    used, groups = set(), []
+    for i, a in enumerate(values):
+        if i in used:
+            continue
+        group = [i]
+        for j in range(i + 1, len(values)):
+            if j not in used and bin(a ^ values[j]).count("1") <= max_distance:
+                group.append(j)
+                used.add(j)
+        if len(group) > 1:
+            groups.append(group)
+            used.add(i)
+    return groups
+
+
+def _benchmark(sizes: List[int]) -> None:
+    check = _synthetic_hashes(3000)
+    for distance in (0, 3, 6, 9):
+        assert group_near_duplicates(check, distance) == _pairwise_groups(check, distance), distance
+    print("groups match the pairwise loop (n=3000, distances 0/3/6/9)")
+    for n in sizes:
+        hashes = _synthetic_hashes(n)
+        for distance in (3, 6):
+            start = time.perf_counter()
+            groups = group_near_duplicates(hashes, distance)
+            elapsed = time.perf_counter() - start
+            print(f"n={n:>8,}  distance={distance}  groups={len(groups):>7,}  {elapsed:6.2f} s")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "--benchmark":
+        _benchmark([int(n) for n in sys.argv[2:]] or [10_000, 100_000, 500_000])
+    else:
+        sys.exit("usage: python near_duplicates.py --benchmark [n ...]")
@@ -0,0 +1,414 @@
+"""
+LocalLens — Write-Ahead Operation Journal
+==========================================
+Records every copy and move of an organize job in an append-only file on disk,
+so an aborted job can be rolled back and a job interrupted by a crash, a
+reboot or a killed backend can be resumed where it stopped.
+
+Design Principles:
+  1. Write-ahead — an operation is journaled as `planned` before its file is
+     touched and as `done` afterwards; a cross-drive move is also journaled as
+     `copied` (fsync'ed) before the source file is deleted, so after a crash
+     every file is either still at its source or recorded as copied
+  2. Verified before delete — a cross-drive copy is fsync'ed and its size and
+     head/tail content hash compared with the source; only then is the source
+     removed. Each file is written once, straight to its final folder
+  3. Journal-driven rollback — an aborted job replays its moves backwards:
+     moved files go back to where they came from, half-finished copies are
+     deleted; a file whose source is gone is never deleted at its destination
+  4. Resume at file granularity — a file counts as finished once all of its
+     operations are (`file` record). On resume the unfinished operations of
+     other files are undone and only the files not yet finished are processed,
+     so their analysis (and face detection) is not repeated for finished ones
+  5. Append-only JSON lines — a header with the job's settings, then one record
+     per state change; readable with any text editor, safe to append from
+     several transfer threads, and a torn last line is simply ignored
+  6. Kept only while needed — the journal of a finished or rolled-back job is
+     deleted; journals left on disk are exactly the resumable jobs
+
+Journal Location: ~/.config/LocalLens/journals/<job_id>.jsonl
+
+Usage:
+    journal = OperationJournal.create("move", job=settings)
+    journal.move(source, reserved_destination)
+    journal.file_done(source)
+    journal.rollback()                          # on abort
+    journal.close(discard=True)                 # on success
+
+    journal, completed = OperationJournal.resume(job_id)   # after a crash
+"""
+
+import os
+import re
+import sys
+import json
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import fast_copy
+from fingerprint import partial_content_hash
+
+# ── Logger ──────────────────────────────────────────────────────────────────
+_log = logging.getLogger("locallens.operation_journal")
+
+# ── Constants ─────────────────────────────────────────────────────────────
+JOURNAL_DIRNAME   = "journals"
+JOURNAL_SUFFIX    = ".jsonl"
+STATE_PLANNED     = "planned"    # Destination reserved, source untouched
+STATE_COPIED      = "copied"     # Copy flushed and verified, source still present
+STATE_DONE        = "done"       # Operation finished (a move's source is gone)
+STATE_UNDONE      = "undone"     # Rolled back: nothing of it is left at the destination
+_JOB_ID_RE        = re.compile(r"^[A-Za-z0-9_-]+$")
+
+_open_jobs: Set[str] = set()     # Journals of jobs running in this process
+_open_lock = threading.Lock()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  Path helpers
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _get_config_dir() -> Path:
+    """Return the OS-appropriate LocalLens config directory."""
+    if sys.platform == "win32":
+        base = Path(os.environ.get("APPDATA", Path.home()))
+    else:
+        base = Path.home() / ".config"
+    config_dir = base / "LocalLens"
+    config_dir.mkdir(parents=True, exist_ok=True)
+    return config_dir
+
+
+def _get_journal_dir() -> Path:
+    journal_dir = _get_config_dir() / JOURNAL_DIRNAME
+    journal_dir.mkdir(parents=True, exist_ok=True)
+    return journal_dir
+
+
+def journal_path(job_id: str) -> Path:
+    """Path of a job's journal; raises KeyError for an unknown or malformed id."""
+    if not _JOB_ID_RE.match(job_id or ""):
+        raise KeyError(job_id)
+    path = _get_journal_dir() / f"{job_id}{JOURNAL_SUFFIX}"
+    if not path.exists():
+        raise KeyError(job_id)
+    return path
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  Verified transfer
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _fsync_file(path: str) -> None:
+    fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _same_content(source: str, destination: str) -> bool:
+    """Size plus head/tail content hash: catches truncated and misdirected copies."""
+    try:
+        size = os.path.getsize(source)
+        if os.path.getsize(destination) != size:
+            return False
+    except OSError:
+        return False
+    source_hash = partial_content_hash(source, size)
+    return source_hash is not None and source_hash == partial_content_hash(destination, size)
+
+
+def _is_empty_file(path: str) -> bool:
+    try:
+        return os.path.isfile(path) and os.path.getsize(path) == 0
+    except OSError:
+        return False
+
+
+def verified_copy(source: str, destination: str) -> None:
+    """Copies with metadata, flushes the copy to disk and checks it; raises OSError on mismatch."""
+    fast_copy.copy2(source, destination)
+    _fsync_file(destination)
+    if not _same_content(source, destination):
+        raise OSError(f"Verification failed: '{destination}' does not match '{source}'")
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  Reading journals
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _read(path: str) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]], Set[str], List[Dict[str, Any]]]:
+    """(header, latest record per operation in journal order, finished sources, name claims)."""
+    header = None
+    latest: Dict[int, Dict[str, Any]] = {}
+    finished: Set[str] = set()
+    claims: List[Dict[str, Any]] = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # Torn write from a crash
+                if "seq" in record:
+                    latest[record["seq"]] = record
+                elif "file" in record:
+                    finished.add(record["file"])
+                elif "claim" in record:
+                    claims.append(record)
+                elif "job" in record:
+                    header = record
+    except OSError:
+        pass
+    return header, [latest[seq] for seq in sorted(latest)], finished, claims
+
+
+def list_journals() -> List[Dict[str, Any]]:
+    """Summaries of the journals on disk: jobs that did not finish and can be resumed."""
+    jobs = []
+    for path in sorted(_get_journal_dir().glob(f"*{JOURNAL_SUFFIX}")):
+        header, entries, finished, _ = _read(str(path))
+        job = (header or {}).get("job") or {}
+        with _open_lock:
+            running = path.stem in _open_jobs
+        jobs.append({
+            "job_id": path.stem,
+            "created": (header or {}).get("created"),
+            "running": running,
+            "resumable": bool(job) and not running,
+            "operation_mode": job.get("operation_mode"),
+            "source_folder": job.get("source_folder"),
+            "destination_folder": job.get("destination_folder"),
+            "files_finished": len(finished),
+            "operations": len(entries),
+            "operations_pending": sum(1 for e in entries if e["state"] in (STATE_PLANNED, STATE_COPIED)),
+            "size_bytes": path.stat().st_size,
+        })
+    return jobs
+
+
+def load_job(job_id: str) -> Dict[str, Any]:
+    """The settings a journaled job was started with; KeyError if it cannot be resumed."""
+    header = _read(str(journal_path(job_id)))[0]
+    if not header or not header.get("job"):
+        raise KeyError(job_id)
+    return dict(header["job"])
+
+
+def discard_journal(job_id: str) -> None:
+    """Deletes a journal: its job will not be resumed. A running job's journal is kept."""
+    path = journal_path(job_id)
+    with _open_lock:
+        if job_id in _open_jobs:
+            raise RuntimeError(f"Job '{job_id}' is still running")
+    os.remove(path)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  Journal
+# ─────────────────────────────────────────────────────────────────────────────
+
+class OperationJournal:
+    """Append-only journal of the copies and moves of one organize job."""
+
+    def __init__(self, path: str, next_seq: int = 0):
+        self.path = str(path)
+        self.job_id = Path(self.path).stem
+        with _open_lock:
+            if self.job_id in _open_jobs:
+                raise RuntimeError(f"Job '{self.job_id}' is already running")
+            _open_jobs.add(self.job_id)
+        try:
+            self._file = open(self.path, "a", encoding="utf-8")
+        except BaseException:
+            with _open_lock:
+                _open_jobs.discard(self.job_id)
+            raise
+        self._lock = threading.Lock()
+        self._seq = next_seq
+
+    @classmethod
+    def create(cls, name: str, job: Optional[Dict[str, Any]] = None) -> "OperationJournal":
+        """New journal; `job` holds the (JSON-serialisable) settings needed to resume it."""
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        journal = cls(_get_journal_dir() / f"{name}_{stamp}{JOURNAL_SUFFIX}")
+        journal._append({"job": job, "created": datetime.now().isoformat(timespec="seconds")}, sync=True)
+        return journal
+
+    @classmethod
+    def resume(cls, job_id: str) -> Tuple["OperationJournal", Set[str]]:
+        """
+        Reopens a journal after a crash. Operations of files that did not finish
+        are undone (see recover()); returns the journal, which keeps appending to
+        the same file, and the set of source paths that need no more work.
+        """
+        path = journal_path(job_id)
+        entries = _read(str(path))[1]
+        journal = cls(path, next_seq=max((e["seq"] for e in entries), default=0))
+        return journal, journal.recover()
+
+    # ── Writing ─────────────────────────────────────────────────────────────
+
+    def _append(self, record: Dict[str, Any], sync: bool = False) -> None:
+        with self._lock:
+            self._file.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            self._file.flush()
+            if sync:
+                os.fsync(self._file.fileno())
+
+    def _begin(self, op: str, source: str, destination: str) -> int:
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+        self._append({"seq": seq, "op": op, "state": STATE_PLANNED, "source": source, "destination": destination})
+        return seq
+
+    def _mark(self, seq: int, op: str, state: str, source: str, destination: str, sync: bool = False) -> None:
+        self._append({"seq": seq, "op": op, "state": state, "source": source, "destination": destination}, sync=sync)
+
+    def claim(self, source: str, destination: str) -> None:
+        """A destination name is about to be reserved for `source` (see DestinationRegistry.reserve)."""
+        self._append({"claim": destination, "source": source})
+
+    def copy(self, source: str, destination: str) -> str:
+        """Copies `source` onto its reserved `destination`; raises OSError on failure."""
+        seq = self._begin("copy", source, destination)
+        fast_copy.copy2(source, destination)
+        self._mark(seq, "copy", STATE_DONE, source, destination)
+        return destination
+
+    def move(self, source: str, destination: str) -> str:
+        """
+        Moves `source` onto its reserved `destination`: a rename on the same
+        drive, otherwise copy, verify, then delete the source. Raises OSError if
+        the move failed; the source is untouched in that case.
+        """
+        seq = self._begin("move", source, destination)
+        try:
+            os.replace(source, destination)
+        except OSError:
+            verified_copy(source, destination)
+            # This record must be on disk before the only other copy goes away.
+            self._mark(seq, "move", STATE_COPIED, source, destination, sync=True)
+            os.unlink(source)
+        try:
+            self._mark(seq, "move", STATE_DONE, source, destination)
+        except OSError as e:
+            # The move itself is complete; rollback and recovery go by the files on disk.
+            _log.warning(f"Could not journal the move of '{source}': {e}")
+        return destination
+
+    @property
+    def has_operations(self) -> bool:
+        """True once any operation was journaled (in this run or the one being resumed)."""
+        return self._seq > 0
+
+    def file_done(self, source: str) -> None:
+        """Every operation of `source` has finished; a resumed job skips it."""
+        self._append({"file": source})
+
+    # ── Reading ─────────────────────────────────────────────────────────────
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """Latest record per operation, in journal order."""
+        with self._lock:
+            self._file.flush()
+        return _read(self.path)[1]
+
+    # ── Undo ────────────────────────────────────────────────────────────────
+
+    def _undo(self, entry: Dict[str, Any]) -> bool:
+        """
+        Undoes one operation. A destination whose source still exists is a
+        placeholder, partial copy or duplicate and is deleted; a moved file whose
+        source is gone goes back. Returns True if a file was moved back.
+        """
+        source, destination = entry["source"], entry["destination"]
+        restored = False
+        if os.path.exists(source):
+            if os.path.exists(destination):
+                os.remove(destination)
+        else:
+            os.makedirs(os.path.dirname(source), exist_ok=True)
+            try:
+                os.rename(destination, source)
+            except OSError:
+                verified_copy(destination, source)
+                os.unlink(destination)
+            restored = True
+        self._mark(entry["seq"], entry.get("op", "move"), STATE_UNDONE, source, destination)
+        return restored
+
+    def rollback(self) -> Tuple[int, int]:
+        """
+        Undoes the journaled moves, newest first (copies are kept, as they
+        always were on abort). Returns (restored, failed).
+        """
+        restored = failed = 0
+        for entry in reversed(self.entries()):
+            if entry["state"] == STATE_UNDONE or entry.get("op", "move") != "move":
+                continue
+            try:
+                restored += self._undo(entry)
+            except Exception as e:
+                failed += 1
+                _log.error(f"CRITICAL: Rollback failed for '{entry['destination']}'. Please move it manually to '{entry['source']}'. Error: {e}")
+        return restored, failed
+
+    def recover(self) -> Set[str]:
+        """
+        Brings the files on disk in line with the journal after a crash and
+        returns the sources that are finished. A moved file whose source is gone
+        counts as finished; every other operation of an unfinished file is
+        undone, so the file is processed again from scratch.
+        """
+        _, entries, finished, claims = _read(self.path)
+        moved = {
+            entry["source"] for entry in entries
+            if entry.get("op", "move") == "move" and entry["state"] != STATE_UNDONE and not os.path.exists(entry["source"])
+        }
+        # The crash came before these files' `file` record was written.
+        for source in moved - finished:
+            self.file_done(source)
+        finished |= moved
+        undone = 0
+        for entry in reversed(entries):
+            if entry["state"] == STATE_UNDONE or entry["source"] in finished:
+                continue
+            try:
+                self._undo(entry)
+                undone += 1
+            except Exception as e:
+                _log.error(f"Could not undo the unfinished operation on '{entry['destination']}': {e}")
+        # Names reserved for unfinished files whose transfer never started: empty
+        # placeholders. A claim whose create lost a race points at someone else's
+        # file, which is only ever touched if it is empty as well.
+        for claim in claims:
+            destination = claim["claim"]
+            if claim["source"] not in finished and os.path.exists(claim["source"]) and _is_empty_file(destination):
+                try:
+                    os.remove(destination)
+                    undone += 1
+                except OSError as e:
+                    _log.error(f"Could not remove the unused placeholder '{destination}': {e}")
+        _log.info(f"Journal {self.job_id}: {len(finished)} files finished, {undone} unfinished operations undone")
+        return finished
+
+    # ── Lifecycle ───────────────────────────────────────────────────────────
+
+    def close(self, discard: bool = False) -> None:
+        """Closes the journal file; `discard` deletes it (the job needs no recovery)."""
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+        with _open_lock:
+            _open_jobs.discard(self.job_id)
+        if discard:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
@@ -16,7 +16,9 @@ import shutil
 from datetime import datetime
 import logging
 import json
+import functools
 import pickle
+import contextvars
 import numpy as np
 
 # ── Smart Album Suggestions: Passive metadata capture ─────────────────────
@@ -25,15 +27,50 @@ try:
     from metadata_store import metadata_store as _metadata_store
 except Exception:
     _metadata_store = None  # Metadata capture disabled gracefully if store unavailable
+
+# ── Persistent per-file analysis cache (date / GPS / location / camera) ───
+# Same pattern: a broken or read-only cache only costs speed, never correctness.
+try:
+    from analysis_cache import analysis_cache as _analysis_cache
+except Exception:
+    _analysis_cache = None
+
+# ── Incremental folder snapshots for scheduled sweeps ─────────────────────
+# Same pattern: without it a sweep falls back to a full walk with the mtime cutoff.
+try:
+    from snapshot_index import snapshot_index as _snapshot_index
+except Exception:
+    _snapshot_index = None
+
+# ── Persistent perceptual-hash index (duplicate finder) ───────────────────
+# Same pattern: sorting only keeps the index current; it never depends on it.
+try:
+    from perceptual_index import perceptual_index as _perceptual_index
+except Exception:
+    _perceptual_index = None
 from PIL import Image
 from PIL.ExifTags import TAGS, GPSTAGS
 import tempfile
 from multiprocessing import Pool, TimeoutError as MultiprocessingTimeoutError
-import time
+import threading
 
 
 # --- Custom Exception Import ---
 from exceptions import OperationAbortedError
+from pipeline_engine import PipelineStage, StagedPipeline, STAGE_KIND_PROCESS
+from face_matcher import FaceMatcher
+from library_scanner import LibraryScan, scan_files, walk_library, entry_size
+from fingerprint import fingerprints
+from destination_registry import DestinationRegistry
+import fast_copy
+from operation_journal import OperationJournal
+from progress_reporter import ProgressReporter
+from transfer_engine import TransferEngine, DEFAULT_WORKERS as TRANSFER_WORKERS, DEFAULT_PER_DEVICE as TRANSFER_PER_DEVICE
+from geocoding import geocoder, BATCH_SIZE as GEOCODE_BATCH_SIZE
+from image_decode import (
+    open_for_analysis, downscale_for_analysis, decode_raw_for_analysis,
+    RAW_EXTENSIONS, RAW_DECODE_POLICIES, DEFAULT_RAW_POLICY,
+)
 
 # --- REVERT: REMOVE ALL MULTIPROCESSING WORKER FUNCTIONS ---
 
@@ -52,7 +89,7 @@ except ImportError:
     print("CRITICAL ERROR: 'face_recognition' library not installed.")
     face_recognition = None
 
-import reverse_geocoder as rg
+# Reverse geocoding lives in geocoding.py; its dataset is loaded lazily on the first lookup.
 
 # RAW Image Support Logic
 rawpy = None
@@ -116,8 +153,6 @@ def initialize_libraries(is_main_process: bool = False):
             print("CRITICAL ERROR: 'face_recognition' library not installed.")
         face_recognition = None
     _libraries_initialized = True
-    
-import reverse_geocoder as rg
 
 # ==============================================================================
 #  Constants & Configuration (Consolidated from Best Versions)
@@ -176,34 +211,38 @@ def get_exif_data(file_path):
     """Extracts and decodes EXIF metadata from an image file."""
     try:
         with Image.open(file_path) as image:
-            # ._getexif() returns the raw EXIF data dictionary, which is more reliable.
-            raw_exif = image._getexif() # type: ignore
-            if not raw_exif:
-                return None
-
-            decoded_exif = {}
-            for tag_id, value in raw_exif.items():
-                tag = TAGS.get(tag_id, tag_id)
-                if tag == "GPSInfo":
-                    gps_data = {}
-                    for gps_tag_id in value:
-                        gps_tag = GPSTAGS.get(gps_tag_id, gps_tag_id)
-                        gps_data[gps_tag] = value[gps_tag_id]
-                    decoded_exif[tag] = gps_data
-                else:
-                    # Handle byte strings by trying to decode them, which is a common issue.
-                    if isinstance(value, bytes):
-                        try:
-                            # Decode and remove null characters.
-                            decoded_exif[tag] = value.decode('utf-8', errors='replace').strip('\x00')
-                        except Exception:
-                            decoded_exif[tag] = repr(value) # Fallback for non-decodable bytes
-                    else:
-                        decoded_exif[tag] = value
-            return decoded_exif
+            return _decode_exif(image)
     except Exception as e:
         logging.warning(f"Could not read EXIF data from {os.path.basename(file_path)}: {e}")
         return None
+
+def _decode_exif(image):
+    """Decodes the EXIF block of an already-open PIL image into a tag-name dict (or None)."""
+    # ._getexif() returns the raw EXIF data dictionary, which is more reliable.
+    raw_exif = image._getexif() # type: ignore
+    if not raw_exif:
+        return None
+
+    decoded_exif = {}
+    for tag_id, value in raw_exif.items():
+        tag = TAGS.get(tag_id, tag_id)
+        if tag == "GPSInfo":
+            gps_data = {}
+            for gps_tag_id in value:
+                gps_tag = GPSTAGS.get(gps_tag_id, gps_tag_id)
+                gps_data[gps_tag] = value[gps_tag_id]
+            decoded_exif[tag] = gps_data
+        else:
+            # Handle byte strings by trying to decode them, which is a common issue.
+            if isinstance(value, bytes):
+                try:
+                    # Decode and remove null characters.
+                    decoded_exif[tag] = value.decode('utf-8', errors='replace').strip('\x00')
+                except Exception:
+                    decoded_exif[tag] = repr(value) # Fallback for non-decodable bytes
+            else:
+                decoded_exif[tag] = value
+    return decoded_exif
     
 def get_date_taken(exif_data):
     """Parses EXIF data to find the 'Date Taken' by checking common tags."""
@@ -227,8 +266,8 @@ def get_decimal_from_dms(dms, ref):
         decimal = -decimal
     return decimal
 
-def get_location(exif_data):
-    """Converts GPS coordinates from EXIF into a human-readable 'Country/State/City' path."""
+def get_gps_coordinates(exif_data):
+    """Extracts (latitude, longitude) in decimal degrees from EXIF GPSInfo, or None."""
     if not exif_data or "GPSInfo" not in exif_data:
         return None
     try:
@@ -246,57 +285,378 @@ def get_location(exif_data):
             if not (np.isfinite(lat) and np.isfinite(lon)):
                 logging.warning(f"Invalid GPS coordinates (non-finite) found. Skipping location lookup.")
                 return None
-
-            location = rg.search((lat, lon), mode=1)
-            if location:
-                loc_data = location[0]
-                country = loc_data.get('cc', '').replace(' ', '-')
-                state = loc_data.get('admin1', '').replace(' ', '-')
-                city = loc_data.get('name', '').replace(' ', '-')
-                path_parts = [p for p in [country, state, city] if p]
-                if path_parts:
-                    return os.path.join(*path_parts)
+            return (float(lat), float(lon))
         return None
     except Exception as e:
         # Catch any other unexpected errors during GPS data processing.
         logging.warning(f"Could not extract location due to corrupted GPS metadata: {e}")
         return None
 
+def get_location_from_coordinates(lat, lon):
+    """Reverse-geocodes decimal coordinates into a 'Country/State/City' path (memoized)."""
+    return geocoder.resolve(lat, lon)
+
+def resolve_locations_batch(entries):
+    """
+    NEW: Resolves the location of many files with one geocoder query.
+    `entries` are (file_path, meta) pairs from get_file_metadata; each meta is
+    updated in place and the result is written back to the analysis cache.
+    """
+    pending = [(path, meta) for path, meta in entries if not meta["location_resolved"]]
+    with_gps = [(path, meta) for path, meta in pending if meta["gps"]]
+    locations = geocoder.resolve_many([meta["gps"] for _, meta in with_gps])
+    for (path, meta), location in zip(with_gps, locations):
+        meta["location"] = location
+    for path, meta in pending:
+        meta["location_resolved"] = True
+        if _analysis_cache is not None:
+            _analysis_cache.update_location(path, meta["location"])
+
+def get_location(exif_data):
+    """Converts GPS coordinates from EXIF into a human-readable 'Country/State/City' path."""
+    coords = get_gps_coordinates(exif_data)
+    if not coords:
+        return None
+    return get_location_from_coordinates(*coords)
+
+def get_file_metadata(file_path, resolve_location=False, stat_result=None, exif_loader=None):
+    """
+    NEW: Returns the analysis facts for one file, served from the persistent
+    analysis cache whenever the file is unchanged:
+        {"date_taken", "gps", "location", "location_resolved", "camera_model"}
+
+    The geocoded location is only computed (and cached) when `resolve_location`
+    is True, so Date-only jobs never touch the geocoder. `exif_loader` replaces
+    get_exif_data on a cache miss (PhotoRecord uses it to open the file once).
+    """
+    try:
+        st = stat_result or os.stat(file_path)
+    except OSError:
+        st = None
+
+    meta = _analysis_cache.lookup(file_path, st) if (_analysis_cache is not None and st) else None
+    if meta is None:
+        exif_data = (exif_loader or get_exif_data)(file_path)
+        camera = exif_data.get('Model') if exif_data else None
+        meta = {
+            "date_taken": get_date_taken(exif_data),
+            "gps": get_gps_coordinates(exif_data),
+            "location": None,
+            "location_resolved": False,
+            "camera_model": str(camera).strip() if camera else None,
+        }
+        if resolve_location:
+            meta["location"] = get_location_from_coordinates(*meta["gps"]) if meta["gps"] else None
+            meta["location_resolved"] = True
+        if _analysis_cache is not None and st:
+            _analysis_cache.store(file_path, st, **meta)
+    elif resolve_location and not meta["location_resolved"]:
+        meta["location"] = get_location_from_coordinates(*meta["gps"]) if meta["gps"] else None
+        meta["location_resolved"] = True
+        _analysis_cache.update_location(file_path, meta["location"])
+    return meta
+
+def get_file_location(file_path, meta):
+    """Resolves (and memoizes into `meta`) the location for metadata from get_file_metadata."""
+    if not meta["location_resolved"]:
+        meta.update(get_file_metadata(file_path, resolve_location=True))
+    return meta["location"]
+
+class PhotoRecord:
+    """
+    NEW: Everything the organizer learns about one file, built once per file and
+    passed through analysis, path planning, file operations and metadata capture.
+    Each fact is computed on first use and memoized, so a file is stat'ed once,
+    its EXIF is parsed at most once, its pixels are decoded at most once and the
+    geocoder is asked at most once — however many sort rules look at it.
+
+    With `want_pixels=True` a cache miss reads EXIF and decodes the face-analysis
+    pixels from the same open file handle.
+    """
+    __slots__ = (
+        "path", "work_dir", "want_pixels", "raw_policy", "names", "dest_paths", "progress",
+        "_stat", "_meta", "_pixels", "_fingerprint",
+    )
+
+    _UNSET = object()
+
+    def __init__(self, path, work_dir=None, want_pixels=False, raw_policy=DEFAULT_RAW_POLICY, meta=None, stat=None):
+        self.path = path
+        self.work_dir = work_dir
+        self.want_pixels = want_pixels
+        self.raw_policy = raw_policy
+        self.names = []
+        self.dest_paths = None
+        self.progress = 0
+        self._stat = stat if stat is not None else PhotoRecord._UNSET  # Cached by the library scan
+        self._meta = meta    # Pre-seeded from a MetadataTable row, if the job built one
+        self._pixels = PhotoRecord._UNSET
+        self._fingerprint = PhotoRecord._UNSET
+
+    # ── File facts ──────────────────────────────────────────────────────────
+
+    @property
+    def stat(self):
+        if self._stat is PhotoRecord._UNSET:
+            try:
+                self._stat = os.stat(self.path)
+            except OSError:
+                self._stat = None
+        return self._stat
+
+    @property
+    def file_size(self):
+        return self.stat.st_size if self.stat else None
+
+    @property
+    def fingerprint(self):
+        """Content fingerprint (size + head/tail hash); first taken while the file is at its source."""
+        if self._fingerprint is PhotoRecord._UNSET:
+            self._fingerprint = fingerprints.partial(self.path, self.stat)
+        return self._fingerprint
+
+    @property
+    def basename(self):
+        return os.path.basename(self.path)
+
+    @property
+    def original_subfolder(self):
+        parent = os.path.dirname(self.path)
+        if self.work_dir is None or self.work_dir == parent:
+            return ''
+        return os.path.relpath(parent, self.work_dir)
+
+    # ── Metadata (EXIF / analysis cache) ────────────────────────────────────
+
+    @property
+    def meta(self):
+        if self._meta is None:
+            self._meta = get_file_metadata(self.path, stat_result=self.stat, exif_loader=self._load_exif)
+        return self._meta
+
+    @property
+    def date_taken(self):
+        return self.meta["date_taken"]
+
+    @property
+    def camera_model(self):
+        return self.meta["camera_model"]
+
+    @property
+    def location(self):
+        """Geocoded 'Country/State/City' path; resolved on first access only."""
+        return get_file_location(self.path, self.meta)
+
+    @property
+    def resolved_location(self):
+        """The location if some sort rule already needed it, without triggering a lookup."""
+        meta = self._meta
+        return meta["location"] if meta is not None and meta["location_resolved"] else None
+
+    @property
+    def new_filename(self):
+        date_obj = self.date_taken
+        return f"{date_obj.strftime('%Y-%m-%d_%H%M%S')}_{self.basename}" if date_obj else self.basename
+
+    def _load_exif(self, file_path):
+        """Cache-miss EXIF loader: decodes pixels from the same handle when they will be needed."""
+        try:
+            with Image.open(file_path) as image:
+                exif_data = _decode_exif(image)
+                if self.want_pixels and self._pixels is PhotoRecord._UNSET:
+                    self._pixels = _prepare_face_pixels(image, self.basename)
+                return exif_data
+        except Exception as e:
+            logging.warning(f"Could not read EXIF data from {self.basename}: {e}")
+            return None
+
+    # ── Pixels / faces ──────────────────────────────────────────────────────
+
+    @property
+    def pixels(self):
+        """RGB array downscaled for face analysis, or None if the file cannot be decoded."""
+        if self._pixels is PhotoRecord._UNSET:
+            pil_image = _open_image_for_faces(self.path, self.raw_policy)
+            self._pixels = np.array(pil_image) if pil_image is not None else None
+        return self._pixels
+
+    def take_pixels(self):
+        """Hands the decoded pixels over (e.g. to a worker process) and frees them here."""
+        pixels = self.pixels
+        self._pixels = None
+        return pixels
+
+    def release_pixels(self):
+        if self._pixels is not PhotoRecord._UNSET:
+            self._pixels = None
+
+    @property
+    def known_people(self):
+        return [n for n in self.names if n != 'Unknown'] if self.names else []
+
+
+class MetadataTable:
+    """
+    NEW: Columnar, in-memory metadata for every file of a job — phase one of a
+    two-phase sort. Dates, coordinates and (batch-geocoded) locations are read
+    once per file; phase two plans destinations from these columns without
+    opening the files or querying the analysis cache again.
+    """
+    __slots__ = ("paths", "dates", "lat", "lon", "locations", "resolved", "cameras", "_row_of")
+
+    def __init__(self, paths, metas):
+        self.paths = list(paths)
+        self.dates = [m["date_taken"] for m in metas]
+        self.lat = np.array([m["gps"][0] if m["gps"] else np.nan for m in metas], dtype=np.float64)
+        self.lon = np.array([m["gps"][1] if m["gps"] else np.nan for m in metas], dtype=np.float64)
+        self.locations = [m["location"] for m in metas]
+        self.resolved = np.array([m["location_resolved"] for m in metas], dtype=bool)
+        self.cameras = [m["camera_model"] for m in metas]
+        self._row_of = {path: i for i, path in enumerate(self.paths)}
+
+    @classmethod
+    def build(cls, files, resolve_locations=True):
+        """
+        Reads every file's metadata (EXIF or analysis cache), geocoding a batch at a
+        time. `files` holds paths or library-scan DirEntries (whose stat is reused).
+        """
+        entries = []
+        for item in files:
+            path, st = _path_and_stat(item)
+            entries.append((path, get_file_metadata(path, stat_result=st)))
+        if resolve_locations:
+            for start in range(0, len(entries), GEOCODE_BATCH_SIZE):
+                resolve_locations_batch(entries[start:start + GEOCODE_BATCH_SIZE])
+        return cls([path for path, _ in entries], [meta for _, meta in entries])
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __contains__(self, path):
+        return path in self._row_of
+
+    def meta(self, path):
+        """The row for `path` in get_file_metadata()'s format (a fresh dict), or None."""
+        i = self._row_of.get(path)
+        if i is None:
+            return None
+        has_gps = not np.isnan(self.lat[i])
+        return {
+            "date_taken": self.dates[i],
+            "gps": (float(self.lat[i]), float(self.lon[i])) if has_gps else None,
+            "location": self.locations[i],
+            "location_resolved": bool(self.resolved[i]),
+            "camera_model": self.cameras[i],
+        }
+
+    def countries(self):
+        """Distinct country codes among the resolved locations."""
+        return set(loc.split(os.path.sep)[0] for loc in self.locations if loc and os.path.sep in loc)
+
+
+def _path_and_stat(item):
+    """(path, stat or None) for a plain path or a library-scan DirEntry."""
+    if isinstance(item, os.DirEntry):
+        try:
+            return item.path, item.stat()
+        except OSError:
+            return item.path, None
+    return item, None
+
+
+def _record_for(item):
+    path, st = _path_and_stat(item)
+    return PhotoRecord(path, stat=st)
+
+
+def _iter_photo_records(files, make_record=_record_for, resolve_locations=False):
+    """
+    Yields one PhotoRecord per path or DirEntry, as `files` streams in. With
+    `resolve_locations`, every batch of GEOCODE_BATCH_SIZE records is geocoded
+    with a single query before it is yielded.
+    """
+    if not resolve_locations:
+        for item in files:
+            yield make_record(item)
+        return
+    batch = []
+    for item in files:
+        batch.append(make_record(item))
+        if len(batch) >= GEOCODE_BATCH_SIZE:
+            resolve_locations_batch([(record.path, record.meta) for record in batch])
+            yield from batch
+            batch = []
+    if batch:
+        resolve_locations_batch([(record.path, record.meta) for record in batch])
+        yield from batch
+
+
+def _scan_progress(i, scan, start=10, span=85):
+    """
+    Progress for the i-th file of a streaming LibraryScan. Holds at `start`
+    until the walk has finished and the total is known.
+    """
+    total = scan.total
+    if not total:
+        return start
+    return start + int(((i + 1) / total) * span)
+
+
+def scan_folder_tree(root_path, ignore_list=None):
+    """
+    NEW: One walk of `root_path` that builds the hierarchical subdirectory tree
+    and counts what a job would see: folders not in `ignore_list` (full paths)
+    and supported files outside ignored folders.
+    Returns (tree, {"folder_count", "file_count"}).
+    """
+    ignore_set = set(ignore_list or [])
+    tree = []
+    folder_count = file_count = 0
+    # Use a dictionary to keep track of nodes by their path for easy lookup
+    dir_map = {root_path: tree}
+    for dirpath, dirnames, file_entries in walk_library(root_path):
+        # Find the parent node in our map
+        parent_list = dir_map.get(dirpath)
+        if parent_list is None:
+            continue # Should not happen in a top-down walk
+
+        # Sort dirnames to ensure consistent order in the UI
+        dirnames.sort(key=lambda v: v.lower())
+
+        for dirname in dirnames:
+            current_path = os.path.join(dirpath, dirname)
+            if current_path not in ignore_set:
+                folder_count += 1
+            node = {
+                "name": dirname,
+                "path": current_path,
+                "children": []
+            }
+            parent_list.append(node)
+            # Add the new node's children list to the map for the next level
+            dir_map[current_path] = node["children"]
+
+        # Files directly inside an ignored folder are not counted; its subfolders still are.
+        if dirpath not in ignore_set:
+            file_count += sum(1 for entry in file_entries if entry.name.lower().endswith(SUPPORTED_EXTENSIONS))
+    return tree, {"folder_count": folder_count, "file_count": file_count}
+
+
 def build_folder_tree(root_path):
     """
     NEW: Recursively builds a hierarchical tree of subdirectories.
     """
-    tree = []
     try:
-        # Use a dictionary to keep track of nodes by their path for easy lookup
-        dir_map = {root_path: tree}
-        for dirpath, dirnames, _ in os.walk(root_path, topdown=True):
-            # Find the parent node in our map
-            parent_list = dir_map.get(dirpath)
-            if parent_list is None:
-                continue # Should not happen in a top-down walk
-
-            # Sort dirnames to ensure consistent order in the UI
-            dirnames.sort(key=lambda v: v.lower())
-            
-            for dirname in dirnames:
-                current_path = os.path.join(dirpath, dirname)
-                node = {
-                    "name": dirname,
-                    "path": current_path,
-                    "children": []
-                }
-                parent_list.append(node)
-                # Add the new node's children list to the map for the next level
-                dir_map[current_path] = node["children"]
+        tree, _ = scan_folder_tree(root_path)
         return tree
     except Exception as e:
         logging.error(f"Failed to build folder tree for {root_path}: {e}")
         return []
 
-def get_metadata_overview(source_dir, ignore_list=None, encodings_path=None, scan_for_location=True):
+def get_metadata_overview(source_dir, ignore_list=None, encodings_path=None, scan_for_location=True, files=None):
     """
     MODIFIED: Now conditionally scans for location to avoid loading geocoder unnecessarily.
+    `files` (paths or DirEntries) skips the walk when the caller has already scanned the folder.
     """
     locations, people = set(), set()
     date_structure = {} # Changed from a simple set of years to a dict
@@ -314,33 +674,25 @@ def get_metadata_overview(source_dir, ignore_list=None, encodings_path=None, sca
         except Exception as e:
             logging.warning(f"Could not load face encodings for metadata overview: {e}")
 
-    files_to_scan = []
-    # CORRECTED LOGIC: Walk the entire tree, then filter files based on their parent folder.
-    for dirpath, dirnames, filenames in os.walk(source_dir):
-        # Do not prune the walk. Instead, check each file's parent.
-        if dirpath in ignore_set:
-            # If the current directory is ignored, skip all files directly within it.
-            continue
-        
-        for f in filenames:
-            if f.lower().endswith(SUPPORTED_EXTENSIONS):
-                files_to_scan.append(os.path.join(dirpath, f))
+    # Files directly inside an ignored folder are skipped; its subfolders are still scanned.
+    if files is not None:
+        files_to_scan = list(files)
+    else:
+        files_to_scan = list(scan_files(source_dir, ignore_set, SUPPORTED_EXTENSIONS))
 
     if not files_to_scan:
         return [], [], sorted(list(people))
 
     logging.info(f"Scanning {len(files_to_scan)} files for metadata overview...")
-    for file_path in files_to_scan:
-        exif = get_exif_data(file_path)
-        
-        # --- CONDITIONAL LOCATION SCAN ---
-        # Only call get_location if the operation requires it.
-        if scan_for_location:
-            loc = get_location(exif)
-            if loc:
-                locations.add(loc)
-
-        date_obj = get_date_taken(exif)
+    # Unchanged files are answered from the analysis cache without re-opening the image.
+    # --- CONDITIONAL LOCATION SCAN ---
+    # Only resolve locations if the operation requires it, one geocoder query per batch.
+    table = MetadataTable.build(files_to_scan, resolve_locations=scan_for_location)
+    if scan_for_location:
+        locations.update(loc for loc in table.locations if loc)
+        logging.info(f"Geocoder: {geocoder.get_stats()}")
+
+    for date_obj in table.dates:
         if date_obj:
             year_str = str(date_obj.year)
             month_str = date_obj.strftime('%m') # e.g., "07"
@@ -359,29 +711,72 @@ def get_metadata_overview(source_dir, ignore_list=None, encodings_path=None, sca
 #  File System Operations
 # ==============================================================================
 
-def handle_file_op(op, source_path, target_folder, new_filename, date_obj):
-    os.makedirs(target_folder, exist_ok=True)
-    destination_path = os.path.join(target_folder, new_filename)
-    counter = 1
-    base, ext = os.path.splitext(new_filename)
-    while os.path.exists(destination_path):
-        renamed_filename = f"{base}_{counter}{ext}"
-        destination_path = os.path.join(target_folder, renamed_filename)
-        if counter == 1: logging.info(f"File '{new_filename}' already exists. Renaming to '{renamed_filename}'")
-        counter += 1
+def _move_file(source_path, destination_path):
+    """
+    Moves a file onto its reserved (placeholder) destination. A rename replaces
+    the placeholder atomically; across drives it falls back to copy + delete.
+    """
+    try:
+        os.replace(source_path, destination_path)
+    except OSError:
+        fast_copy.copy2(source_path, destination_path)
+        os.unlink(source_path)
+
+
+def handle_file_op(op, source_path, target_folder, new_filename, date_obj, registry=None, journal=None):
+    """
+    Copies or moves `source_path` into `target_folder` as `new_filename`, renaming
+    to `<base>_<n><ext>` on a clash. `registry` is the job's DestinationRegistry;
+    without one the folder is listed for this call alone. With a `journal`
+    (OperationJournal) the operation is journaled, and a move across drives
+    becomes a verified copy followed by deleting the source.
+    Returns the destination path, or None on failure.
+    """
+    if registry is None:
+        registry = DestinationRegistry()
+    destination_path = _reserve_destination(registry, source_path, target_folder, new_filename, journal)
+    if destination_path is None:
+        return None
+    return _transfer_file(op, source_path, destination_path, date_obj, registry, journal)
+
+
+def _reserve_destination(registry, source_path, target_folder, new_filename, journal=None):
+    """
+    Creates the folder on first use and claims a free name with O_EXCL; None on
+    failure. Claims are journaled first, so a resumed job can remove unused placeholders.
+    """
+    before_create = functools.partial(journal.claim, source_path) if journal is not None else None
+    try:
+        return registry.reserve(target_folder, new_filename, before_create)
+    except OSError as e:
+        logging.error(f"Error preparing '{target_folder}' for '{os.path.basename(source_path)}': {e}")
+        return None
+
+
+def _transfer_file(op, source_path, destination_path, date_obj, registry, journal=None):
+    """
+    Copies or moves `source_path` onto its reserved `destination_path` and sets
+    the file date. Returns the destination path, or None on failure.
+    """
+    try:
+        if journal is not None and op == 'copy': journal.copy(source_path, destination_path)
+        elif journal is not None and op == 'move': journal.move(source_path, destination_path)
+        elif op == 'copy': fast_copy.copy2(source_path, destination_path)
+        elif op == 'move': _move_file(source_path, destination_path)
+    except Exception as e:
+        logging.error(f"Error performing '{op}' on '{os.path.basename(source_path)}': {e}")
+        registry.release(destination_path)
+        # FIX: Return None on failure.
+        return None
     try:
-        if op == 'copy': shutil.copy2(source_path, destination_path)
-        elif op == 'move': shutil.move(source_path, destination_path)
         logging.info(f"{op.capitalize()}d '{os.path.basename(source_path)}' to '{destination_path}'")
         if date_obj:
             timestamp = date_obj.timestamp()
             os.utime(destination_path, (timestamp, timestamp))
-        # FIX: Return the actual destination path on success, not a boolean.
-        return destination_path
     except Exception as e:
-        logging.error(f"Error performing '{op}' on '{os.path.basename(source_path)}': {e}")
-        # FIX: Return None on failure.
-        return None
+        logging.warning(f"Could not set the date of '{destination_path}': {e}")
+    # FIX: Return the actual destination path on success, not a boolean.
+    return destination_path
 
 # ==============================================================================
 #  Face Recognition Core Logic
@@ -403,6 +798,86 @@ def load_face_encodings(encodings_file):
     except Exception as e:
         raise IOError(f"Could not load or parse encodings file: {e}")
 
+def _open_image_for_faces(image_path, raw_policy=DEFAULT_RAW_POLICY):
+    """
+    Opens an image for face analysis and returns an RGB PIL image that has been
+    downscaled to RESIZE_WIDTH_FOR_PROCESSING, or None if it cannot be decoded.
+
+    Supports Camera Raw files (DNG, CR2, NEF, etc.) via 'rawpy' or Wand when
+    Pillow cannot open them. `raw_policy` picks the RAW strategy: embedded
+    preview, half-size or full demosaic (see image_decode.RAW_DECODE_POLICIES).
+    """
+    pil_image = None
+    file_ext = os.path.splitext(image_path)[1].lower()
+
+    try:
+        # First, try opening with Pillow. This works for most files, including
+        # JPG, PNG, WEBP, and AVIF/HEIC if the plugins are installed.
+        # Decodes at (close to) the target width: JPEG DCT scaling, HEIC thumbnails.
+        pil_image = open_for_analysis(image_path, RESIZE_WIDTH_FOR_PROCESSING)
+    
+    except Exception as e:
+        # If Pillow fails, check if it's a Raw file we can handle with rawpy or Wand.
+        if file_ext in RAW_EXTENSIONS:
+            # rawpy first (preferred), then Wand. The embedded preview or a
+            # half-size decode is tried before a full demosaic, per raw_policy.
+            pil_image = decode_raw_for_analysis(image_path, RESIZE_WIDTH_FOR_PROCESSING, raw_policy)
+
+        if not pil_image:
+            # If it's not a known Raw file or neither library worked, log the original Pillow error.
+            logging.warning(f"Pillow could not open {os.path.basename(image_path)}: {e}")
+            return None
+
+    if not pil_image:
+         return None
+
+    return _resize_for_faces(pil_image, os.path.basename(image_path))
+
+def _resize_for_faces(pil_image, label=""):
+    """Converts an open PIL image to RGB and downscales it to RESIZE_WIDTH_FOR_PROCESSING."""
+    try:
+        return downscale_for_analysis(pil_image, RESIZE_WIDTH_FOR_PROCESSING)
+    except Exception as e:
+        logging.warning(f"Could not prepare {label} for face analysis: {e}")
+        return None
+
+def _prepare_face_pixels(pil_image, label=""):
+    """Face-analysis pixel array for an open PIL image, or None if it cannot be decoded."""
+    prepared = _resize_for_faces(pil_image, label)
+    return np.array(prepared) if prepared is not None else None
+
+
+def build_face_matcher(known_encodings, known_names):
+    """Packs the enrolled encodings into a FaceMatcher (one float32 matrix) for a job."""
+    return FaceMatcher(known_encodings, known_names, tolerance=FACE_RECOGNITION_TOLERANCE)
+
+
+def _detect_and_match_faces(image, matcher, mode, label=""):
+    """
+    Runs face detection on an RGB pixel array and matches every face found
+    against the enrolled encodings in one matrix operation. Returns the list of
+    recognised names ("Unknown" for faces that match nobody).
+    """
+    face_locations = []
+    if mode == 'fast':
+        face_locations = face_recognition.face_locations(image, model='hog')
+    elif mode == 'accurate':
+        face_locations = face_recognition.face_locations(image, model='cnn')
+    else:
+        face_locations = face_recognition.face_locations(image, model='hog', number_of_times_to_upsample=2)
+
+    if not face_locations: return []
+    
+    face_encodings = face_recognition.face_encodings(image, face_locations)
+    found_names = set()
+    for name, _distance in matcher.match(face_encodings):
+        if name is None:
+            logging.warning(f"Skipping a non-finite face encoding in {label}.")
+            continue
+        found_names.add(name)
+    return list(found_names)
+
+
 def _recognize_faces_in_process(image_path, known_encodings, known_names, mode):
     """
     NEW: This function is designed to be run in a separate process.
@@ -410,129 +885,69 @@ def _recognize_faces_in_process(image_path, known_encodings, known_names, mode):
     """
     if not face_recognition: return []
     try:
-        pil_image = Image.open(image_path).convert('RGB')
-        if pil_image.width > RESIZE_WIDTH_FOR_PROCESSING:
-            ratio = RESIZE_WIDTH_FOR_PROCESSING / float(pil_image.width)
-            new_height = int(float(pil_image.height) * ratio)
-            pil_image = pil_image.resize((RESIZE_WIDTH_FOR_PROCESSING, new_height), Image.Resampling.LANCZOS)
-        
-        image = np.array(pil_image)
+        pil_image = _open_image_for_faces(image_path)
+        if pil_image is None:
+            return None
+        matcher = build_face_matcher(known_encodings, known_names)
+        return _detect_and_match_faces(np.array(pil_image), matcher, mode, os.path.basename(image_path))
+    except Exception:
+        # Don't log here, as it can cause issues with multiprocessing.
+        # The parent process will handle the logging of the failure.
+        return None
 
-        model_to_use = 'cnn' if mode == 'accurate' else 'hog'
-        upsamples = 2 if mode == 'balanced' else 1
 
-        face_locations = face_recognition.face_locations(image, model=model_to_use, number_of_times_to_upsample=upsamples)
+# --- Pipeline face-analysis workers (run inside the pipeline's process pool) ---
+_face_worker_state = {}
 
-        if not face_locations: return []
-        
-        face_encodings = face_recognition.face_encodings(image, face_locations)
-        found_names = set()
-        for face_encoding in face_encodings:
-            if not np.isfinite(face_encoding).all(): continue
-            matches = face_recognition.compare_faces(known_encodings, face_encoding, tolerance=FACE_RECOGNITION_TOLERANCE)
-            name = "Unknown"
-            if True in matches:
-                face_distances = face_recognition.face_distance(known_encodings, face_encoding)
-                best_match_index = np.argmin(face_distances)
-                if matches[best_match_index] and face_distances[best_match_index] <= FACE_RECOGNITION_TOLERANCE:
-                    name = known_names[best_match_index]
-            found_names.add(name)
-        return list(found_names)
+def _init_face_worker(matcher, mode):
+    """Pool initializer: loads dlib once per worker and keeps the enrolled face matrix resident."""
+    initialize_libraries()
+    _face_worker_state.update(matcher=matcher, mode=mode)
+
+
+def _analyze_faces_in_worker(task):
+    """
+    Receives (label, pixels) from the pipeline's decode stage and returns the
+    recognised names, or None if detection failed for this image.
+    """
+    label, pixels = task
+    if not face_recognition: return []
+    try:
+        return _detect_and_match_faces(
+            pixels,
+            _face_worker_state["matcher"],
+            _face_worker_state.get("mode", "balanced"),
+            label,
+        )
     except Exception:
-        # Don't log here, as it can cause issues with multiprocessing.
-        # The parent process will handle the logging of the failure.
         return None
 
 
-def recognize_faces(image_path, known_encodings, known_names, mode='balanced'):
+def recognize_faces(image_path, known_encodings, known_names, mode='balanced', matcher=None, record=None):
     """
     The core AI function. It takes a single image and identifies all known
     people within it, with selectable accuracy modes.
 
     MODIFIED: Now supports a wide range of formats, including Camera Raw files
     (DNG, CR2, NEF, etc.) by using the 'rawpy' library to decode them.
+    Pass a pre-built `matcher` (see build_face_matcher) to avoid repacking the
+    enrolled encodings for every photo, and the file's PhotoRecord to reuse
+    pixels that were already decoded.
     """
     if not face_recognition: return []
-    
-    pil_image = None
-    file_ext = os.path.splitext(image_path)[1].lower()
-    RAW_EXTENSIONS = ('.dng', '.cr2', '.cr3', '.nef', '.arw', '.raf')
-
-    try:
-        # First, try opening with Pillow. This works for most files, including
-        # JPG, PNG, WEBP, and AVIF/HEIC if the plugins are installed.
-        pil_image = Image.open(image_path)
-    
-    except Exception as e:
-        # If Pillow fails, check if it's a Raw file we can handle with rawpy or Wand.
-        if file_ext in RAW_EXTENSIONS:
-            # Try rawpy first (preferred)
-            if rawpy:
-                try:
-                    with rawpy.imread(image_path) as raw:
-                        # postprocess() creates a standard, viewable image array
-                        rgb_array = raw.postprocess()
-                    pil_image = Image.fromarray(rgb_array)
-                    logging.info(f"Successfully decoded Raw file '{os.path.basename(image_path)}' via rawpy.")
-                except Exception as raw_e:
-                    logging.warning(f"Could not process Raw file {os.path.basename(image_path)} with rawpy: {raw_e}")
-
-            # Try Wand if rawpy failed or is missing
-            if not pil_image and WandImage:
-                try:
-                    with WandImage(filename=image_path) as img:
-                        img_blob = img.make_blob(format='RGB')
-                        pil_image = Image.frombytes('RGB', (img.width, img.height), img_blob)
-                    logging.info(f"Successfully decoded Raw file '{os.path.basename(image_path)}' via Wand.")
-                except Exception as wand_e:
-                    logging.warning(f"Could not process Raw file {os.path.basename(image_path)} with Wand: {wand_e}")
+    if matcher is None:
+        matcher = build_face_matcher(known_encodings, known_names)
 
-        if not pil_image:
-            # If it's not a known Raw file or neither library worked, log the original Pillow error.
-            logging.warning(f"Pillow could not open {os.path.basename(image_path)}: {e}")
-            return None
-
-    if not pil_image:
+    if record is not None:
+        image = record.take_pixels()
+    else:
+        pil_image = _open_image_for_faces(image_path)
+        image = np.array(pil_image) if pil_image else None
+    if image is None:
          return None
 
-    # --- The rest of the function remains the same, robust and reliable ---
     try:
-        pil_image = pil_image.convert('RGB')
-        if pil_image.width > RESIZE_WIDTH_FOR_PROCESSING:
-            ratio = RESIZE_WIDTH_FOR_PROCESSING / float(pil_image.width)
-            new_height = int(float(pil_image.height) * ratio)
-            pil_image = pil_image.resize((RESIZE_WIDTH_FOR_PROCESSING, new_height), Image.Resampling.LANCZOS)
-        
-        image = np.array(pil_image)
-
-        face_locations = []
-        if mode == 'fast':
-            face_locations = face_recognition.face_locations(image, model='hog')
-        elif mode == 'accurate':
-            face_locations = face_recognition.face_locations(image, model='cnn')
-        else:
-            face_locations = face_recognition.face_locations(image, model='hog', number_of_times_to_upsample=2)
-
-        if not face_locations: return []
-        
-        face_encodings = face_recognition.face_encodings(image, face_locations)
-        found_names = set()
-        for face_encoding in face_encodings:
-            try:
-                if not np.isfinite(face_encoding).all():
-                    logging.warning(f"Skipping a non-finite face encoding in {os.path.basename(image_path)}.")
-                    continue
-                matches = face_recognition.compare_faces(known_encodings, face_encoding, tolerance=FACE_RECOGNITION_TOLERANCE)
-                name = "Unknown"
-                if True in matches:
-                    face_distances = face_recognition.face_distance(known_encodings, face_encoding)
-                    best_match_index = np.argmin(face_distances)
-                    if matches[best_match_index]: name = known_names[best_match_index]
-                found_names.add(name)
-            except Exception as e_inner:
-                logging.warning(f"Could not compare a face in {os.path.basename(image_path)} due to an error: {e_inner}. Skipping this face.")
-                continue
-        return list(found_names)
+        return _detect_and_match_faces(image, matcher, mode, os.path.basename(image_path))
     except Exception as e:
         logging.warning(f"Could not process faces in {os.path.basename(image_path)}: {e}")
         return None
@@ -590,26 +1005,19 @@ def find_and_group_photos(config, update_callback):
     quality_map = {"fast": "Fast", "accurate": "Accurate"}
     quality_metric = quality_map.get(face_mode, "Fast")
     initial_analytics = {"quality": quality_metric, "scan_rate": "0.0", "data_flow": "0.0"}
+    # "Searching" / "Copied" updates reach the UI as a few batched events per second.
+    update_callback = ProgressReporter.wrap(update_callback, quality_metric)
     update_callback(0, "Preparing to search for photos...", "running", initial_analytics)
 
-    # CORRECTED LOGIC: Filter files to process using the parent folder check.
-    ignore_set = set(ignore_list)
-    files_to_process = []
-    for dirpath, dirnames, filenames in os.walk(source_dir):
-        if dirpath in ignore_set:
-            continue # Ignore files in this directory, but os.walk will still process its subdirectories.
-        
-        for f in filenames:
-            if f.lower().endswith(SUPPORTED_EXTENSIONS):
-                files_to_process.append(os.path.join(dirpath, f))
-
-    total_files = len(files_to_process)
-    if total_files == 0:
+    # Files stream in from a background walk; matching starts with the first one found.
+    # Files directly inside an ignored folder are skipped; its subfolders are still scanned.
+    scan = LibraryScan(scan_files(source_dir, ignore_list, SUPPORTED_EXTENSIONS), on_complete=config.get("on_file_count"))
+    if scan.is_empty():
         update_callback(100, "No supported image files found in the source directory.", "complete", initial_analytics)
         return
 
-    found_count = 0
-    known_encodings, known_names = None, None
+    dest_registry = DestinationRegistry()  # Lists the target folder once for the whole search
+    known_encodings, known_names, face_matcher = None, None, None
     
     # Load face models only if a people filter is active
     if find_config.get('people'):
@@ -622,85 +1030,96 @@ def find_and_group_photos(config, update_callback):
             if not known_encodings:
                 update_callback(100, "Cannot use People filter: No faces are enrolled.", "error", initial_analytics)
                 return
+            face_matcher = build_face_matcher(known_encodings, known_names)
         except Exception as e:
             update_callback(100, f"Fatal Error loading face data: {e}", "error", initial_analytics)
             return
 
-    # --- NEW: Real-time analytics tracking ---
-    start_time = time.time()
-    processed_files_count = 0
-    processed_size_mb = 0.0
+    engine = _new_transfer_engine(find_config)
+    found = {"count": 0}
+    found_lock = threading.Lock()
 
-    for i, source_path in enumerate(files_to_process):
-        progress = 10 + int(((i + 1) / total_files) * 85)
-        
-        # --- Analytics Calculation ---
-        analytics = {"quality": quality_metric, "scan_rate": "0.0", "data_flow": "0.0"}
-        try:
-            file_size_mb = os.path.getsize(source_path) / (1024 * 1024)
-            processed_files_count += 1
-            processed_size_mb += file_size_mb
-            
-            elapsed_time = time.time() - start_time
-            if elapsed_time > 0.5:
-                scan_rate = processed_files_count / elapsed_time
-                data_flow = processed_size_mb / elapsed_time
-                analytics["scan_rate"] = f"{scan_rate:.1f}"
-                analytics["data_flow"] = f"{data_flow:.1f}"
-        except OSError:
-            pass
+    on_file_outcome = config.get("on_file_outcome")
 
-        update_callback(progress, f"Searching: {os.path.basename(source_path)}", "running", analytics)
+    def match_written(source_path, progress, nbytes, destination_path):
+        # Runs on a transfer worker once the copy has finished.
+        if on_file_outcome is not None:
+            on_file_outcome(source_path, destination_path, operation_mode)
+        if not destination_path:
+            return
+        with found_lock:
+            found["count"] += 1
+        verb = "copied" if operation_mode == "copy" else "moved"
+        logging.info(f"Found match: {verb.capitalize()} '{os.path.basename(source_path)}' to '{target_folder_name}'")
+        # Data flow is the rate at which matches are written to the target folder.
+        update_callback.file_done(progress, f"{verb.capitalize()} '{os.path.basename(source_path)}' to '{destination_path}'", nbytes)
+
+    try:
+        # One record per file: EXIF/cache, location and pixels are each read at most once.
+        # With a location filter, locations are geocoded a batch at a time.
+        records = _iter_photo_records(scan, resolve_locations=bool(find_config.get('locations')))
+        for i, record in enumerate(records):
+            source_path = record.path
+            progress = _scan_progress(i, scan)
+            update_callback.file_started(progress, f"Searching: {os.path.basename(source_path)}")
         
-        if cancellation_event and cancellation_event.is_set():
-            raise OperationAbortedError("Find & Group operation cancelled by user.")
+            if cancellation_event and cancellation_event.is_set():
+                raise OperationAbortedError("Find & Group operation cancelled by user.")
 
-        exif_data = get_exif_data(source_path)
-        match = True # Assume it's a match until a filter fails
+            match = True # Assume it's a match until a filter fails
 
-        # --- Date Filter ---
-        if match and (find_config.get('years') or find_config.get('months')):
-            date_obj = get_date_taken(exif_data)
-            if not date_obj:
-                match = False
-            else:
-                filter_years = find_config.get('years', [])
-                filter_months = find_config.get('months', [])
-                # Note: The CLI version used int for years, but the UI sends strings.
-                if filter_years and str(date_obj.year) not in filter_years:
-                    match = False
-                # The month format from strftime is '01', '02', etc.
-                if match and filter_months and date_obj.strftime('%m') not in filter_months:
+            # --- Date Filter ---
+            if match and (find_config.get('years') or find_config.get('months')):
+                date_obj = record.date_taken
+                if not date_obj:
                     match = False
-
-        # --- Location Filter ---
-        if match and find_config.get('locations'):
-            loc = get_location(exif_data)
-            # ENHANCEMENT 2.0: Implement robust, "fuzzy" matching for locations.
-            # This normalizes strings by removing all spaces and making them lowercase,
-            # ensuring that minor variations from the geocoder don't cause a mismatch.
-            # e.g., 'IN/Uttar-Pradesh/City Name' matches 'IN/UttarPradesh/CityName'
-            filter_locations_normalized = [l.replace(' ', '').lower() for l in find_config['locations']]
+                else:
+                    filter_years = find_config.get('years', [])
+                    filter_months = find_config.get('months', [])
+                    # Note: The CLI version used int for years, but the UI sends strings.
+                    if filter_years and str(date_obj.year) not in filter_years:
+                        match = False
+                    # The month format from strftime is '01', '02', etc.
+                    if match and filter_months and date_obj.strftime('%m') not in filter_months:
+                        match = False
+
+            # --- Location Filter ---
+            if match and find_config.get('locations'):
+                loc = record.location
+                # ENHANCEMENT 2.0: Implement robust, "fuzzy" matching for locations.
+                # This normalizes strings by removing all spaces and making them lowercase,
+                # ensuring that minor variations from the geocoder don't cause a mismatch.
+                # e.g., 'IN/Uttar-Pradesh/City Name' matches 'IN/UttarPradesh/CityName'
+                filter_locations_normalized = [l.replace(' ', '').lower() for l in find_config['locations']]
             
-            if not loc or loc.replace(' ', '').lower() not in filter_locations_normalized:
-                match = False
+                if not loc or loc.replace(' ', '').lower() not in filter_locations_normalized:
+                    match = False
         
-        # --- People Filter ---
-        if match and find_config.get('people') and known_encodings:
-            # Use requested mode for face recognition when filtering by people.
-            names = recognize_faces(source_path, known_encodings, known_names, mode=face_mode)
-            if not names or not any(p in names for p in find_config['people']):
-                match = False
-
-        if match:
-            date_obj = get_date_taken(exif_data)
-            new_filename = f"{date_obj.strftime('%Y-%m-%d_%H%M%S')}_{os.path.basename(source_path)}" if date_obj else os.path.basename(source_path)
-            destination_path = handle_file_op(operation_mode, source_path, target_folder, new_filename, date_obj)
-            if destination_path:
-                found_count += 1
-                verb = "copied" if operation_mode == "copy" else "moved"
-                logging.info(f"Found match: {verb.capitalize()} '{os.path.basename(source_path)}' to '{target_folder_name}'")
-                update_callback(progress, f"{verb.capitalize()} '{os.path.basename(source_path)}' to '{destination_path}'", "running", analytics)
+            # --- People Filter ---
+            if match and find_config.get('people') and known_encodings:
+                # Use requested mode for face recognition when filtering by people.
+                names = recognize_faces(source_path, known_encodings, known_names, mode=face_mode, matcher=face_matcher, record=record)
+                if not names or not any(p in names for p in find_config['people']):
+                    match = False
+
+            if match:
+                # The name is claimed here, in file order; the copy runs on the transfer engine.
+                destination_path = _reserve_destination(dest_registry, source_path, target_folder, record.new_filename)
+                if destination_path:
+                    engine.submit(
+                        _transfer_file, operation_mode, source_path, destination_path, record.date_taken, dest_registry,
+                        device_path=target_folder, nbytes=record.file_size or 0,
+                        on_done=functools.partial(match_written, source_path, progress, record.file_size or 0),
+                        on_skip=functools.partial(dest_registry.release, destination_path),
+                    )
+        engine.wait()
+    except BaseException:
+        engine.cancel_pending()
+        raise
+    finally:
+        # In-flight copies always finish before the job reports back.
+        engine.shutdown()
+    found_count = found["count"]
 
     verb = "copied" if operation_mode == "copy" else "moved"
     completion_message = f"Search complete. Found and {verb} {found_count} matching photos to '{target_folder_name}'."
@@ -711,15 +1130,18 @@ def find_and_group_photos(config, update_callback):
     update_callback(100, completion_message, "complete", initial_analytics)
 
 
-def _get_standard_sort_paths(base_dir, sort_method, date_obj, location_path, names, multiple_countries_found, sort_options):
+def _get_standard_sort_paths(base_dir, sort_method, record, multiple_countries_found, sort_options):
     """
     NEW: Determines destination paths for a single file under a standard sorting rule.
     This function isolates the logic for Standard Sort to prevent conflicts.
     """
     dest_paths = []
+    date_obj, names = record.date_taken, record.names
     if sort_method == 'Date':
         dest_paths = [os.path.join(base_dir, get_date_path(date_obj))]
     elif sort_method == 'Location':
+        # Only a Location sort asks for the location, so other sorts never load the geocoder.
+        location_path = record.location
         if location_path:
             loc_path_to_use = location_path
             if not multiple_countries_found and os.path.sep in loc_path_to_use:
@@ -738,11 +1160,12 @@ def _get_standard_sort_paths(base_dir, sort_method, date_obj, location_path, nam
     return dest_paths
 
 
-def _get_hybrid_sort_paths(dest_dir, sort_options, exif_data, date_obj, names, multiple_countries_found):
+def _get_hybrid_sort_paths(dest_dir, sort_options, record, multiple_countries_found):
     """
     REBUILT: Determines destination paths for a single file under the hybrid sorting rule,
     mirroring the detailed logic from the original script.
     """
+    date_obj, names = record.date_taken, record.names
     custom_filter = sort_options.get('custom_filter', {})
     filter_type = custom_filter.get('filter_type')
     if filter_type:  # Normalize: 'people' → 'People', 'location' → 'Location', etc.
@@ -753,7 +1176,7 @@ def _get_hybrid_sort_paths(dest_dir, sort_options, exif_data, date_obj, names, m
         # Checks if any of the people recognized in the photo are in the filter list.
         is_custom_match = any(person in names for person in custom_filter.get('people', []))
     elif filter_type == 'Location':
-        photo_location = get_location(exif_data)
+        photo_location = record.location
         if photo_location:
             # Checks if the photo's location is in the filter list.
             is_custom_match = photo_location in custom_filter.get('locations', [])
@@ -796,60 +1219,65 @@ def _get_hybrid_sort_paths(dest_dir, sort_options, exif_data, date_obj, names, m
 
     # Always add the base sort destination path
     base_sort_method = sort_options.get('base_sort', 'Date').title()  # Normalize casing
-    photo_location = get_location(exif_data)
-    base_sort_paths = _get_standard_sort_paths(dest_dir, base_sort_method, date_obj, photo_location, names, multiple_countries_found, sort_options)
+    base_sort_paths = _get_standard_sort_paths(dest_dir, base_sort_method, record, multiple_countries_found, sort_options)
     dest_paths.extend(base_sort_paths)
 
     return dest_paths
 
 
-def _core_processing_loop(work_dir, dest_dir, sort_options, update_callback, encodings_path, cancellation_event=None, operation_mode='move'):
+def _collect_files_to_process(work_dir, sort_options):
     """
-    REFACTORED: This function is now a high-level orchestrator that calls dedicated
-    functions for each sorting mode, preventing logic conflicts.
+    Starts the streaming LibraryScan of the files a sorting job should handle,
+    honouring the ignore list, an explicit file list (watchdog / daemon) and the
+    scheduler's mtime cutoff. Items are DirEntries (paths for an explicit list).
+
+    Returns (scan, sweep). For a scheduled sweep (sort_options['incremental_sweep'])
+    the scan lists only the folders whose mtime changed since the last successful
+    sweep and yields exactly the new or changed files; `sweep` must be committed
+    once the job has succeeded. Otherwise `sweep` is None.
     """
     # Get the full-path ignore list from the options.
     ignore_list = sort_options.get("ignore_list", [])
-    ignore_set = set(ignore_list)
     # Optional: only process files newer than this Unix timestamp (used by the scheduler daemon)
+    # Compared against max(mtime, ctime), so photos recently copied into the folder count as new.
     mtime_cutoff = sort_options.get("mtime_cutoff", None)
     specific_files = sort_options.get("specific_files", None)
-    
-    files_to_process = []
+    on_file_count = sort_options.get("on_file_count")
+    # A resumed job (see process_photos) leaves out the files its journal shows as finished.
+    completed = sort_options.get("completed_sources")
+
+    def pending(items):
+        if not completed:
+            return items
+        return (item for item in items if (item.path if isinstance(item, os.DirEntry) else item) not in completed)
 
     if specific_files is not None:
         # Use the specific files provided (e.g. from watchdog or daemon)
-        for fp in specific_files:
-            if os.path.exists(fp) and fp.lower().endswith(SUPPORTED_EXTENSIONS):
-                files_to_process.append(fp)
-    else:
-        # Walk the entire tree, then filter files based on their parent folder.
-        for dirpath, dirnames, filenames in os.walk(work_dir):
-            if dirpath in ignore_set:
-                continue
+        files = [fp for fp in specific_files if os.path.exists(fp) and fp.lower().endswith(SUPPORTED_EXTENSIONS)]
+        return LibraryScan(pending(files), on_complete=on_file_count), None
+    if sort_options.get("incremental_sweep") and _snapshot_index is not None:
+        sweep = _snapshot_index.sweep(work_dir, ignore_list, SUPPORTED_EXTENSIONS, mtime_cutoff)
+        return LibraryScan(pending(sweep), on_complete=on_file_count), sweep
+    # Files directly inside an ignored folder are skipped; its subfolders are still scanned.
+    return LibraryScan(pending(scan_files(work_dir, ignore_list, SUPPORTED_EXTENSIONS, mtime_cutoff)), on_complete=on_file_count), None
 
-            for f in filenames:
-                if f.lower().endswith(SUPPORTED_EXTENSIONS):
-                    fp = os.path.join(dirpath, f)
-                    if mtime_cutoff is not None:
-                        # Use max(mtime, ctime) to detect files recently placed in the folder.
-                        # mtime = content modification time (preserved from original on macOS copy)
-                        # ctime = metadata/inode change time (updated when file arrives in folder)
-                        # Without ctime, a photo from 2019 copied into the folder TODAY would
-                        # be skipped because its mtime (2019) < cutoff (today).
-                        try:
-                            file_time = max(os.path.getmtime(fp), os.path.getctime(fp))
-                            if file_time < mtime_cutoff:
-                                continue  # Skip files that arrived before last run
-                        except OSError:
-                            pass
-                    files_to_process.append(fp)
-
-    total_files = len(files_to_process)
-    if total_files == 0:
-        update_callback(100, "Scan complete. No supported image files found.", "complete")
-        return 0
 
+def _is_within(path, folder):
+    try:
+        return os.path.commonpath([os.path.abspath(path), os.path.abspath(folder)]) == os.path.abspath(folder)
+    except ValueError:
+        return False  # Different drives on Windows
+
+
+def _prepare_sort_context(work_dir, sort_options, encodings_path, update_callback, files_to_process=None):
+    """
+    Loads everything a sorting job shares across files (face models, country
+    scan, analytics labels). Returns None if a fatal error was already reported.
+
+    For Location (and Hybrid-with-Location) sorts this is phase one of a
+    two-phase sort: the metadata of every file in `files_to_process` is read
+    and geocoded once into ctx["metadata_table"], which the main loop reuses.
+    """
     sort_method = sort_options.get('primary_sort', 'Date').title()  # Normalize: 'location' → 'Location'
     face_rec_mode = sort_options.get('face_mode', 'balanced')
     known_encodings, known_names = None, None
@@ -862,161 +1290,526 @@ def _core_processing_loop(work_dir, dest_dir, sort_options, update_callback, enc
             update_callback(8, f"Face detection mode set to '{face_rec_mode.capitalize()}'.", "running")
         except (FileNotFoundError, ImportError, IOError) as e:
             update_callback(100, f"Fatal Error: Cannot sort by People. Reason: {e}", "error")
-            return 0
+            return None
 
     multiple_countries_found = False
     locations = []
-    if sort_method == 'Location' or (sort_method == 'Hybrid' and (sort_options.get('base_sort') == 'Location' or sort_options.get('custom_filter', {}).get('filter_type') == 'Location')):
+    needs_location = sort_method == 'Location' or (sort_method == 'Hybrid' and (sort_options.get('base_sort') == 'Location' or sort_options.get('custom_filter', {}).get('filter_type') == 'Location'))
+    metadata_table = None
+    if needs_location:
         update_callback(7, "Scanning for location metadata...", "running")
-        locations, _, _ = get_metadata_overview(work_dir)
+        # Phase one: one metadata read + batched geocoding for every file of the job.
+        metadata_table = MetadataTable.build(files_to_process if files_to_process is not None else [])
+        full_scan = not (sort_options.get("specific_files") is not None
+                         or sort_options.get("mtime_cutoff") is not None
+                         or sort_options.get("incremental_sweep")
+                         or sort_options.get("completed_sources")
+                         or sort_options.get("ignore_list"))
+        if full_scan:
+            countries = metadata_table.countries()
+        else:
+            # The folder layout depends on the whole library, not just this batch of files.
+            # Files already in the table are not read again; the rest still cost a walk
+            # (served from the analysis and geocoder caches for files seen before).
+            rest = [entry for entry in scan_files(work_dir, set(), SUPPORTED_EXTENSIONS) if entry.path not in metadata_table]
+            countries = metadata_table.countries() | MetadataTable.build(rest).countries()
         # CORRECTED: This now properly determines if photos span multiple countries.
-        if locations:
-            # Extract the first part of each path (the country code) and count the unique ones.
-            countries = set(loc.split(os.path.sep)[0] for loc in locations if os.path.sep in loc)
-            multiple_countries_found = len(countries) > 1
-
-    # --- NEW: Real-time analytics tracking ---
-    start_time = time.time()
-    processed_files_count = 0
-    processed_size_mb = 0.0
+        multiple_countries_found = len(countries) > 1
+
+    raw_policy = sort_options.get('raw_decode_policy') or DEFAULT_RAW_POLICY
+    if raw_policy not in RAW_DECODE_POLICIES:
+        logging.warning(f"Unknown RAW decode policy '{raw_policy}', using '{DEFAULT_RAW_POLICY}'.")
+        raw_policy = DEFAULT_RAW_POLICY
+
     # Map face_mode to a user-friendly quality string
     quality_map = {"fast": "Fast", "balanced": "Balanced", "accurate": "Accurate"}
-    quality_metric = quality_map.get(face_rec_mode, "N/A")
 
+    return {
+        "sort_method": sort_method,
+        "face_rec_mode": face_rec_mode,
+        "known_encodings": known_encodings,
+        "known_names": known_names,
+        "face_matcher": build_face_matcher(known_encodings, known_names) if known_encodings else None,
+        "multiple_countries_found": multiple_countries_found,
+        "needs_location": needs_location,
+        "metadata_table": metadata_table,
+        "quality_metric": quality_map.get(face_rec_mode, "N/A"),
+        "raw_decode_policy": raw_policy,
+        # Destination folders are listed once per job; names are then assigned from memory.
+        "dest_registry": DestinationRegistry(),
+        # Sources with a failed copy or move; an incremental sweep offers them again.
+        "failed_sources": set(),
+        # Copies and moves are recorded in the job's write-ahead journal (see process_photos).
+        "journal": sort_options.get("operation_journal"),
+        # Hash unseen images for the duplicate finder while sorting (one extra decode per new image).
+        "index_perceptual_hashes": bool(sort_options.get("index_perceptual_hashes")),
+    }
+
+
+def _analyze_file_metadata(record):
+    """
+    Reads the per-file facts every sort needs (EXIF or analysis cache) into the
+    record, plus the fingerprint the metadata store needs, while the file is
+    still at its source (usually already cached by the analysis-cache lookup).
+    """
+    record.meta
+    if _metadata_store is not None or _perceptual_index is not None:
+        record.fingerprint
+    return record
+
+
+def _recognize_item_faces(record, ctx):
+    """Face recognition for one file in the serial loop; never raises."""
+    source_path = record.path
+    try:
+        # This function call is now protected. If it fails for any reason,
+        # the except block will catch it and prevent the main loop from crashing.
+        recognized_names = recognize_faces(source_path, ctx["known_encodings"], ctx["known_names"], mode=ctx["face_rec_mode"], matcher=ctx["face_matcher"], record=record)
+        if recognized_names is not None:
+            return recognized_names
+    except Exception as e:
+        # If recognize_faces fails catastrophically on one file, log it and move on.
+        logging.error(f"CRITICAL: Face recognition failed for file '{os.path.basename(source_path)}'. Error: {e}. This file will be treated as having no faces.")
+    # We explicitly return an empty list so the file can be sorted
+    # into 'No_Faces_Found' and the overall process can continue.
+    return []
+
+
+def _plan_destinations(record, dest_dir, sort_options, ctx):
+    """Destination Path Calculation for one analysed file."""
+    sort_method = ctx["sort_method"]
+    if sort_method == 'Hybrid':
+        return _get_hybrid_sort_paths(dest_dir, sort_options, record, ctx["multiple_countries_found"])
+
+    # Standard Sort
+    # --- DEFINITIVE FIX ---
+    # The location is only looked up (by the record) if the sort method actually requires it.
+    # This prevents the geocoder from loading and causing file locks on other sort types.
+    return _get_standard_sort_paths(dest_dir, sort_method, record, ctx["multiple_countries_found"], sort_options)
+
+
+def _record_photo_metadata(record, final_destination, sort_method):
+    """Smart Album Suggestions: passive metadata capture for one completed file operation."""
+    if _metadata_store is None:
+        return
+    try:
+        _camera = record.camera_model
+        _metadata_store.record_photo(
+            original_path=record.path,
+            destination_path=final_destination,
+            date_taken=record.date_taken,
+            # Only a location some sort rule already resolved — never a fresh geocoder call.
+            location=record.resolved_location,
+            people=record.known_people,
+            file_type=os.path.splitext(record.path)[1].lower(),
+            file_size=record.file_size,
+            sort_type=sort_method,
+            camera_model=str(_camera).strip() if _camera else None,
+            file_hash=record.fingerprint,
+        )
+    except Exception:
+        pass  # Never let metadata capture break a sort job
+
+
+def _record_perceptual_index(record, final_destination, op, ctx):
+    """Keeps the duplicate finder's index current: the destination inherits the source's hashes."""
+    if _perceptual_index is None:
+        return
+    _perceptual_index.record_file(
+        final_destination,
+        fingerprint=record.fingerprint,
+        moved_from=record.path if op == 'move' else None,
+        compute=ctx["index_perceptual_hashes"],
+    )
 
+
+def _new_transfer_engine(sort_options):
+    """The job's TransferEngine, sized by sort_options['transfer_workers' / 'transfer_per_device']."""
+    return TransferEngine(
+        workers=sort_options.get('transfer_workers') or TRANSFER_WORKERS,
+        per_device=sort_options.get('transfer_per_device') or TRANSFER_PER_DEVICE,
+    )
+
+
+def _final_target(record, dest_path, sort_options):
+    return os.path.join(dest_path, record.original_subfolder) if sort_options.get('maintain_hierarchy') else dest_path
+
+
+def _reserve_destinations(record, dest_paths, sort_options, ctx, op):
+    """
+    Claims the destination names of one file up front, on the analysis thread and
+    in file order, so names never depend on which transfer finishes first.
+    A standard move only reserves its first destination (the rest are fallbacks).
+    """
+    folders = [_final_target(record, p, sort_options) for p in dest_paths]
+    if op == 'move' and ctx["sort_method"] != 'Hybrid':
+        folders = folders[:1]
+    reserved = []
+    for folder in folders:
+        path = _reserve_destination(ctx["dest_registry"], record.path, folder, record.new_filename, ctx["journal"])
+        if path is not None:
+            reserved.append((folder, path))
+    return reserved
+
+
+def _submit_file_operations(engine, record, dest_paths, sort_options, ctx, op, operation_manifest, progress, update_callback, on_done):
+    """
+    Queues the file operations of one file on the TransferEngine; on_done(count)
+    runs on the transfer worker once they are finished.
+    """
+    if not dest_paths:
+        return
+    registry = ctx["dest_registry"]
+    reserved = _reserve_destinations(record, dest_paths, sort_options, ctx, op)
+
+    def release_reserved():
+        for _, path in reserved:
+            registry.release(path)
+
+    engine.submit(
+        _execute_file_operations, record, dest_paths, sort_options, ctx, op, operation_manifest,
+        progress, update_callback, reserved,
+        device_path=_final_target(record, dest_paths[0], sort_options),
+        nbytes=record.file_size or 0, on_done=on_done, on_skip=release_reserved,
+    )
+
+
+def _execute_file_operations(record, dest_paths, sort_options, ctx, op, operation_manifest, progress, update_callback, reserved=None):
+    """
+    File Operation Execution for one file. Records successful moves in the
+    rollback manifest (and every operation in the job's journal) and returns
+    how many destinations were written. `update_callback` is the job's ProgressReporter.
+    `reserved` holds (folder, path) names claimed by _reserve_destinations.
+    """
+    registry = ctx["dest_registry"]
+    journal = ctx["journal"]
+    reserved = list(reserved or [])
+    on_file_outcome = sort_options.get("on_file_outcome")
+
+    def file_op(op, source_path, target_folder, new_filename, date_obj):
+        destination = None
+        try:
+            for i, (folder, path) in enumerate(reserved):
+                if folder == target_folder:
+                    del reserved[i]
+                    destination = _transfer_file(op, source_path, path, date_obj, registry, journal)
+                    break
+            else:
+                destination = handle_file_op(op, source_path, target_folder, new_filename, date_obj, registry=registry, journal=journal)
+        finally:
+            if destination is None:
+                ctx["failed_sources"].add(source_path)
+        if on_file_outcome is not None:
+            # Per-operation result for the job's structured outcome (None = failed).
+            on_file_outcome(source_path, destination, op)
+        return destination
+
+    sort_method = ctx["sort_method"]
+    source_path = record.path
+    new_filename = record.new_filename
+    date_obj = record.date_taken
     moved_count = 0
+
+    # --- CORRECTED HYBRID MOVE LOGIC ---
+    # In Hybrid mode, we separate the 'special' copies from the final 'base' move.
+    if sort_method == 'Hybrid':
+        dest_paths = list(dest_paths)
+        # The last path in the list from _get_hybrid_sort_paths is always the base sort path.
+        base_sort_path = dest_paths.pop() if dest_paths else None
+        
+        # Any remaining paths are for special folders. These are always 'copy' operations.
+        for special_dest_path in dest_paths:
+            final_target = _final_target(record, special_dest_path, sort_options)
+            special_destination = file_op('copy', source_path, final_target, new_filename, date_obj)
+            if special_destination:
+                _record_perceptual_index(record, special_destination, 'copy', ctx)
+
+        # Now, perform the primary operation ('move' or 'copy') for the base sort path.
+        if base_sort_path:
+            final_target = _final_target(record, base_sort_path, sort_options)
+            final_destination = file_op(op, source_path, final_target, new_filename, date_obj)
+            if final_destination:
+                if op == 'move':
+                    operation_manifest.append({'source': source_path, 'destination': final_destination})
+                moved_count += 1
+                op_msg = "Moved" if op == 'move' else "Copied"
+                update_callback.file_done(progress, f"{op_msg} '{os.path.basename(source_path)}' to '{final_destination}'", record.file_size or 0)
+                _record_perceptual_index(record, final_destination, op, ctx)
+        if moved_count and journal is not None:
+            journal.file_done(source_path)
+        return moved_count
+
+    # --- STANDARD SORT LOGIC (Unchanged) ---
+    for dest_path in dest_paths:
+        final_target = _final_target(record, dest_path, sort_options)
+        final_destination = file_op(op, source_path, final_target, new_filename, date_obj)
+        
+        if final_destination:
+            if op == 'move':
+                operation_manifest.append({'source': source_path, 'destination': final_destination})
+            moved_count += 1
+            op_msg = "Moved" if op == 'move' else "Copied"
+            update_callback.file_done(progress, f"{op_msg} '{os.path.basename(source_path)}' to '{final_destination}'", record.file_size or 0)
+
+            # ── Smart Album Suggestions: Passive metadata capture ─────────
+            # Record photo metadata after a successful file operation (first dest only).
+            _record_photo_metadata(record, final_destination, sort_method)
+            # ──────────────────────────────────────────────────────────────
+            _record_perceptual_index(record, final_destination, op, ctx)
+
+            # If we successfully moved the file, we don't need to process it for other destinations
+            if op == 'move':
+                break
+    # A resumed job skips files whose operations have all finished.
+    if moved_count and journal is not None:
+        journal.file_done(source_path)
+    return moved_count
+
+
+def _core_processing_loop(work_dir, dest_dir, sort_options, update_callback, encodings_path, cancellation_event=None, operation_mode='move'):
+    """
+    REFACTORED: This function is now a high-level orchestrator that calls dedicated
+    functions for each sorting mode, preventing logic conflicts.
+    """
+    # Already a ProgressReporter when called from process_photos.
+    update_callback = ProgressReporter.wrap(update_callback)
+    # Files stream in from a background walk; processing starts with the first one found.
+    files_to_process, sweep = _collect_files_to_process(work_dir, sort_options)
+    if files_to_process.is_empty():
+        if sweep is not None:
+            sweep.commit()
+        update_callback(100, "Scan complete. No supported image files found.", "complete")
+        return 0
+    if _is_within(dest_dir, work_dir):
+        # Sorted files land inside the tree being walked: finish the walk first
+        # so they are never picked up as new input.
+        files_to_process.wait()
+
+    ctx = _prepare_sort_context(work_dir, sort_options, encodings_path, update_callback, files_to_process)
+    if ctx is None:
+        return 0
+    update_callback.quality = ctx["quality_metric"]
+
+    # Copies and moves run on the transfer engine while analysis moves on to the next file.
+    engine = _new_transfer_engine(sort_options)
+    try:
+        # NEW: Staged concurrent pipeline (opt-in per job)
+        loop = _pipelined_processing_loop if sort_options.get('pipeline_mode') else _serial_processing_loop
+        moved_count = loop(files_to_process, work_dir, dest_dir, sort_options, ctx, update_callback, cancellation_event, operation_mode, engine)
+    except BaseException:
+        engine.cancel_pending()
+        raise
+    finally:
+        # Drains in-flight transfers, so an abort's rollback manifest is complete.
+        engine.shutdown()
+        if _perceptual_index is not None:
+            _perceptual_index.publish_recorded()
+    logging.info(f"Transfers: {engine.get_stats()}, copy methods: {fast_copy.get_stats()}")
+    logging.info(f"Progress: {update_callback.get_stats()}")
+
+    if ctx["needs_location"]:
+        logging.info(f"Geocoder: {geocoder.get_stats()}")
+    if sweep is not None:
+        sweep.retry_later(ctx["failed_sources"])
+        sweep.commit()
+    return moved_count
+
+
+def _serial_processing_loop(files_to_process, work_dir, dest_dir, sort_options, ctx, update_callback, cancellation_event, operation_mode, engine):
+    """
+    Analyses one file at a time and queues its copies / moves on `engine`.
+    Returns the number of files written once every queued transfer is done.
+    """
+    counters = {"moved": 0}
+    counters_lock = threading.Lock()
     # ADD THIS: A manifest to track file operations for rollback on abort.
     operation_manifest = []
 
-    for i, source_path in enumerate(files_to_process):
-        progress = 10 + int(((i + 1) / total_files) * 85)
-        
-        # --- Analytics Calculation ---
-        analytics = {"quality": quality_metric, "scan_rate": "0.0", "data_flow": "0.0"}
-        try:
-            # Get file size for data flow calculation
-            file_size_mb = os.path.getsize(source_path) / (1024 * 1024)
-            processed_files_count += 1
-            processed_size_mb += file_size_mb
-            
-            elapsed_time = time.time() - start_time
-            if elapsed_time > 0.5: # Update analytics every half second to avoid noisy data
-                scan_rate = processed_files_count / elapsed_time
-                data_flow = processed_size_mb / elapsed_time
-                analytics["scan_rate"] = f"{scan_rate:.1f}"
-                analytics["data_flow"] = f"{data_flow:.1f}"
-        except OSError:
-            pass # Ignore if file is inaccessible
+    def count_moved(count):
+        with counters_lock:
+            counters["moved"] += count or 0
+
+    table = ctx["metadata_table"]
 
-        # Pass analytics with the update
-        update_callback(progress, f"Analyzing: {os.path.basename(source_path)}", "running", analytics)
+    def make_record(item):
+        # Phase two: metadata comes from the phase-one table when there is one;
+        # otherwise pixels are decoded alongside EXIF when faces are needed.
+        source_path, st = _path_and_stat(item)
+        meta = table.meta(source_path) if table is not None else None
+        return PhotoRecord(source_path, work_dir, want_pixels=bool(ctx["known_encodings"]),
+                           raw_policy=ctx["raw_decode_policy"], meta=meta, stat=st)
+
+    for i, item in enumerate(files_to_process):
+        record = make_record(item)
+        progress = _scan_progress(i, files_to_process)
+        update_callback.file_started(progress, f"Analyzing: {record.basename}")
         
         if cancellation_event and cancellation_event.is_set():
             # Pass the manifest to the exception so the finally block can use it.
             raise OperationAbortedError("Sorting operation cancelled by user.", manifest=operation_manifest)
 
-        original_subfolder = os.path.relpath(os.path.dirname(source_path), work_dir) if work_dir != os.path.dirname(source_path) else ''
-        exif_data = get_exif_data(source_path)
-        date_obj = get_date_taken(exif_data)
-        new_filename = f"{date_obj.strftime('%Y-%m-%d_%H%M%S')}_{os.path.basename(source_path)}" if date_obj else os.path.basename(source_path)
-
-        names = []
-        if known_encodings:
-            try:
-                # This function call is now protected. If it fails for any reason,
-                # the except block will catch it and prevent the main loop from crashing.
-                recognized_names = recognize_faces(source_path, known_encodings, known_names, mode=face_rec_mode)
-                if recognized_names is not None:
-                    names = recognized_names
-            except Exception as e:
-                # If recognize_faces fails catastrophically on one file, log it and move on.
-                logging.error(f"CRITICAL: Face recognition failed for file '{os.path.basename(source_path)}'. Error: {e}. This file will be treated as having no faces.")
-                # We explicitly ensure 'names' is an empty list so the file can be sorted
-                # into 'No_Faces_Found' and the overall process can continue.
-                names = []
-
-        # --- Destination Path Calculation ---
-        dest_paths = []
-        if sort_method == 'Hybrid':
-            dest_paths = _get_hybrid_sort_paths(dest_dir, sort_options, exif_data, date_obj, names, multiple_countries_found)
-        else: # Standard Sort
-            # --- DEFINITIVE FIX ---
-            # Only call get_location if the sort method actually requires it.
-            # This prevents the geocoder from loading and causing file locks on other sort types.
-            location_path = None
-            if sort_method == 'Location':
-                logging.info("DEBUG: Location sort in progress, calling get_location().")
-                location_path = get_location(exif_data)
-            
-            dest_paths = _get_standard_sort_paths(dest_dir, sort_method, date_obj, location_path, names, multiple_countries_found, sort_options)
+        _analyze_file_metadata(record)
+        if ctx["known_encodings"]:
+            record.names = _recognize_item_faces(record, ctx)
+        record.release_pixels()
 
-        # --- File Operation Execution ---
-        special_folder_path = None
+        dest_paths = _plan_destinations(record, dest_dir, sort_options, ctx)
         # The primary operation is now passed in
-        op = operation_mode
+        _submit_file_operations(engine, record, dest_paths, sort_options, ctx, operation_mode, operation_manifest, progress, update_callback, count_moved)
 
-        # --- CORRECTED HYBRID MOVE LOGIC ---
-        # In Hybrid mode, we separate the 'special' copies from the final 'base' move.
-        if sort_method == 'Hybrid':
-            # The last path in the list from _get_hybrid_sort_paths is always the base sort path.
-            base_sort_path = dest_paths.pop() if dest_paths else None
-            
-            # Any remaining paths are for special folders. These are always 'copy' operations.
-            for special_dest_path in dest_paths:
-                final_target = os.path.join(special_dest_path, original_subfolder) if sort_options.get('maintain_hierarchy') else special_dest_path
-                handle_file_op('copy', source_path, final_target, new_filename, date_obj)
-
-            # Now, perform the primary operation ('move' or 'copy') for the base sort path.
-            if base_sort_path:
-                final_target = os.path.join(base_sort_path, original_subfolder) if sort_options.get('maintain_hierarchy') else base_sort_path
-                final_destination = handle_file_op(op, source_path, final_target, new_filename, date_obj)
-                if final_destination:
-                    if op == 'move':
-                        operation_manifest.append({'source': source_path, 'destination': final_destination})
-                    moved_count += 1
-                    op_msg = "Moved" if op == 'move' else "Copied"
-                    update_callback(progress, f"{op_msg} '{os.path.basename(source_path)}' to '{final_destination}'", "running", analytics)
-        else:
-            # --- STANDARD SORT LOGIC (Unchanged) ---
-            for dest_path in dest_paths:
-                final_target = os.path.join(dest_path, original_subfolder) if sort_options.get('maintain_hierarchy') else dest_path
-                final_destination = handle_file_op(op, source_path, final_target, new_filename, date_obj)
-                
-                if final_destination:
-                    if op == 'move':
-                        operation_manifest.append({'source': source_path, 'destination': final_destination})
-                    moved_count += 1
-                    op_msg = "Moved" if op == 'move' else "Copied"
-                    update_callback(progress, f"{op_msg} '{os.path.basename(source_path)}' to '{final_destination}'", "running", analytics)
-
-                    # ── Smart Album Suggestions: Passive metadata capture ─────────
-                    # Record photo metadata after a successful file operation (first dest only).
-                    if _metadata_store is not None:
-                        try:
-                            # Resolve location string for the record (already computed above)
-                            _loc_raw = get_location(exif_data) if sort_method == 'Location' else None
-                            # Extract camera model from EXIF if available
-                            _camera = exif_data.get('Model') if exif_data else None
-                            _metadata_store.record_photo(
-                                original_path=source_path,
-                                destination_path=final_destination,
-                                date_taken=date_obj,
-                                location=_loc_raw,
-                                people=[n for n in names if n != 'Unknown'] if names else [],
-                                file_type=os.path.splitext(source_path)[1].lower(),
-                                file_size=os.path.getsize(source_path) if os.path.exists(source_path) else None,
-                                sort_type=sort_method,
-                                camera_model=str(_camera).strip() if _camera else None,
-                            )
-                        except Exception:
-                            pass  # Never let metadata capture break a sort job
-                    # ──────────────────────────────────────────────────────────────
-
-                    # If we successfully moved the file, we don't need to process it for other destinations
-                    if op == 'move':
-                        break
+    engine.wait()
+    return counters["moved"]
+
+
+# ==============================================================================
+#  Staged Pipeline Mode
+# ==============================================================================
+
+# Worker counts per stage. Threads for I/O-bound stages, processes for dlib.
+PIPELINE_DEFAULT_WORKERS = {
+    "metadata": 4,
+    "decode": 2,
+    "faces": max(1, min(4, (os.cpu_count() or 2) // 2)),
+    "io": 2,
+}
+
+def _pipeline_worker_counts(sort_options):
+    """Merges per-job overrides (sort_options['pipeline_workers']) over the defaults."""
+    workers = dict(PIPELINE_DEFAULT_WORKERS)
+    for stage, count in (sort_options.get('pipeline_workers') or {}).items():
+        if stage in workers and isinstance(count, int) and count > 0:
+            workers[stage] = count
+    return workers
+
+
+def _pipelined_processing_loop(files_to_process, work_dir, dest_dir, sort_options, ctx, update_callback, cancellation_event, operation_mode, engine):
+    """
+    NEW: Runs the sorting job as a staged pipeline:
+    scan → metadata → decode → face analysis → path planning → file I/O.
+    The I/O stage reserves destination names and queues the transfers on `engine`.
+
+    Keeps the serial loop's semantics: cancellation raises OperationAbortedError
+    carrying the rollback manifest of every completed move, and progress is
+    reported through the same update_callback.
+    """
+    workers = _pipeline_worker_counts(sort_options)
+    state_lock = threading.Lock()
+    counters = {"started": 0, "moved": 0}
+    operation_manifest = []
+
+    def metadata_stage(item):
+        # Pixels are left to the decode stage so decoding keeps its own workers.
+        table = ctx["metadata_table"]
+        source_path, st = _path_and_stat(item)
+        record = PhotoRecord(source_path, work_dir, raw_policy=ctx["raw_decode_policy"],
+                             meta=table.meta(source_path) if table is not None else None, stat=st)
+        with state_lock:
+            progress = _scan_progress(counters["started"], files_to_process)
+            counters["started"] += 1
+        update_callback.file_started(progress, f"Analyzing: {record.basename}")
+        _analyze_file_metadata(record)
+        record.progress = progress
+        return record
+
+    def decode_stage(record):
+        record.pixels
+        return record
+
+    def faces_to_task(record):
+        return (record.basename, record.take_pixels())
+
+    def faces_from_result(record, names):
+        # None means detection failed: treat the file as having no faces, like the serial loop.
+        record.names = names or []
+        return record
+
+    def plan_stage(record):
+        record.dest_paths = _plan_destinations(record, dest_dir, sort_options, ctx)
+        return record
+
+    def count_moved(count):
+        with state_lock:
+            counters["moved"] += count or 0
+
+    def io_stage(record):
+        _submit_file_operations(
+            engine, record, record.dest_paths, sort_options, ctx, operation_mode, operation_manifest,
+            record.progress, update_callback, count_moved,
+        )
+        return None
+
+    stages = [PipelineStage("metadata", metadata_stage, workers=workers["metadata"])]
+    if ctx["known_encodings"]:
+        stages.append(PipelineStage("decode", decode_stage, workers=workers["decode"]))
+        stages.append(PipelineStage(
+            "faces", _analyze_faces_in_worker, workers=workers["faces"], kind=STAGE_KIND_PROCESS,
+            initializer=_init_face_worker,
+            initargs=(ctx["face_matcher"], ctx["face_rec_mode"]),
+            to_task=faces_to_task, from_result=faces_from_result,
+        ))
+    stages.append(PipelineStage("plan", plan_stage, workers=1))
+    stages.append(PipelineStage("io", io_stage, workers=workers["io"]))
+
+    logging.info(f"Pipeline mode: {', '.join(f'{s.name}={s.workers}' for s in stages)}")
+    pipeline = StagedPipeline(stages, cancellation_event=cancellation_event)
+    pipeline.run(files_to_process)
+
+    if pipeline.cancelled:
+        # Pass the manifest to the exception so the finally block can use it.
+        raise OperationAbortedError("Sorting operation cancelled by user.", manifest=operation_manifest)
+    engine.wait()
+    return counters["moved"]
+
+# Runtime-only sort options: callbacks and per-run state, never journaled.
+_RUNTIME_SORT_OPTIONS = ("on_file_count", "on_file_outcome", "operation_journal", "completed_sources", "ignore_list", "specific_files")
+
+
+def _journal_job_settings(config):
+    """The JSON-serialisable part of a job's config: what a resumed run starts from."""
+    settings = {
+        "source_folder": config["source_folder"],
+        "destination_folder": config["destination_folder"],
+        "operation_mode": config.get("operation_mode", "move"),
+        "ignore_list": list(config.get("ignore_list") or []),
+        "sorting_options": {k: v for k, v in (config.get("sorting_options") or {}).items() if k not in _RUNTIME_SORT_OPTIONS},
+    }
+    if config.get("specific_files") is not None:
+        settings["specific_files"] = list(config["specific_files"])
+    return settings
+
+
+def _remove_emptied_folders(source_dir, ignore_set):
+    """
+    Removes the sub-folders of `source_dir` that a move left empty, bottom-up.
+    Ignored folders and everything inside them are never touched, and neither
+    are files the job did not move or `source_dir` itself.
+    """
+    for dirpath, dirnames, filenames in os.walk(source_dir, topdown=False):
+        if dirpath == source_dir or filenames:
+            continue
+        if any(os.path.commonpath([dirpath, ig]) == ig for ig in ignore_set):
+            continue  # Inside (or is) an ignored subtree.
+        try:
+            os.rmdir(dirpath)
+        except OSError:
+            pass  # Not empty: it still holds files or folders the job left alone.
+
+
+# Set for the duration of a sorting job; its worker threads inherit it (see
+# TransferEngine / StagedPipeline), so each job's log file gets only its own lines.
+_job_log_scope = contextvars.ContextVar("locallens_job_log_scope", default=None)
+
+
+class _JobLogFilter(logging.Filter):
+    """Passes records logged within one job's scope."""
+
+    def __init__(self, scope):
+        super().__init__()
+        self._scope = scope
+
+    def filter(self, record):
+        return _job_log_scope.get() is self._scope
 
-    return moved_count
 
 def process_photos(config, update_callback):
     """Main entry point called by the API, orchestrating the entire process."""
@@ -1027,9 +1820,14 @@ def process_photos(config, update_callback):
     sort_options["ignore_list"] = ignore_list
     if "specific_files" in config:
         sort_options["specific_files"] = config["specific_files"]
+    # Reported once the job's single library walk has finished.
+    sort_options["on_file_count"] = config.get("on_file_count")
+    sort_options["on_file_outcome"] = config.get("on_file_outcome")
     operation_mode = config.get("operation_mode", "move")
     encodings_path = config.get("encodings_path")
     cancellation_event = config.get("cancellation_event")
+    # Set by the resume API: continue the job recorded in this operation journal.
+    resume_job_id = config.get("resume_job_id")
 
     log_file_handle, temp_log_path = tempfile.mkstemp(suffix=".log", text=True)
     os.close(log_file_handle)
@@ -1037,10 +1835,12 @@ def process_photos(config, update_callback):
     log_handler = logging.FileHandler(temp_log_path, mode='w', encoding='utf-8')
     formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
     log_handler.setFormatter(formatter)
-    
+    log_scope = object()
+    log_scope_token = _job_log_scope.set(log_scope)
+    log_handler.addFilter(_JobLogFilter(log_scope))
+
     root_logger = logging.getLogger()
-    if root_logger.hasHandlers():
-        root_logger.handlers.clear()
+    # Only this job's handler is added and later removed: concurrent jobs keep their own.
     root_logger.addHandler(log_handler)
     root_logger.setLevel(logging.INFO)
     
@@ -1048,40 +1848,48 @@ def process_photos(config, update_callback):
     quality_map = {"fast": "Fast", "balanced": "Balanced", "accurate": "High"}
     quality_metric = quality_map.get(face_rec_mode, "N/A")
     initial_analytics = {"quality": quality_metric, "scan_rate": "0.0", "data_flow": "0.0"}
+    # Per-file updates are rate-limited and batched; analytics cover a sliding window.
+    update_callback = ProgressReporter.wrap(update_callback, quality_metric)
     update_callback(0, f"System prepared. Initiating '{operation_mode.capitalize()}' operation.", "running", initial_analytics)
 
-    work_dir = source_dir
-    temp_source_path = None
     operation_successful = False # Add a flag to track success
-    # FIX: A new flag to determine if the original source should be deleted.
-    delete_original_source_on_success = False
+    # Every copy and move is recorded in a write-ahead journal on disk: it drives the
+    # rollback on abort and lets a job interrupted by a crash be resumed.
+    journal = None
+    cross_drive_move = False
+    ignore_set = set(ignore_list)
     
     # ADD THIS: To hold the manifest if an abort occurs
     rollback_manifest = None
 
     try:
+        if resume_job_id:
+            journal, completed = OperationJournal.resume(resume_job_id)
+            sort_options["completed_sources"] = completed
+            logging.info(f"Resuming job {resume_job_id}: {len(completed)} files were already finished.")
+        else:
+            try:
+                journal = OperationJournal.create(operation_mode, job=_journal_job_settings(config))
+            except OSError as e:
+                logging.warning(f"Could not create the operation journal; this job cannot be resumed after a crash: {e}")
+        sort_options["operation_journal"] = journal
+        if journal is not None:
+            logging.info(f"Operation journal: {journal.path}")
+
         if operation_mode == 'move':
             source_dev = os.stat(source_dir).st_dev
             dest_dev = os.stat(dest_dir).st_dev
 
             if source_dev != dest_dev:
                 # --- SAFE PATH: Different drives ---
-                # This path is transactional and fully reversible on abort.
-                logging.warning("Source and destination are on different drives. Using safe copy-then-delete method.")
+                # Each file is copied straight to its final folder, verified, and only
+                # then deleted at the source. The journal makes an abort fully reversible.
+                logging.warning("Source and destination are on different drives. Using journaled copy-verify-delete moves.")
                 update_callback(1, "Verifying required disk space...", "running", initial_analytics)
                 
-                # CORRECTED LOGIC: Filter files based on their parent folder for size calculation.
-                ignore_set = set(ignore_list)
-                files_to_process = []
-                for dirpath, dirnames, filenames in os.walk(source_dir):
-                    if dirpath in ignore_set:
-                        continue # Ignore files in this directory for size calculation.
-                    
-                    for f in filenames:
-                        if f.lower().endswith(SUPPORTED_EXTENSIONS):
-                            files_to_process.append(os.path.join(dirpath, f))
-
-                total_size = sum(os.path.getsize(f) for f in files_to_process)
+                # Files directly inside ignored folders are left out of the size calculation.
+                # Sizes come from the scan's cached stat, not a second stat per file.
+                total_size = sum(entry_size(entry) for entry in scan_files(source_dir, ignore_set, SUPPORTED_EXTENSIONS))
                 free_space = shutil.disk_usage(dest_dir).free
 
                 if total_size > free_space:
@@ -1091,40 +1899,20 @@ def process_photos(config, update_callback):
                     logging.error(error_msg)
                     raise Exception(error_msg)
                 
-                update_callback(2, "Space check passed. Creating secure temporary workspace...", "running", initial_analytics)
-                timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
-                temp_source_name = f"_Source_Copy_{timestamp}"
-                temp_source_path = os.path.join(os.path.dirname(dest_dir), temp_source_name)
-                
-                # CORRECTED: shutil.ignore_patterns does not work with full paths.
-                # We must define a custom ignore function for copytree.
-                def ignore_func(directory, contents):
-                    ignored_items = []
-                    for item in contents:
-                        full_path = os.path.join(directory, item)
-                        if full_path in ignore_set:
-                            ignored_items.append(item)
-                    return ignored_items
-
-                shutil.copytree(source_dir, temp_source_path, ignore=ignore_func, copy_function=shutil.copy2)
-                work_dir = temp_source_path
-                # Set the flag to delete the original source only if this safe method completes.
-                delete_original_source_on_success = True
+                update_callback(2, "Space check passed. Moving files one by one with verification.", "running", initial_analytics)
+                cross_drive_move = True
             else:
                 # --- FAST PATH: Same drive ---
                 # Work directly on the source folder. `shutil.move` will be a fast rename.
                 # Aborting here is not fully transactional, but it is safe (no data loss).
                 logging.info("Source and destination are on the same drive. Performing a fast and efficient move.")
                 update_callback(2, "Performing fast move on the same drive.", "running", initial_analytics)
-                work_dir = source_dir
-                # Do NOT set the delete flag. The files are moved one by one.
-                delete_original_source_on_success = False
         
         # For 'copy' operation, work_dir remains source_dir.
 
         update_callback(5, "Workspace secured. Commencing file processing...", "running", initial_analytics)
         
-        moved_count = _core_processing_loop(work_dir, dest_dir, sort_options, update_callback, encodings_path, cancellation_event, operation_mode)
+        moved_count = _core_processing_loop(source_dir, dest_dir, sort_options, update_callback, encodings_path, cancellation_event, operation_mode)
 
         completion_message = f"Process complete. {moved_count} files successfully {operation_mode}d."
         logging.info(completion_message)
@@ -1140,7 +1928,12 @@ def process_photos(config, update_callback):
 
     finally:
         # --- ABORT ROLLBACK LOGIC ---
-        if rollback_manifest:
+        if rollback_manifest is not None and journal is not None:
+            # The journal also knows about moves that were interrupted half-way.
+            update_callback(99, "Aborted. Rolling back moved files...", "running", initial_analytics)
+            restored, failed = journal.rollback()
+            logging.info(f"Rollback complete: {restored} files restored, {failed} failed.")
+        elif rollback_manifest:
             update_callback(99, "Aborted. Rolling back moved files...", "running", initial_analytics)
             logging.info(f"Rollback initiated for {len(rollback_manifest)} files.")
             for op in reversed(rollback_manifest):
@@ -1153,93 +1946,22 @@ def process_photos(config, update_callback):
                     logging.error(f"CRITICAL: Rollback failed for '{op['destination']}'. Please move it manually to '{op['source']}'. Error: {rollback_e}")
             logging.info("Rollback complete.")
 
-        # This block runs on success, failure, or abort.
-        # FIX: Only delete the original source if the 'safe move' path was taken and was successful.
-        if delete_original_source_on_success and operation_successful:
-            try:
-                update_callback(99, "Finalizing move: Removing original source directory...", "running", initial_analytics)
-
-                # BUG FIX: A blanket shutil.rmtree(source_dir) would permanently destroy any
-                # ignored subfolders that were intentionally skipped during the copy step and
-                # therefore never transferred anywhere. Instead, we perform an ignore-aware
-                # deletion: remove only what was actually copied, and leave ignored subtrees
-                # (plus any ancestor directory that leads to one) intact.
-                if not ignore_set:
-                    # No ignore list — safe to remove the whole tree as before.
-                    shutil.rmtree(source_dir)
-                else:
-                    # Determine every directory that is an ancestor of an ignored path so
-                    # we can keep those directories alive even if they contain no other content.
-                    ancestor_dirs = set()
-                    for ignored_path in ignore_set:
-                        # Walk from source_dir down to the ignored path's parent.
-                        rel = os.path.relpath(ignored_path, source_dir)
-                        parts = rel.split(os.sep)
-                        for i in range(len(parts)):
-                            ancestor_dirs.add(os.path.join(source_dir, *parts[:i]))
-
-                    # Bottom-up walk so we can safely remove empty dirs as we go.
-                    for dirpath, dirnames, filenames in os.walk(source_dir, topdown=False):
-                        # Never touch an ignored subtree.
-                        if dirpath in ignore_set:
-                            continue
-
-                        # Delete individual files that are not inside an ignored subtree.
-                        for fname in filenames:
-                            fpath = os.path.join(dirpath, fname)
-                            # Check whether any prefix of fpath is an ignored dir.
-                            in_ignored = any(
-                                os.path.commonpath([fpath, ig]) == ig
-                                for ig in ignore_set
-                            )
-                            if not in_ignored:
-                                try:
-                                    os.remove(fpath)
-                                except Exception as del_e:
-                                    logging.error(f"Could not delete source file '{fpath}': {del_e}")
-
-                        # Remove subdirectories that are not ignored and not ancestors of an
-                        # ignored path, provided they are now empty.
-                        for dname in dirnames:
-                            dpath = os.path.join(dirpath, dname)
-                            if dpath in ignore_set:
-                                continue  # Preserve ignored subtree.
-                            in_ignored = any(
-                                os.path.commonpath([dpath, ig]) == ig
-                                for ig in ignore_set
-                            )
-                            if in_ignored:
-                                continue  # Inside an ignored subtree — leave it.
-                            if dpath not in ancestor_dirs and not os.listdir(dpath):
-                                try:
-                                    os.rmdir(dpath)
-                                except Exception as del_e:
-                                    logging.error(f"Could not remove source dir '{dpath}': {del_e}")
-
-                    # Finally, remove the root source_dir itself only if it is now empty
-                    # (it won't be if any ignored subtree lives inside it).
-                    if not os.listdir(source_dir):
-                        os.rmdir(source_dir)
-                    else:
-                        logging.info(
-                            f"Original source directory kept because it still contains "
-                            f"ignored sub-folders: {source_dir}"
-                        )
-
-                logging.info(f"Successfully removed copied content from original source directory: {source_dir}")
-            except Exception as e:
-                logging.error(f"CRITICAL: Failed to remove original source directory after move: {e}")
-                update_callback(100, f"Error: Could not remove original source folder. Please remove it manually: {source_dir}", "warning", initial_analytics)
-
-        if temp_source_path and os.path.exists(temp_source_path):
-            # This cleanup is for the 'safe move' path, especially on abort.
-            update_callback(99, "Finalizing operation: Cleaning up temporary workspace...", "running", initial_analytics)
-            shutil.rmtree(temp_source_path)
-            logging.info("Temporary folder cleanup complete.")
+        for key in ("operation_journal", "completed_sources"):
+            sort_options.pop(key, None)
+        if journal is not None:
+            # Finished (or rolled back) jobs need no recovery; keep the journal otherwise,
+            # unless the job failed before touching a single file.
+            journal.close(discard=operation_successful or rollback_manifest is not None or not journal.has_operations)
+            if not operation_successful and journal.has_operations and rollback_manifest is None:
+                logging.info(f"The job can be resumed: POST /api/journals/{journal.job_id}/resume")
+        if cross_drive_move and operation_successful:
+            update_callback(99, "Finalizing move: Removing emptied source folders...", "running", initial_analytics)
+            _remove_emptied_folders(source_dir, ignore_set)
         
         if log_handler:
             root_logger.removeHandler(log_handler)
             log_handler.close()
+            _job_log_scope.reset(log_scope_token)
             
             try:
                 final_log_dir = os.path.join(dest_dir, "logs")
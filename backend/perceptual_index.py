@@ -0,0 +1,538 @@
+"""
+LocalLens — Persistent Perceptual-Hash Index
+=============================================
+Remembers the pHash and dHash of every photo the app has looked at, so the
+duplicate finder decodes an image once in its lifetime instead of on every
+search, and a new photo can be checked against the whole organized library
+without opening a single library file.
+
+Design Principles:
+  1. Keyed by content — hashes are stored per fingerprint (see fingerprint.py),
+     so a file that is moved, renamed or copied keeps its hashes; only new
+     bytes are ever decoded
+  2. Paths on top — a second table maps each known path (with size and
+     mtime_ns) to its fingerprint; an unchanged file is answered from the DB
+     without even being read
+  3. Incremental — sorting records every destination it writes (moves drop the
+     source path), refresh() picks up added, changed and deleted files of a
+     folder, and query results that no longer exist are forgotten on the spot
+  4. In-memory library — similar() scans a NumPy snapshot of all indexed hashes
+     with a vectorized popcount; the snapshot is rebuilt only after the index
+     changed, and files recorded by a sorting job count as one change, made
+     visible when the job ends (publish_recorded)
+  5. Disposable — it is only a cache; deleting the DB file is always safe
+
+File Location: ~/.config/LocalLens/perceptual_index.db
+Permissions:   0o600 (owner read/write only)
+"""
+
+import os
+import sys
+import time
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from fingerprint import fingerprints
+from library_scanner import scan_files
+from near_duplicates import phash_to_uint64, popcount64
+
+try:
+    from PIL import Image
+    import imagehash
+except ImportError:
+    imagehash = None  # Optional: without it nothing can be hashed, only looked up
+
+# ── Logger ──────────────────────────────────────────────────────────────────
+_log = logging.getLogger("locallens.perceptual_index")
+if not _log.handlers:
+    _h = logging.StreamHandler(sys.stderr)
+    _h.setFormatter(logging.Formatter("[perceptual_index] %(levelname)s: %(message)s"))
+    _log.addHandler(_h)
+    _log.setLevel(logging.INFO)
+    _log.propagate = False
+
+# ── Constants ─────────────────────────────────────────────────────────────
+DB_FILENAME         = "perceptual_index.db"
+COMMIT_EVERY        = 500      # Rows written between two commits during refresh()
+DEFAULT_MAX_MATCHES = 50       # similar() results
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  Path helpers
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _get_config_dir() -> Path:
+    """Return the OS-appropriate LocalLens config directory."""
+    if sys.platform == "win32":
+        base = Path(os.environ.get("APPDATA", Path.home()))
+    else:
+        base = Path.home() / ".config"
+    config_dir = base / "LocalLens"
+    config_dir.mkdir(parents=True, exist_ok=True)
+    return config_dir
+
+
+def _get_db_path() -> Path:
+    return _get_config_dir() / DB_FILENAME
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  Schema
+# ─────────────────────────────────────────────────────────────────────────────
+
+_SCHEMA_SQL = """
+PRAGMA journal_mode=WAL;
+
+CREATE TABLE IF NOT EXISTS image_hashes (
+    fingerprint TEXT    PRIMARY KEY,     -- fingerprints.partial() of the bytes
+    phash       INTEGER NOT NULL,        -- 64-bit, stored as signed
+    dhash       INTEGER NOT NULL,
+    created_at  REAL    NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS indexed_files (
+    path        TEXT    PRIMARY KEY,
+    size        INTEGER NOT NULL,
+    mtime_ns    INTEGER NOT NULL,
+    fingerprint TEXT    NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_indexed_fingerprint ON indexed_files(fingerprint);
+"""
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  Utility helpers
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _to_db(value: int) -> int:
+    """SQLite integers are signed 64-bit."""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def _from_db(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+
+def _prefix_range(folder: str) -> Tuple[str, str]:
+    """(low, high) such that low <= path < high selects every path under `folder`."""
+    prefix = os.path.join(os.path.abspath(folder), "")
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _under(path: str, prefixes: Sequence[str]) -> bool:
+    return not prefixes or path.startswith(tuple(prefixes))
+
+
+def compute_hashes(path: str) -> Optional[Tuple[int, int]]:
+    """(pHash, dHash) of the image at `path` from a single decode; None if unreadable."""
+    if imagehash is None:
+        return None
+    try:
+        with Image.open(path) as img:
+            img.load()
+            return phash_to_uint64(imagehash.phash(img)), phash_to_uint64(imagehash.dhash(img))
+    except Exception:
+        return None  # Corrupt, truncated or unsupported image
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  PerceptualIndex class
+# ─────────────────────────────────────────────────────────────────────────────
+
+class PerceptualIndex:
+    """
+    Thread-safe SQLite-backed index of perceptual hashes.
+
+    Usage:
+        from perceptual_index import perceptual_index
+        phash, dhash = perceptual_index.hashes(path, st)        # decodes only unseen bytes
+        perceptual_index.hashes_many(files, compute_map=pool_map)   # batch, decodes in parallel
+        perceptual_index.record_file(dest, fingerprint, moved_from=src)   # after sorting
+        perceptual_index.publish_recorded()                               # once the job ends
+        perceptual_index.refresh(["/Photos/Library"], extensions=SUPPORTED_EXTENSIONS)
+        perceptual_index.similar("/Imports/IMG_0001.jpg", max_distance=3)
+    """
+
+    def __init__(self):
+        self._db_path = _get_db_path()
+        self._local = threading.local()
+        self._snapshot_lock = threading.Lock()
+        self._generation = 0
+        self._snapshot = None   # (generation, paths, phash array, dhash array)
+        self._recorded = False  # record_file() wrote rows the snapshot does not show yet
+        self.computed = 0
+        self.reused = 0
+        self._init_db()
+
+    # ── Initialization ──────────────────────────────────────────────────────
+
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread; pipeline workers each get their own."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self._db_path), timeout=10)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        """Create tables, indexes, and set file permissions."""
+        try:
+            conn = self._connect()
+            conn.executescript(_SCHEMA_SQL)
+            conn.commit()
+            os.chmod(self._db_path, 0o600)
+        except Exception as e:
+            _log.error(f"Failed to initialize perceptual index: {e}")
+
+    @property
+    def available(self) -> bool:
+        """False when imagehash is missing: new images cannot be hashed."""
+        return imagehash is not None
+
+    def _changed(self):
+        self._generation += 1
+
+    def publish_recorded(self) -> None:
+        """Makes files recorded since the last call visible to similar(); once per sorting job."""
+        if self._recorded:
+            self._recorded = False
+            self._changed()
+
+    # ── Core: hashes / record / forget ──────────────────────────────────────
+
+    def _hashes(self, conn, path: str, st: os.stat_result, fingerprint: Optional[str], compute: bool, remember: bool = True):
+        """(value, indexed) — the hashes of `path` (or None) and whether its path row was written."""
+        row = conn.execute(
+            """
+            SELECT h.phash, h.dhash FROM indexed_files f JOIN image_hashes h USING (fingerprint)
+            WHERE f.path=? AND f.size=? AND f.mtime_ns=?
+            """,
+            (path, st.st_size, st.st_mtime_ns),
+        ).fetchone()
+        if row is not None:
+            self.reused += 1
+            return (_from_db(row[0]), _from_db(row[1])), False
+
+        fingerprint = fingerprint or fingerprints.partial(path, st)
+        if not fingerprint:
+            return None, False
+        row = conn.execute(
+            "SELECT phash, dhash FROM image_hashes WHERE fingerprint=?", (fingerprint,)
+        ).fetchone()
+        if row is not None:
+            self.reused += 1
+            value = (_from_db(row[0]), _from_db(row[1]))
+        elif not compute:
+            return None, False
+        else:
+            value = compute_hashes(path)
+            if value is None:
+                return None, False
+            self.computed += 1
+            conn.execute(
+                "INSERT OR REPLACE INTO image_hashes (fingerprint, phash, dhash, created_at) VALUES (?,?,?,?)",
+                (fingerprint, _to_db(value[0]), _to_db(value[1]), time.time()),
+            )
+        if not remember:
+            return value, False
+        conn.execute(
+            "INSERT OR REPLACE INTO indexed_files (path, size, mtime_ns, fingerprint) VALUES (?,?,?,?)",
+            (path, st.st_size, st.st_mtime_ns, fingerprint),
+        )
+        return value, True
+
+    def hashes(
+        self,
+        path: str,
+        st: Optional[os.stat_result] = None,
+        fingerprint: Optional[str] = None,
+        compute: bool = True,
+        remember: bool = True,
+    ) -> Optional[Tuple[int, int]]:
+        """
+        (pHash, dHash) of `path` as 64-bit ints, decoding the image only when its
+        bytes were never hashed before (and `compute` is set). None if unreadable.
+        With `remember=False` the path itself is not added to the index.
+        """
+        try:
+            st = st or os.stat(path)
+        except OSError:
+            return None
+        try:
+            conn = self._connect()
+            value, indexed = self._hashes(conn, path, st, fingerprint, compute, remember)
+            if conn.in_transaction:
+                conn.commit()
+            if indexed:
+                self._changed()
+            return value
+        except sqlite3.Error as e:
+            _log.warning(f"hashes failed for {path}: {e}")
+            return compute_hashes(path) if compute else None
+
+    def hashes_many(self, files: Sequence[Tuple[str, os.stat_result]], compute_map=None) -> Dict[str, Tuple[int, int]]:
+        """
+        hashes() for many (path, stat) pairs: everything known is looked up
+        first, then the images never seen are decoded in one batch through
+        `compute_map(compute_hashes, paths)` — e.g. a process pool's map —
+        or in this thread. Unreadable files are left out of the result.
+        """
+        results, misses = {}, []
+        try:
+            conn = self._connect()
+            for path, st in files:
+                value, _ = self._hashes(conn, path, st, None, compute=False)
+                if value is None:
+                    misses.append((path, st))
+                else:
+                    results[path] = value
+            if conn.in_transaction:
+                conn.commit()
+                self._changed()
+        except sqlite3.Error as e:
+            _log.warning(f"hashes_many lookup failed: {e}")
+            conn, misses = None, [(p, st) for p, st in files if p not in results]
+        if not misses:
+            return results
+
+        computed = (compute_map or (lambda fn, items: [fn(i) for i in items]))(
+            compute_hashes, [path for path, _ in misses]
+        )
+        rows, now = [], time.time()
+        for (path, st), value in zip(misses, computed):
+            if value is None:
+                continue
+            results[path] = value
+            self.computed += 1
+            fingerprint = fingerprints.partial(path, st)
+            if fingerprint:
+                rows.append((path, st, fingerprint, value))
+        if conn is not None and rows:
+            try:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO image_hashes (fingerprint, phash, dhash, created_at) VALUES (?,?,?,?)",
+                    [(fp, _to_db(v[0]), _to_db(v[1]), now) for _, _, fp, v in rows],
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO indexed_files (path, size, mtime_ns, fingerprint) VALUES (?,?,?,?)",
+                    [(path, st.st_size, st.st_mtime_ns, fp) for path, st, fp, _ in rows],
+                )
+                conn.commit()
+                self._changed()
+            except sqlite3.Error as e:
+                _log.warning(f"hashes_many store failed: {e}")
+        return results
+
+    def record_file(
+        self,
+        path: str,
+        fingerprint: Optional[str] = None,
+        moved_from: Optional[str] = None,
+        compute: bool = False,
+    ) -> None:
+        """
+        Record a file the organizer just wrote (a move drops `moved_from`). The
+        fingerprint taken at the source carries existing hashes over; with
+        `compute` an unseen image is decoded and hashed right away.
+        """
+        try:
+            st = os.stat(path)
+            conn = self._connect()
+            if moved_from:
+                conn.execute("DELETE FROM indexed_files WHERE path=?", (moved_from,))
+            value, _ = self._hashes(conn, path, st, fingerprint, compute)
+            if value is None and fingerprint:
+                # Hashes unknown yet: remember the path so a later lookup skips the read.
+                conn.execute(
+                    "INSERT OR REPLACE INTO indexed_files (path, size, mtime_ns, fingerprint) VALUES (?,?,?,?)",
+                    (path, st.st_size, st.st_mtime_ns, fingerprint),
+                )
+            conn.commit()
+            # Not _changed(): one snapshot rebuild per job, not per file (see publish_recorded).
+            self._recorded = True
+        except Exception as e:
+            _log.warning(f"record_file failed for {path}: {e}")
+
+    def forget(self, paths: Iterable[str]) -> int:
+        """Drop deleted files from the index; their hashes stay for a returning copy."""
+        try:
+            conn = self._connect()
+            count = conn.executemany(
+                "DELETE FROM indexed_files WHERE path=?", [(p,) for p in paths]
+            ).rowcount
+            conn.commit()
+            if count:
+                self._changed()
+            return count
+        except sqlite3.Error as e:
+            _log.warning(f"forget failed: {e}")
+            return 0
+
+    # ── Folder refresh ──────────────────────────────────────────────────────
+
+    def refresh(
+        self,
+        folders: Sequence[str],
+        extensions: Sequence[str],
+        ignore_list: Optional[Iterable[str]] = None,
+        should_abort=None,
+    ) -> Dict[str, Any]:
+        """
+        Bring the index up to date for every image under `folders`: new and
+        changed files are hashed (or matched by fingerprint), deleted ones dropped.
+        """
+        ignore_list = list(ignore_list or [])
+        stats = {"files": 0, "computed": 0, "reused": 0, "removed": 0, "unreadable": 0}
+        computed_before, reused_before = self.computed, self.reused
+        conn = self._connect()
+        pending = 0
+        try:
+            for folder in folders:
+                folder = os.path.abspath(folder)
+                seen = set()
+                for entry in scan_files(folder, ignore_list, extensions):
+                    if should_abort is not None and should_abort():
+                        return stats
+                    try:
+                        value, wrote = self._hashes(conn, entry.path, entry.stat(), None, True)
+                    except OSError:
+                        value, wrote = None, False
+                    if value is None:
+                        stats["unreadable"] += 1
+                        continue
+                    seen.add(entry.path)
+                    stats["files"] += 1
+                    pending += wrote
+                    if pending >= COMMIT_EVERY:
+                        conn.commit()
+                        pending = 0
+                low, high = _prefix_range(folder)
+                gone = [
+                    (path,) for (path,) in conn.execute(
+                        "SELECT path FROM indexed_files WHERE path >= ? AND path < ?", (low, high)
+                    ) if path not in seen and not os.path.exists(path)
+                ]
+                stats["removed"] += conn.executemany(
+                    "DELETE FROM indexed_files WHERE path=?", gone
+                ).rowcount
+            return stats
+        finally:
+            conn.commit()
+            self._changed()
+            stats["computed"] = self.computed - computed_before
+            stats["reused"] = self.reused - reused_before
+
+    # ── Queries ─────────────────────────────────────────────────────────────
+
+    def _library(self):
+        """(paths, phash array, dhash array) of every indexed file, cached per generation."""
+        with self._snapshot_lock:
+            if self._snapshot is None or self._snapshot[0] != self._generation:
+                generation = self._generation
+                rows = self._connect().execute(
+                    "SELECT f.path, h.phash, h.dhash FROM indexed_files f JOIN image_hashes h USING (fingerprint)"
+                ).fetchall()
+                paths = [r[0] for r in rows]
+                phashes = np.array([_from_db(r[1]) for r in rows], dtype=np.uint64)
+                dhashes = np.array([_from_db(r[2]) for r in rows], dtype=np.uint64)
+                self._snapshot = (generation, paths, phashes, dhashes)
+            return self._snapshot[1:]
+
+    def similar(
+        self,
+        path: str,
+        max_distance: int,
+        folders: Optional[Sequence[str]] = None,
+        max_matches: int = DEFAULT_MAX_MATCHES,
+    ) -> List[Dict[str, Any]]:
+        """
+        Indexed files (optionally only under `folders`) whose pHash is within
+        `max_distance` of `path`, closest first. `path` itself is hashed if needed
+        but not added to the index, so checking a new photo never invalidates the
+        in-memory library.
+        """
+        value = self.hashes(path, remember=False)
+        if value is None:
+            return []
+        paths, phashes, dhashes = self._library()
+        if not paths:
+            return []
+        distances = popcount64(phashes ^ np.uint64(value[0]))
+        candidates = np.flatnonzero(distances <= max_distance)
+        candidates = candidates[np.argsort(distances[candidates], kind="stable")]
+        prefixes = [_prefix_range(f)[0] for f in folders or []]
+        query = os.path.abspath(path)
+        matches, missing = [], []
+        for i in candidates.tolist():
+            other = paths[i]
+            if other == query or not _under(other, prefixes):
+                continue
+            if not os.path.exists(other):
+                missing.append(other)
+                continue
+            matches.append({
+                "path":           other,
+                "distance":       int(distances[i]),
+                "dhash_distance": int(popcount64(dhashes[i] ^ np.uint64(value[1]))),
+            })
+            if len(matches) >= max_matches:
+                break
+        if missing:
+            self.forget(missing)
+        return matches
+
+    # ── Statistics / Privacy ────────────────────────────────────────────────
+
+    def _db_size_mb(self) -> float:
+        total = 0
+        for suffix in ("", "-wal"):
+            p = Path(str(self._db_path) + suffix)
+            if p.exists():
+                total += p.stat().st_size
+        return total / (1024 * 1024)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return index health: indexed files, distinct hashed images, DB size, counters."""
+        try:
+            conn = self._connect()
+            return {
+                "indexed_files": conn.execute("SELECT COUNT(*) FROM indexed_files").fetchone()[0],
+                "hashed_images": conn.execute("SELECT COUNT(*) FROM image_hashes").fetchone()[0],
+                "db_size_mb":    round(self._db_size_mb(), 2),
+                "db_path":       str(self._db_path),
+                "computed":      self.computed,
+                "reused":        self.reused,
+                "available":     self.available,
+            }
+        except Exception as e:
+            _log.error(f"get_stats failed: {e}")
+            return {"error": str(e)}
+
+    def purge_all(self) -> Dict[str, Any]:
+        """Wipe every indexed path and hash."""
+        try:
+            conn = self._connect()
+            count = conn.execute("SELECT COUNT(*) FROM indexed_files").fetchone()[0]
+            conn.execute("DELETE FROM indexed_files")
+            conn.execute("DELETE FROM image_hashes")
+            conn.commit()
+            conn.execute("VACUUM")
+            self._changed()
+            return {"status": "purged", "records_deleted": count}
+        except Exception as e:
+            _log.error(f"purge_all failed: {e}")
+            return {"error": str(e)}
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  Module-level singleton
+# ─────────────────────────────────────────────────────────────────────────────
+
+perceptual_index = PerceptualIndex()
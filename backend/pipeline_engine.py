@@ -0,0 +1,205 @@
+"""
+LocalLens — Staged Pipeline Engine
+====================================
+A small, dependency-free engine that runs a sequence of processing stages
+concurrently, connected by bounded queues.
+
+    source ─▶ [stage 1] ─▶ queue ─▶ [stage 2] ─▶ queue ─▶ … ─▶ [stage N]
+
+Design Principles:
+  1. Bounded queues — a slow stage applies back-pressure instead of letting
+     decoded images pile up in memory
+  2. Per-stage worker counts — threads for I/O and decoding, a process pool
+     for CPU-bound work that holds the GIL (dlib face detection)
+  3. Cooperative cancellation — the shared cancellation event is checked
+     before every item; in-flight items finish, queued items are discarded
+  4. Fail fast — the first unexpected exception stops the pipeline and is
+     re-raised on the calling thread
+
+Stage functions receive one item and return the (possibly updated) item for
+the next stage, or None to drop it. Process stages must use a picklable,
+module-level function; `to_task` / `from_result` let them ship only the part
+of an item the child process needs (e.g. the decoded pixels) and merge the
+answer back, so the item itself never has to be pickled.
+"""
+
+import logging
+import queue
+import threading
+import contextvars
+from multiprocessing import Pool
+from typing import Any, Callable, Iterable, List, Optional
+
+# ── Logger ──────────────────────────────────────────────────────────────────
+_log = logging.getLogger("locallens.pipeline")
+
+# ── Constants ─────────────────────────────────────────────────────────────
+DEFAULT_QUEUE_SIZE = 32       # Items buffered between two stages
+STAGE_KIND_THREAD  = "thread"
+STAGE_KIND_PROCESS = "process"
+
+_SENTINEL = object()          # End-of-stream marker, one per worker
+
+
+class PipelineStage:
+    """Describes one stage of a StagedPipeline."""
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[Any], Any],
+        workers: int = 1,
+        kind: str = STAGE_KIND_THREAD,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        initializer: Optional[Callable] = None,
+        initargs: tuple = (),
+        to_task: Optional[Callable[[Any], Any]] = None,
+        from_result: Optional[Callable[[Any, Any], Any]] = None,
+    ):
+        if kind not in (STAGE_KIND_THREAD, STAGE_KIND_PROCESS):
+            raise ValueError(f"Unknown stage kind: {kind}")
+        self.name = name
+        self.func = func
+        self.workers = max(1, int(workers))
+        self.kind = kind
+        self.queue_size = max(1, int(queue_size))
+        # Only used by process stages (forwarded to multiprocessing.Pool)
+        self.initializer = initializer
+        self.initargs = initargs
+        self.to_task = to_task
+        self.from_result = from_result
+
+
+class StagedPipeline:
+    """
+    Runs items through a list of PipelineStage objects concurrently.
+
+    Usage:
+        pipeline = StagedPipeline([
+            PipelineStage("metadata", read_metadata, workers=4),
+            PipelineStage("faces", detect_faces, workers=2, kind="process"),
+            PipelineStage("file_io", move_file, workers=1),
+        ], cancellation_event=event)
+        pipeline.run(paths)
+        if pipeline.cancelled: ...
+    """
+
+    def __init__(self, stages: List[PipelineStage], cancellation_event=None):
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage.")
+        self._stages = stages
+        self._cancellation_event = cancellation_event
+        self._queues = [queue.Queue(maxsize=s.queue_size) for s in stages]
+        self._pools = [None] * len(stages)
+        self._remaining = [s.workers for s in stages]
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+        self.cancelled = False
+        self.items_fed = 0
+
+    # ── Public API ──────────────────────────────────────────────────────────
+
+    def run(self, source: Iterable[Any]) -> None:
+        """
+        Feed every item from `source` through the pipeline and block until all
+        stages have drained. Re-raises the first stage error, if any.
+        """
+        threads = []
+        try:
+            for idx, stage in enumerate(self._stages):
+                if stage.kind == STAGE_KIND_PROCESS:
+                    self._pools[idx] = Pool(
+                        processes=stage.workers,
+                        initializer=stage.initializer,
+                        initargs=stage.initargs,
+                    )
+                for n in range(stage.workers):
+                    # Workers inherit the caller's context (e.g. the job's log scope).
+                    t = threading.Thread(
+                        target=contextvars.copy_context().run, args=(self._worker, idx),
+                        name=f"pipeline-{stage.name}-{n}", daemon=True,
+                    )
+                    t.start()
+                    threads.append(t)
+
+            # The calling thread acts as the feeder for the first stage.
+            try:
+                for item in source:
+                    if self._halted():
+                        break
+                    self._queues[0].put(item)
+                    self.items_fed += 1
+            except BaseException:
+                # A failing source must still shut the workers down cleanly.
+                self._stop.set()
+                raise
+            finally:
+                for _ in range(self._stages[0].workers):
+                    self._queues[0].put(_SENTINEL)
+                for t in threads:
+                    t.join()
+        finally:
+            for pool in self._pools:
+                if pool is not None:
+                    pool.close()
+                    pool.join()
+
+        if self._error is not None:
+            raise self._error
+
+    # ── Internals ───────────────────────────────────────────────────────────
+
+    def _halted(self) -> bool:
+        if self._stop.is_set():
+            return True
+        if self._cancellation_event is not None and self._cancellation_event.is_set():
+            self.cancelled = True
+            self._stop.set()
+            return True
+        return False
+
+    def _worker(self, idx: int) -> None:
+        stage = self._stages[idx]
+        in_q = self._queues[idx]
+        out_q = self._queues[idx + 1] if idx + 1 < len(self._stages) else None
+        pool = self._pools[idx]
+
+        while True:
+            item = in_q.get()
+            if item is _SENTINEL:
+                break
+            # Once halted, keep draining so upstream producers never block.
+            if self._halted():
+                continue
+            try:
+                if pool is not None:
+                    task = stage.to_task(item) if stage.to_task else item
+                    result = pool.apply(stage.func, (task,))
+                    if stage.from_result:
+                        result = stage.from_result(item, result)
+                else:
+                    result = stage.func(item)
+            except BaseException as e:
+                self._fail(stage, e)
+                continue
+            if result is not None and out_q is not None:
+                out_q.put(result)
+
+        self._stage_finished(idx)
+
+    def _fail(self, stage: PipelineStage, error: BaseException) -> None:
+        with self._lock:
+            if self._error is None:
+                _log.error(f"Pipeline stage '{stage.name}' failed: {error}")
+                self._error = error
+        self._stop.set()
+
+    def _stage_finished(self, idx: int) -> None:
+        """Called once per worker; the last worker of a stage closes the next one."""
+        with self._lock:
+            self._remaining[idx] -= 1
+            last = self._remaining[idx] == 0
+        if last and idx + 1 < len(self._stages):
+            for _ in range(self._stages[idx + 1].workers):
+                self._queues[idx + 1].put(_SENTINEL)
@@ -0,0 +1,180 @@
+"""
+LocalLens — Progress Reporter
+=============================
+Sits between the organizer loops and the API's update callback. The loops
+report every file ("Analyzing: x", "Moved 'x' to 'y'"); the reporter turns
+that into at most MAX_EVENTS_PER_SECOND status events, so a job over
+thousands of small files per second no longer floods the event hub, the
+job state and the UI console.
+
+Design Principles:
+  1. Rate-limited per-file updates — file_started() and file_done() only
+     record; an event goes out when the last one is at least 1/N s old
+  2. Batched operation records — the "Moved ..." lines collected since the
+     last event travel together as one event's `items` (at most
+     MAX_BATCH_ITEMS of them, plus the total count in the message)
+  3. State transitions are never delayed — calling the reporter like the
+     plain callback (start, errors, rollback, completion) first flushes the
+     pending per-file updates, then emits immediately, in order
+  4. Sliding-window analytics — scan rate (files/s) and data flow (MB/s
+     written) cover the last ANALYTICS_WINDOW_S seconds, kept in fixed time
+     buckets, so they follow the job's current speed in constant memory
+  5. Thread-safe — transfer workers and pipeline stages report concurrently
+
+Usage:
+    reporter = ProgressReporter.wrap(update_callback, quality="Balanced")
+    reporter(5, "Workspace secured...", "running")           # emitted now
+    reporter.file_started(progress, f"Analyzing: {name}")   # rate-limited
+    reporter.file_done(progress, f"Moved '{name}' to '{dst}'", nbytes=size)
+"""
+
+import time
+import inspect
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+# ── Constants ─────────────────────────────────────────────────────────────
+MAX_EVENTS_PER_SECOND = 8
+MAX_BATCH_ITEMS       = 50      # Operation records carried by one event
+ANALYTICS_WINDOW_S    = 5.0     # Span of the scan-rate / data-flow window
+BUCKET_S              = 0.25    # Resolution of the window
+MIN_WINDOW_S          = 0.5     # Below this the rates are too noisy to show
+
+_MB = 1024 * 1024
+
+
+def _accepts_items(callback) -> bool:
+    try:
+        params = inspect.signature(callback).parameters.values()
+    except (TypeError, ValueError):
+        return False
+    return any(p.name == "items" or p.kind == p.VAR_KEYWORD for p in params)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  ProgressReporter class
+# ─────────────────────────────────────────────────────────────────────────────
+
+class ProgressReporter:
+    """
+    Rate-limiting wrapper around update_callback(progress, message, status,
+    analytics). Batched events also pass items=[...] if the callback takes it.
+    """
+
+    def __init__(self, update_callback: Callable[..., Any], quality: str = "N/A",
+                 max_events_per_second: int = MAX_EVENTS_PER_SECOND):
+        self._callback = update_callback
+        self._pass_items = _accepts_items(update_callback)
+        self.quality = quality
+        self._interval = 1.0 / max_events_per_second
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+        self._last_emit = 0.0
+        # Sliding window: [bucket index, files scanned, bytes written]
+        self._buckets: "deque[List[int]]" = deque()
+        # Per-file progress never goes backwards: workers finish files out of order
+        self._progress = 0
+        # Pending per-file updates since the last event
+        self._current: Optional[str] = None
+        self._items: "deque[str]" = deque(maxlen=MAX_BATCH_ITEMS)
+        self._item_count = 0
+        # Stats
+        self._received = 0
+        self._emitted = 0
+
+    @classmethod
+    def wrap(cls, update_callback: Callable[..., Any], quality: str = "N/A") -> "ProgressReporter":
+        """Returns update_callback itself if it already is a reporter."""
+        if isinstance(update_callback, cls):
+            return update_callback
+        return cls(update_callback, quality)
+
+    # ── Reporting ───────────────────────────────────────────────────────────
+
+    def __call__(self, progress: int, message: str, status: str = "running", analytics: Optional[Dict] = None):
+        """A state transition or one-off message: flushes pending updates, then emits it."""
+        with self._lock:
+            now = time.monotonic()
+            self._received += 1
+            self._flush(now)
+            self._emit(now, progress, message, status, analytics)
+
+    def file_started(self, progress: int, message: str) -> None:
+        """A file entered analysis; only the latest such message is kept between events."""
+        with self._lock:
+            now = time.monotonic()
+            self._received += 1
+            self._sample(now, files=1)
+            self._progress = max(self._progress, progress)
+            self._current = message
+            self._maybe_flush(now)
+
+    def file_done(self, progress: int, message: str, nbytes: int = 0) -> None:
+        """A file was written to a destination; batched into the next event's items."""
+        with self._lock:
+            now = time.monotonic()
+            self._received += 1
+            self._sample(now, nbytes=nbytes)
+            self._progress = max(self._progress, progress)
+            self._items.append(message)
+            self._item_count += 1
+            self._maybe_flush(now)
+
+    def flush(self) -> None:
+        """Emits whatever per-file updates are still pending."""
+        with self._lock:
+            self._flush(time.monotonic())
+
+    def _maybe_flush(self, now: float) -> None:
+        if now - self._last_emit >= self._interval:
+            self._flush(now)
+
+    def _flush(self, now: float) -> None:
+        if not self._item_count and self._current is None:
+            return
+        if self._item_count:
+            items = list(self._items)
+            message = items[-1] if self._item_count == 1 else f"{items[-1]} (+{self._item_count - 1} more)"
+        else:
+            items, message = [], self._current
+        self._emit(now, self._progress, message, "running", self._analytics(now), items if len(items) > 1 else None)
+        self._current = None
+        self._items.clear()
+        self._item_count = 0
+
+    def _emit(self, now, progress, message, status, analytics, items=None):
+        self._last_emit = now
+        self._emitted += 1
+        if items and self._pass_items:
+            self._callback(progress, message, status, analytics, items=items)
+        else:
+            self._callback(progress, message, status, analytics)
+
+    # ── Analytics ───────────────────────────────────────────────────────────
+
+    def _sample(self, now: float, files: int = 0, nbytes: int = 0) -> None:
+        bucket = int(now / BUCKET_S)
+        if self._buckets and self._buckets[-1][0] == bucket:
+            self._buckets[-1][1] += files
+            self._buckets[-1][2] += nbytes or 0
+        else:
+            self._buckets.append([bucket, files, nbytes or 0])
+        oldest = bucket - int(ANALYTICS_WINDOW_S / BUCKET_S)
+        while self._buckets[0][0] < oldest:
+            self._buckets.popleft()
+
+    def _analytics(self, now: float) -> Dict[str, str]:
+        analytics = {"quality": self.quality, "scan_rate": "0.0", "data_flow": "0.0"}
+        span = min(ANALYTICS_WINDOW_S, now - self._start)
+        if span > MIN_WINDOW_S:
+            oldest = int(now / BUCKET_S) - int(ANALYTICS_WINDOW_S / BUCKET_S)
+            files = sum(b[1] for b in self._buckets if b[0] >= oldest)
+            nbytes = sum(b[2] for b in self._buckets if b[0] >= oldest)
+            analytics["scan_rate"] = f"{files / span:.1f}"
+            analytics["data_flow"] = f"{nbytes / _MB / span:.1f}"
+        return analytics
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"updates": self._received, "events": self._emitted}
@@ -69,6 +69,21 @@ def _read_backend_port() -> int:
 def _backend_url() -> str:
     return f"http://127.0.0.1:{_read_backend_port()}"
 
+def _http_json(url: str, payload: Optional[dict] = None, timeout: float = 10) -> Any:
+    """Blocking JSON request to the backend (POST when there is a payload); run it via asyncio.to_thread."""
+    data = json.dumps(payload).encode() if payload is not None else None
+    req = urllib.request.Request(
+        url,
+        data=data,
+        headers={"Content-Type": "application/json"} if data is not None else {},
+        method="POST" if data is not None else "GET",
+    )
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return json.loads(resp.read())
+
+JOB_WAIT_S = 60            # Length of one /api/jobs/{id}/wait long-poll
+JOB_MAX_WAIT_S = 30 * 60   # Give up waiting for a job after this long
+
 SUPPORTED_EXT = (
     '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp',
     '.heic', '.heif', '.dng', '.cr2', '.cr3', '.nef', '.arw',
@@ -495,6 +510,8 @@ class SchedulerDaemon:
                 "maintain_hierarchy": s.get("maintain_hierarchy", True),
                 # Tells _core_processing_loop to only process files newer than this
                 "mtime_cutoff": mtime_cutoff if mtime_cutoff > 0 else None,
+                # Sweeps only list folders that changed since the previous sweep
+                "incremental_sweep": triggered_by == "sweep",
             }
             if all_files:
                 sorting_options["specific_files"] = all_files
@@ -505,67 +522,72 @@ class SchedulerDaemon:
                 "sorting_options": sorting_options,
                 "operation_mode": s.get("operation_mode", "copy"),
                 "ignore_list": s.get("ignore_list", []),
+                # Scheduled runs queue behind jobs started from the UI
+                "priority": "background",
             }
 
             error_msg = None
             count = 0
+            failed = 0
             try:
-                # Step 1: POST /api/start-sorting to kick off the job
-                raw = json.dumps(payload).encode()
-                req = urllib.request.Request(
-                    f"{base}/api/start-sorting",
-                    data=raw,
-                    headers={"Content-Type": "application/json"},
-                    method="POST",
-                )
-                with urllib.request.urlopen(req, timeout=10) as resp:
-                    job_start = json.loads(resp.read())
-
-                if job_start.get("status") not in ("started", "ok", "success", "running"):
-                    raise RuntimeError(f"Backend rejected job: {job_start}")
+                # Step 1: POST /api/start-sorting to kick off the job (off the event loop)
+                job_start = await asyncio.to_thread(_http_json, f"{base}/api/start-sorting", payload)
 
-                self._log("Job started on backend. Polling…", "🔗")
+                if job_start.get("status") not in ("started", "ok", "success", "running") or not job_start.get("job_id"):
+                    raise RuntimeError(f"Backend rejected job: {job_start}")
+                job_id = job_start["job_id"]
 
-                # Brief wait to let backend transition from 'ready' → 'running'
-                await asyncio.sleep(1.0)
+                self._log(f"Job {job_id} started on backend. Waiting…", "🔗")
 
-                # Step 2: Poll /api/job-status until done (max 30 min)
+                # Step 2: Long-poll /api/jobs/{id}/wait — the backend answers the moment
+                # the job finishes, or every JOB_WAIT_S with its latest progress.
                 last_msg = ""
-                for _ in range(3600):  # 3600 × 0.5s = 30 min max
-                    await asyncio.sleep(0.5)
+                deadline = asyncio.get_running_loop().time() + JOB_MAX_WAIT_S
+                while True:
                     try:
-                        status_req = urllib.request.Request(
-                            f"{base}/api/job-status",
-                            method="GET",
+                        status = await asyncio.to_thread(
+                            _http_json, f"{base}/api/jobs/{job_id}/wait?timeout={JOB_WAIT_S}",
+                            None, JOB_WAIT_S + 15,
                         )
-                        with urllib.request.urlopen(status_req, timeout=5) as resp:
-                            status = json.loads(resp.read())
+                    except urllib.error.HTTPError:
+                        raise
                     except Exception:
+                        status = None
                         await asyncio.sleep(2)
-                        continue
-
-                    state = status.get("status", "")
-                    msg = status.get("message", "")
-
-                    if state in ("complete", "error", "aborted", "warning"):
-                        # Extract file count from the completion message
-                        # e.g. "Process complete. 5 files successfully copied."
-                        import re
-                        m = re.search(r"(\d+)\s+files?\s+successfully", msg or "")
-                        count = int(m.group(1)) if m else 0
-                        if state == "error":
-                            error_msg = msg or "Unknown error from backend"
+
+                    if status is not None and status.get("finished"):
+                        result = status.get("result") or {}
+                        state = result.get("status") or status.get("status", "")
+                        msg = result.get("message") or status.get("message", "")
+                        count = result.get("files_processed", result.get("operations_succeeded", 0))
+                        failed = result.get("operations_failed", 0)
+                        if status.get("status") == "error" or state == "error":
+                            errors = result.get("errors") or [status.get("error") or msg]
+                            error_msg = "; ".join(str(e) for e in errors if e) or "Unknown error from backend"
                         self._log(
-                            f"Backend finished: {count} file(s) [{state}] — {msg}",
-                            "✅" if state == "complete" else "⚠️ "
+                            f"Backend finished: {count} file(s) [{state}]"
+                            + (f", {failed} failed operation(s)" if failed else "") + f" — {msg}",
+                            "✅" if state == "complete" and not failed else "⚠️ "
                         )
                         break
 
+                    if asyncio.get_running_loop().time() > deadline:
+                        raise RuntimeError(f"Job {job_id} did not finish within {JOB_MAX_WAIT_S // 60} minutes")
+
                     # Log progress messages (avoid spamming duplicates)
+                    msg = (status or {}).get("message", "")
                     if msg and msg != last_msg:
                         self._log(msg, "  ")
                         last_msg = msg
 
+            except urllib.error.HTTPError as e:
+                # e.g. 409: a job started from the UI is already working in these folders
+                try:
+                    detail = json.loads(e.read()).get("detail")
+                except Exception:
+                    detail = e.reason
+                error_msg = f"Backend refused the job ({e.code}): {detail}"
+                self._log(error_msg, "❌")
             except urllib.error.URLError as e:
                 error_msg = f"Backend not reachable: {e}. Is the LocalLens backend running?"
                 self._log(error_msg, "❌")
@@ -581,6 +603,7 @@ class SchedulerDaemon:
                 "started_at": start.isoformat(),
                 "completed_at": end.isoformat(),
                 "files_processed": count,
+                "files_failed": failed,
                 "status": "error" if error_msg else "complete",
                 "error": error_msg
             }
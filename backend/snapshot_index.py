@@ -0,0 +1,445 @@
+"""
+LocalLens — Incremental Directory Snapshot Index
+=================================================
+Lets a scheduled sweep find the files that are new or changed since the last
+successful sweep of the same folder without re-listing and re-stat'ing the
+whole library every time.
+
+Design Principles:
+  1. Directory mtimes gate the walk — adding, removing or renaming a file changes
+     its folder's mtime, so a sweep stats each known folder once and only lists
+     the folders whose mtime moved (plus folders it has never seen)
+  2. Exact diff, not a time window — inside a listed folder each file's
+     (size, mtime_ns, ctime_ns) is compared with the snapshot; a file is emitted
+     only when it is new or one of those changed
+  3. Committed only on success — a sweep's updates are written once the job has
+     finished, so files from a failed or aborted job are offered again next time;
+     files whose copy or move failed in a finished job are left out of it
+  4. Racy folders are re-listed — a folder whose mtime is within RACY_WINDOW_S of
+     the scan could change again within the same timestamp tick, so its mtime is
+     not trusted on the next sweep
+  5. Self-invalidating — changing the ignore list or extension filter of a root
+     drops its snapshot and the next sweep starts over with a full walk
+  6. Disposable — deleting the DB file only costs one full walk per root
+
+Known limit: a photo edited in place (same name, folder untouched) does not
+change its folder's mtime, so a sweep does not pick it up.
+
+File Location: ~/.config/LocalLens/snapshot_index.db
+Permissions:   0o600 (owner read/write only)
+"""
+
+import os
+import sys
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# ── Logger ──────────────────────────────────────────────────────────────────
+_log = logging.getLogger("locallens.snapshot_index")
+if not _log.handlers:
+    _h = logging.StreamHandler(sys.stderr)
+    _h.setFormatter(logging.Formatter("[snapshot_index] %(levelname)s: %(message)s"))
+    _log.addHandler(_h)
+    _log.setLevel(logging.INFO)
+    _log.propagate = False
+
+# ── Constants ─────────────────────────────────────────────────────────────
+DB_FILENAME     = "snapshot_index.db"
+RACY_WINDOW_S   = 2.0          # FAT/exFAT store mtimes with 2 s resolution
+_RACY_MTIME     = -1           # Stored instead of a racy folder mtime: never matches
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  Path helpers
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _get_config_dir() -> Path:
+    """Return the OS-appropriate LocalLens config directory."""
+    if sys.platform == "win32":
+        base = Path(os.environ.get("APPDATA", Path.home()))
+    else:
+        base = Path.home() / ".config"
+    config_dir = base / "LocalLens"
+    config_dir.mkdir(parents=True, exist_ok=True)
+    return config_dir
+
+
+def _get_db_path() -> Path:
+    return _get_config_dir() / DB_FILENAME
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  Schema
+# ─────────────────────────────────────────────────────────────────────────────
+
+_SCHEMA_SQL = """
+PRAGMA journal_mode=WAL;
+
+CREATE TABLE IF NOT EXISTS snapshot_roots (
+    root        TEXT PRIMARY KEY,
+    signature   TEXT NOT NULL,           -- hash of ignore list + extension filter
+    dir_count   INTEGER NOT NULL,
+    file_count  INTEGER NOT NULL,
+    updated_at  REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS snapshot_dirs (
+    root        TEXT NOT NULL,
+    path        TEXT NOT NULL,
+    mtime_ns    INTEGER NOT NULL,        -- -1 = racy, always re-list
+    PRIMARY KEY (root, path)
+);
+
+CREATE TABLE IF NOT EXISTS snapshot_files (
+    root        TEXT NOT NULL,
+    dir         TEXT NOT NULL,
+    name        TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    mtime_ns    INTEGER NOT NULL,
+    ctime_ns    INTEGER NOT NULL,
+    PRIMARY KEY (root, dir, name)
+);
+"""
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  Utility helpers
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _signature(ignore_list: Iterable[str], extensions: Sequence[str]) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for part in sorted(set(ignore_list or [])) + ["\0"] + sorted(e.lower() for e in extensions):
+        h.update(part.encode("utf-8", "surrogatepass") + b"\0")
+    return h.hexdigest()
+
+
+def _file_tuple(st: os.stat_result) -> Tuple[int, int, int]:
+    return st.st_size, st.st_mtime_ns, st.st_ctime_ns
+
+
+def _list_dir(path: str, extensions: Tuple[str, ...]):
+    """(subdir names, supported file entries) — symlinked folders are not entered."""
+    subdirs, files = [], []
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                if entry.is_dir():
+                    if not entry.is_symlink():
+                        subdirs.append(entry.name)
+                elif entry.name.lower().endswith(extensions):
+                    files.append(entry)
+            except OSError:
+                continue
+    return subdirs, files
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  A single sweep
+# ─────────────────────────────────────────────────────────────────────────────
+
+class SnapshotSweep:
+    """
+    One incremental sweep of a root. Iterate it (once) for the DirEntries of
+    new or changed files, then call commit() after the job has succeeded.
+    """
+
+    def __init__(self, index: "SnapshotIndex", root: str, ignore_list, extensions, mtime_cutoff=None):
+        self._index = index
+        self.root = root
+        self.ignore_set = set(ignore_list or [])
+        self.extensions = tuple(e.lower() for e in extensions)
+        self.signature = _signature(self.ignore_set, self.extensions)
+        self.mtime_cutoff = mtime_cutoff
+        self.full_scan = False
+        self._done = False
+        # Pending updates, written by commit()
+        self._dir_mtimes: Dict[str, int] = {}
+        self._dir_files: Dict[str, List[Tuple[str, int, int, int]]] = {}
+        self._gone_dirs: List[str] = []
+        self.stats = {"dirs_checked": 0, "dirs_listed": 0, "files_emitted": 0, "seconds": 0.0}
+
+    # ── Walking ─────────────────────────────────────────────────────────────
+
+    def __iter__(self) -> Iterator[os.DirEntry]:
+        started = time.time()
+        known = self._index._load_dirs(self.root, self.signature)
+        self.full_scan = known is None
+        if self.full_scan:
+            _log.info(f"No snapshot for {self.root} yet — full walk")
+            yield from self._walk_new(self.root, scan_started=started)
+        else:
+            for path in sorted(known):
+                self.stats["dirs_checked"] += 1
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    self._gone_dirs.append(path)
+                    continue
+                if st.st_mtime_ns == known[path]:
+                    continue
+                yield from self._relist(path, st, known, started)
+        self._done = True
+        self.stats["seconds"] = round(time.time() - started, 3)
+        _log.info(f"Sweep of {self.root}: {self.stats}")
+
+    def _record_dir(self, path: str, st: os.stat_result, scan_started: float) -> None:
+        racy = scan_started - st.st_mtime < RACY_WINDOW_S
+        self._dir_mtimes[path] = _RACY_MTIME if racy else st.st_mtime_ns
+
+    def _record_files(self, path: str, files: List[os.DirEntry]) -> Dict[str, Tuple[int, int, int]]:
+        """Stores the stat tuples of `files`; returns them by name."""
+        rows, tuples = [], {}
+        for entry in files:
+            try:
+                t = _file_tuple(entry.stat())
+            except OSError:
+                continue
+            rows.append((entry.name,) + t)
+            tuples[entry.name] = t
+        self._dir_files[path] = rows
+        return tuples
+
+    def _emit(self, path: str, files: List[os.DirEntry], tuples, previous=None, use_cutoff=False):
+        if path in self.ignore_set:
+            return
+        for entry in files:
+            t = tuples.get(entry.name)
+            if t is None:
+                continue
+            if previous is not None and previous.get(entry.name) == t:
+                continue
+            if use_cutoff and self.mtime_cutoff is not None:
+                # No snapshot to diff against: same max(mtime, ctime) rule as a plain sweep.
+                if max(t[1], t[2]) / 1e9 < self.mtime_cutoff:
+                    continue
+            self.stats["files_emitted"] += 1
+            yield entry
+
+    def _walk_new(self, top: str, scan_started: float) -> Iterator[os.DirEntry]:
+        """Full walk of a folder the snapshot has never seen (depth-first, top-down)."""
+        stack = [top]
+        while stack:
+            path = stack.pop()
+            try:
+                st = os.stat(path)
+                subdirs, files = _list_dir(path, self.extensions)
+            except OSError:
+                continue
+            self.stats["dirs_listed"] += 1
+            self._record_dir(path, st, scan_started)
+            tuples = self._record_files(path, files)
+            yield from self._emit(path, files, tuples, use_cutoff=self.full_scan)
+            for name in reversed(subdirs):
+                stack.append(os.path.join(path, name))
+
+    def _relist(self, path, st, known, scan_started) -> Iterator[os.DirEntry]:
+        """A known folder whose mtime moved: diff its files, walk any new sub-folders."""
+        try:
+            subdirs, files = _list_dir(path, self.extensions)
+        except OSError:
+            self._gone_dirs.append(path)
+            return
+        self.stats["dirs_listed"] += 1
+        self._record_dir(path, st, scan_started)
+        previous = self._index._load_files(self.root, path)
+        tuples = self._record_files(path, files)
+        yield from self._emit(path, files, tuples, previous=previous)
+        for name in subdirs:
+            sub = os.path.join(path, name)
+            if sub not in known:
+                yield from self._walk_new(sub, scan_started)
+
+    # ── Commit ──────────────────────────────────────────────────────────────
+
+    def retry_later(self, paths: Iterable[str]) -> None:
+        """
+        Leaves `paths` (files this sweep emitted that the job failed to handle)
+        out of the snapshot, and marks their folders for re-listing, so the next
+        sweep offers them again.
+        """
+        for path in paths:
+            folder, name = os.path.split(path)
+            rows = self._dir_files.get(folder)
+            if rows is None:
+                continue
+            self._dir_files[folder] = [row for row in rows if row[0] != name]
+            self._dir_mtimes[folder] = _RACY_MTIME
+
+    def commit(self) -> None:
+        """Persists this sweep. Only call once the files it emitted were handled."""
+        if not self._done:
+            _log.warning(f"Sweep of {self.root} was not completed — snapshot left unchanged")
+            return
+        self._index._apply(self)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  SnapshotIndex class
+# ─────────────────────────────────────────────────────────────────────────────
+
+class SnapshotIndex:
+    """
+    Thread-safe SQLite-backed store of per-root folder snapshots.
+
+    Usage (in organizer_logic.py):
+        from snapshot_index import snapshot_index
+        sweep = snapshot_index.sweep(root, ignore_list, SUPPORTED_EXTENSIONS, mtime_cutoff)
+        for entry in sweep:
+            ...process entry.path...
+        sweep.commit()
+    """
+
+    def __init__(self):
+        self._db_path = _get_db_path()
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._init_db()
+
+    # ── Initialization ──────────────────────────────────────────────────────
+
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread; the scan thread and the job thread each get their own."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self._db_path), timeout=10)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        """Create tables and set file permissions."""
+        try:
+            conn = self._connect()
+            conn.executescript(_SCHEMA_SQL)
+            conn.commit()
+            os.chmod(self._db_path, 0o600)
+        except Exception as e:
+            _log.error(f"Failed to initialize snapshot index: {e}")
+
+    # ── Sweeps ──────────────────────────────────────────────────────────────
+
+    def sweep(self, root: str, ignore_list=None, extensions: Sequence[str] = (), mtime_cutoff=None) -> SnapshotSweep:
+        """
+        Starts an incremental sweep of `root`. Without a usable snapshot the sweep
+        walks everything and falls back to `mtime_cutoff` for choosing files.
+        """
+        return SnapshotSweep(self, root, ignore_list, extensions, mtime_cutoff)
+
+    def _load_dirs(self, root: str, signature: str) -> Optional[Dict[str, int]]:
+        """{folder: mtime_ns} of the root's snapshot, or None if there is no usable one."""
+        try:
+            conn = self._connect()
+            row = conn.execute("SELECT signature FROM snapshot_roots WHERE root=?", (root,)).fetchone()
+            if row is None or row[0] != signature:
+                return None
+            return dict(conn.execute("SELECT path, mtime_ns FROM snapshot_dirs WHERE root=?", (root,)))
+        except Exception as e:
+            _log.warning(f"Could not load snapshot for {root}: {e}")
+            return None
+
+    def _load_files(self, root: str, dir_path: str) -> Dict[str, Tuple[int, int, int]]:
+        try:
+            rows = self._connect().execute(
+                "SELECT name, size, mtime_ns, ctime_ns FROM snapshot_files WHERE root=? AND dir=?",
+                (root, dir_path),
+            )
+            return {name: (size, mtime_ns, ctime_ns) for name, size, mtime_ns, ctime_ns in rows}
+        except Exception as e:
+            _log.warning(f"Could not load snapshot files for {dir_path}: {e}")
+            return {}
+
+    def _apply(self, sweep: SnapshotSweep) -> None:
+        root = sweep.root
+        try:
+            with self._write_lock:
+                conn = self._connect()
+                with conn:
+                    if sweep.full_scan:
+                        conn.execute("DELETE FROM snapshot_dirs WHERE root=?", (root,))
+                        conn.execute("DELETE FROM snapshot_files WHERE root=?", (root,))
+                    for path in sweep._gone_dirs:
+                        # A vanished folder takes its whole sub-tree with it.
+                        prefix = path.rstrip(os.sep) + os.sep
+                        args = (root, path, len(prefix), prefix)
+                        conn.execute("DELETE FROM snapshot_dirs WHERE root=? AND (path=? OR substr(path, 1, ?)=?)", args)
+                        conn.execute("DELETE FROM snapshot_files WHERE root=? AND (dir=? OR substr(dir, 1, ?)=?)", args)
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO snapshot_dirs (root, path, mtime_ns) VALUES (?,?,?)",
+                        [(root, path, mtime) for path, mtime in sweep._dir_mtimes.items()],
+                    )
+                    for path, rows in sweep._dir_files.items():
+                        conn.execute("DELETE FROM snapshot_files WHERE root=? AND dir=?", (root, path))
+                        conn.executemany(
+                            "INSERT INTO snapshot_files (root, dir, name, size, mtime_ns, ctime_ns) VALUES (?,?,?,?,?,?)",
+                            [(root, path) + row for row in rows],
+                        )
+                    dir_count = conn.execute("SELECT COUNT(*) FROM snapshot_dirs WHERE root=?", (root,)).fetchone()[0]
+                    file_count = conn.execute("SELECT COUNT(*) FROM snapshot_files WHERE root=?", (root,)).fetchone()[0]
+                    conn.execute(
+                        "INSERT OR REPLACE INTO snapshot_roots (root, signature, dir_count, file_count, updated_at) VALUES (?,?,?,?,?)",
+                        (root, sweep.signature, dir_count, file_count, time.time()),
+                    )
+        except Exception as e:
+            _log.warning(f"Could not save snapshot for {root}: {e}")
+
+    def forget(self, root: str) -> None:
+        """Drops the snapshot of `root`; its next sweep is a full walk."""
+        try:
+            with self._write_lock:
+                conn = self._connect()
+                with conn:
+                    for table in ("snapshot_roots", "snapshot_dirs", "snapshot_files"):
+                        conn.execute(f"DELETE FROM {table} WHERE root=?", (root,))
+        except Exception as e:
+            _log.warning(f"forget failed for {root}: {e}")
+
+    # ── Statistics / Privacy ────────────────────────────────────────────────
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return one summary row per snapshotted root plus the DB size."""
+        try:
+            rows = self._connect().execute(
+                "SELECT root, dir_count, file_count, updated_at FROM snapshot_roots ORDER BY root"
+            ).fetchall()
+            size = sum(
+                Path(str(self._db_path) + suffix).stat().st_size
+                for suffix in ("", "-wal") if Path(str(self._db_path) + suffix).exists()
+            )
+            return {
+                "roots": [
+                    {"root": r, "dir_count": d, "file_count": f, "updated_at": u}
+                    for r, d, f, u in rows
+                ],
+                "db_size_mb": round(size / (1024 * 1024), 2),
+                "db_path":    str(self._db_path),
+            }
+        except Exception as e:
+            _log.error(f"get_stats failed: {e}")
+            return {"error": str(e)}
+
+    def purge_all(self) -> Dict[str, Any]:
+        """Wipe every snapshot."""
+        try:
+            with self._write_lock:
+                conn = self._connect()
+                count = conn.execute("SELECT COUNT(*) FROM snapshot_roots").fetchone()[0]
+                with conn:
+                    for table in ("snapshot_roots", "snapshot_dirs", "snapshot_files"):
+                        conn.execute(f"DELETE FROM {table}")
+                conn.execute("VACUUM")
+            return {"status": "purged", "roots_deleted": count}
+        except Exception as e:
+            _log.error(f"purge_all failed: {e}")
+            return {"error": str(e)}
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  Module-level singleton
+# ─────────────────────────────────────────────────────────────────────────────
+
+snapshot_index = SnapshotIndex()
@@ -0,0 +1,194 @@
+"""
+LocalLens — Concurrent File-Transfer Engine
+============================================
+Runs a job's copies and moves on a small pool of worker threads, so analysis
+can queue a file and move straight on to the next one while earlier files are
+still being written to a slow USB drive or NAS share.
+
+Design Principles:
+  1. Per-device limits — at most `per_device` transfers write to the same
+     destination device at once (spinning disks and SMB shares slow down when
+     hammered by many streams); different devices proceed in parallel
+  2. Backpressure — at most `max_pending` transfers may be queued; submit()
+     blocks beyond that so analysis never runs arbitrarily far ahead
+  3. Names stay deterministic — callers reserve destination names when they
+     submit (see destination_registry), the engine only moves the bytes
+  4. Drain before rollback — cancel_pending() skips queued work (calling each
+     task's on_skip so reserved names can be released) and wait() returns only
+     once in-flight transfers have finished, so a rollback manifest is complete
+  5. Throughput — bytes and files completed feed the data-flow (MB/s) analytics
+
+Usage:
+    with TransferEngine(workers=4, per_device=2) as engine:
+        engine.submit(copy_fn, src, dst, device_path=dst_folder, nbytes=size,
+                      on_done=lambda result: ..., on_skip=lambda: ...)
+        engine.wait()
+"""
+
+import os
+import time
+import logging
+import threading
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+# ── Logger ──────────────────────────────────────────────────────────────────
+_log = logging.getLogger("locallens.transfer_engine")
+
+# ── Constants ─────────────────────────────────────────────────────────────
+DEFAULT_WORKERS      = 4    # Transfer threads per job
+DEFAULT_PER_DEVICE   = 2    # Concurrent transfers writing to one device
+PENDING_PER_WORKER   = 16   # Queue depth per worker before submit() blocks
+
+
+def device_of(path: str) -> Optional[int]:
+    """st_dev of `path`, or of its nearest existing parent (the folder may not exist yet)."""
+    current = os.path.abspath(path)
+    while True:
+        try:
+            return os.stat(current).st_dev
+        except OSError:
+            parent = os.path.dirname(current)
+            if parent == current:
+                return None
+            current = parent
+
+
+class TransferEngine:
+    """Job-scoped worker pool for file copies and moves."""
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, per_device: int = DEFAULT_PER_DEVICE, max_pending: Optional[int] = None):
+        self.workers = max(1, int(workers or DEFAULT_WORKERS))
+        self.per_device = max(1, int(per_device or DEFAULT_PER_DEVICE))
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="transfer")
+        self._slots = threading.BoundedSemaphore(max_pending or self.workers * PENDING_PER_WORKER)
+        self._lock = threading.Lock()
+        self._device_limits: Dict[Any, threading.BoundedSemaphore] = {}
+        self._device_cache: Dict[str, Optional[int]] = {}
+        self._futures: List[Future] = []
+        self._cancelled = threading.Event()
+        self._start_time = time.time()
+        self.bytes_done = 0
+        self.files_done = 0
+        self.failures = 0
+
+    # ── Devices ─────────────────────────────────────────────────────────────
+
+    def _device_limit(self, device_path: Optional[str]) -> threading.BoundedSemaphore:
+        with self._lock:
+            if device_path is None:
+                device = None
+            elif device_path in self._device_cache:
+                device = self._device_cache[device_path]
+            else:
+                device = self._device_cache[device_path] = device_of(device_path)
+            limit = self._device_limits.get(device)
+            if limit is None:
+                limit = self._device_limits[device] = threading.BoundedSemaphore(self.per_device)
+            return limit
+
+    # ── Submitting ──────────────────────────────────────────────────────────
+
+    def submit(
+        self,
+        fn: Callable[..., Any],
+        *args,
+        device_path: Optional[str] = None,
+        nbytes: int = 0,
+        on_done: Optional[Callable[[Any], None]] = None,
+        on_skip: Optional[Callable[[], None]] = None,
+    ) -> Future:
+        """
+        Queues fn(*args) to write to the device holding `device_path`.
+        on_done(result) runs on the worker after fn returns; on_skip() runs
+        instead of fn if the engine was cancelled before the task started.
+        """
+        self._slots.acquire()
+        try:
+            # Tasks run in the submitter's context, so they log into its job's log.
+            context = contextvars.copy_context()
+            future = self._executor.submit(context.run, self._run, fn, args, device_path, nbytes, on_done, on_skip)
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._futures.append(future)
+        return future
+
+    def _run(self, fn, args, device_path, nbytes, on_done, on_skip):
+        try:
+            if self._cancelled.is_set():
+                if on_skip is not None:
+                    on_skip()
+                return None
+            with self._device_limit(device_path):
+                result = fn(*args)
+            with self._lock:
+                if result:
+                    self.files_done += 1
+                    self.bytes_done += nbytes or 0
+                else:
+                    self.failures += 1
+        except Exception as e:
+            _log.error(f"Transfer task failed: {e}")
+            with self._lock:
+                self.failures += 1
+            return None
+        else:
+            if on_done is not None:
+                # The transfer is counted already: a failing callback must not count it again.
+                try:
+                    on_done(result)
+                except Exception as e:
+                    _log.error(f"Transfer completion callback failed: {e}")
+            return result
+        finally:
+            self._slots.release()
+
+    # ── Draining ────────────────────────────────────────────────────────────
+
+    def cancel_pending(self) -> None:
+        """Tasks that have not started yet are skipped (their on_skip runs)."""
+        self._cancelled.set()
+
+    def wait(self) -> None:
+        """Blocks until every submitted task has finished or been skipped."""
+        while True:
+            with self._lock:
+                pending = [f for f in self._futures if not f.done()]
+                self._futures = pending
+            if not pending:
+                return
+            for future in pending:
+                future.exception()  # Waits; _run never raises
+
+    def shutdown(self) -> None:
+        self.wait()
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.cancel_pending()
+        self.shutdown()
+        return False
+
+    # ── Statistics ──────────────────────────────────────────────────────────
+
+    def data_flow_mb_s(self) -> float:
+        """MB/s of completed transfers since the engine started."""
+        elapsed = time.time() - self._start_time
+        return (self.bytes_done / (1024 * 1024)) / elapsed if elapsed > 0 else 0.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "per_device": self.per_device,
+            "files": self.files_done,
+            "failed": self.failures,
+            "mb": round(self.bytes_done / (1024 * 1024), 1),
+            "mb_per_s": round(self.data_flow_mb_s(), 1),
+        }